@@ -0,0 +1,186 @@
+"""
+Verifica o controle de concorrência otimista sob escritas simultâneas no mesmo
+registro (ver src/versoes.py).
+
+Uso (no processo, com um banco SQLite temporário):
+    python scripts/contencao_versoes.py --clientes 8 --incrementos 25
+
+Uso (contra o servidor em execução):
+    python scripts/contencao_versoes.py --url http://localhost:5000/api --clientes 8
+
+Cenários:
+    estoque      cada cliente lê a peça (GET, ETag) e grava estoque + 1 com
+                 If-Match, repetindo a leitura quando recebe 412 ou 409; ao
+                 final o estoque deve ser clientes x incrementos
+    pecas_ordem  os clientes adicionam a mesma peça à mesma ordem ao mesmo
+                 tempo, repetindo em 409; ao final o estoque e o valor total da
+                 ordem devem bater com as peças gravadas
+
+Com --sem-if-match o cenário estoque envia os PUTs sem If-Match e mostra as
+atualizações perdidas que o If-Match evita.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def http_requisitar(base):
+    def requisitar(metodo, caminho, corpo=None, cabecalhos=None):
+        dados = json.dumps(corpo).encode('utf-8') if corpo is not None else None
+        requisicao = urllib.request.Request(base + caminho, data=dados, method=metodo, headers={
+            'Content-Type': 'application/json', **(cabecalhos or {})
+        })
+        try:
+            with urllib.request.urlopen(requisicao, timeout=30) as resposta:
+                return resposta.status, resposta.headers, json.loads(resposta.read() or b'null')
+        except urllib.error.HTTPError as erro:
+            return erro.code, erro.headers, json.loads(erro.read() or b'null')
+    return requisitar
+
+
+def local_requisitar():
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'contencao.db')}")
+    os.environ.setdefault('CACHE_BACKEND', 'nenhum')
+    os.environ.setdefault('TAREFAS_WORKERS', '0')
+    from src.main import app
+
+    def requisitar(metodo, caminho, corpo=None, cabecalhos=None):
+        resposta = app.test_client().open('/api' + caminho, method=metodo, json=corpo, headers=cabecalhos or {})
+        return resposta.status_code, resposta.headers, resposta.get_json()
+    print(f"Banco: {os.environ['DATABASE_URL']}")
+    return requisitar
+
+
+def em_paralelo(clientes, trabalho):
+    contagem = {'gravacoes': 0, 'conflitos': 0, 'erros': 0}
+    lock = threading.Lock()
+    largada = threading.Barrier(clientes)
+
+    def executar():
+        largada.wait()
+        parcial = trabalho()
+        with lock:
+            for chave, valor in parcial.items():
+                contagem[chave] += valor
+
+    threads = [threading.Thread(target=executar) for _ in range(clientes)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    contagem['segundos'] = time.perf_counter() - inicio
+    return contagem
+
+
+def cenario_estoque(requisitar, args):
+    status, _, peca = requisitar('POST', '/pecas', {
+        'nome': f'Contenção {time.time_ns()}', 'preco_unitario': 1.0, 'estoque': 0
+    })
+    assert status == 201, peca
+
+    def trabalho():
+        parcial = {'gravacoes': 0, 'conflitos': 0, 'erros': 0}
+        for _ in range(args.incrementos):
+            while True:
+                status, cabecalhos, atual = requisitar('GET', f"/pecas/{peca['id']}")
+                etag = cabecalhos.get('ETag')
+                condicao = {'If-Match': etag} if etag and not args.sem_if_match else {}
+                status, _, _ = requisitar('PUT', f"/pecas/{peca['id']}", {'estoque': atual['estoque'] + 1}, condicao)
+                if status == 200:
+                    parcial['gravacoes'] += 1
+                    break
+                if status in (409, 412):
+                    parcial['conflitos'] += 1
+                    continue
+                parcial['erros'] += 1
+                break
+        return parcial
+
+    contagem = em_paralelo(args.clientes, trabalho)
+    _, _, final = requisitar('GET', f"/pecas/{peca['id']}")
+    esperado = contagem['gravacoes']
+    print(f"estoque: {contagem['gravacoes']} gravações, {contagem['conflitos']} conflitos (409/412) "
+          f"repetidos, {contagem['erros']} erros em {contagem['segundos']:.2f}s; "
+          f"estoque final {final['estoque']}, esperado {esperado}, "
+          f"{esperado - final['estoque']} atualizações perdidas")
+    return final['estoque'] == esperado and contagem['erros'] == 0
+
+
+def cenario_pecas_ordem(requisitar, args):
+    sufixo = time.time_ns()
+    _, _, cliente = requisitar('POST', '/clientes', {'nome': f'Contenção {sufixo}'})
+    _, _, veiculo = requisitar('POST', '/veiculos', {'placa': f'C{sufixo % 10 ** 6:06d}', 'cliente_id': cliente['id']})
+    _, _, ordem = requisitar('POST', '/ordens_servico', {
+        'cliente_id': cliente['id'], 'veiculo_id': veiculo['id'], 'valor_mao_obra': 100.0
+    })
+    estoque_inicial = args.clientes * args.incrementos
+    _, _, peca = requisitar('POST', '/pecas', {
+        'nome': f'Contenção ordem {sufixo}', 'preco_unitario': 2.5, 'estoque': estoque_inicial
+    })
+
+    def trabalho():
+        parcial = {'gravacoes': 0, 'conflitos': 0, 'erros': 0}
+        for _ in range(args.incrementos):
+            while True:
+                status, _, _ = requisitar('POST', f"/ordens_servico/{ordem['id']}/pecas", {
+                    'peca_id': peca['id'], 'quantidade': 1
+                })
+                if status == 201:
+                    parcial['gravacoes'] += 1
+                    break
+                if status == 409:
+                    parcial['conflitos'] += 1
+                    continue
+                parcial['erros'] += 1
+                break
+        return parcial
+
+    contagem = em_paralelo(args.clientes, trabalho)
+    _, _, final_peca = requisitar('GET', f"/pecas/{peca['id']}")
+    _, _, final_ordem = requisitar('GET', f"/ordens_servico/{ordem['id']}")
+    usadas = sum(item['quantidade'] for item in final_ordem['pecas_utilizadas'])
+    valor_esperado = 100.0 + sum(item['preco_total'] for item in final_ordem['pecas_utilizadas'])
+    print(f"pecas_ordem: {contagem['gravacoes']} peças adicionadas, {contagem['conflitos']} conflitos (409) "
+          f"repetidos, {contagem['erros']} erros em {contagem['segundos']:.2f}s; "
+          f"estoque {final_peca['estoque']} (esperado {estoque_inicial - usadas}), "
+          f"valor total {final_ordem['valor_total']:.2f} (esperado {valor_esperado:.2f})")
+    return (
+        usadas == contagem['gravacoes']
+        and final_peca['estoque'] == estoque_inicial - usadas
+        and abs(final_ordem['valor_total'] - valor_esperado) < 0.005
+        and contagem['erros'] == 0
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Base da API em execução (ex.: http://localhost:5000/api); sem ela, roda no processo')
+    parser.add_argument('--clientes', type=int, default=8, help='Requisições simultâneas')
+    parser.add_argument('--incrementos', type=int, default=25, help='Gravações bem-sucedidas por cliente')
+    parser.add_argument('--cenario', choices=['estoque', 'pecas_ordem', 'todos'], default='todos')
+    parser.add_argument('--sem-if-match', action='store_true', help='PUTs sem If-Match (mostra as atualizações perdidas)')
+    args = parser.parse_args()
+
+    requisitar = http_requisitar(args.url.rstrip('/')) if args.url else local_requisitar()
+    resultados = []
+    if args.cenario in ('estoque', 'todos'):
+        resultados.append(cenario_estoque(requisitar, args))
+    if args.cenario in ('pecas_ordem', 'todos'):
+        resultados.append(cenario_pecas_ordem(requisitar, args))
+
+    print('OK: nenhuma atualização perdida' if all(resultados) else 'FALHA: atualizações perdidas ou erros')
+    sys.exit(0 if all(resultados) else 1)
+
+
+if __name__ == '__main__':
+    main()
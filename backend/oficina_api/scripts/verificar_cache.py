@@ -0,0 +1,227 @@
+"""
+Verifica o backend Redis do cache (src/cache.py) e a invalidação por tags
+entre processos, sem precisar de um servidor Redis.
+
+Uso (com um substituto do Redis em memória):
+    python scripts/verificar_cache.py
+
+Uso (contra um Redis real):
+    python scripts/verificar_cache.py --redis-url redis://localhost:6379/15
+
+Verificações:
+    backend     get_many/set/incr/clear do RedisBackend, TTL e prefixo
+    workers     duas instâncias de Cache (dois workers do gunicorn) sobre o
+                mesmo Redis: a resposta gravada por uma é HIT na outra, e
+                invalidate() em uma faz a outra voltar a MISS
+    commits     um commit pela API invalida as tags das tabelas alteradas para
+                o outro worker, e os comandos de carga em lote (indexar-ordens,
+                recalcular-historicos) invalidam as rotas que leem o que
+                reconstroem
+"""
+
+import argparse
+import fnmatch
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RedisLocal:
+    """Substituto do cliente redis.Redis com os comandos usados pelo RedisBackend."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados = {}
+
+    def _valor(self, chave):
+        item = self._dados.get(chave)
+        if item is not None and item[1] is not None and item[1] <= time.time():
+            del self._dados[chave]
+            return None
+        return item
+
+    def mget(self, chaves):
+        with self._lock:
+            return [(self._valor(chave) or (None,))[0] for chave in chaves]
+
+    def set(self, chave, valor, ex=None):
+        if isinstance(valor, str):
+            valor = valor.encode('utf-8')
+        with self._lock:
+            self._dados[chave] = (valor, time.time() + ex if ex else None)
+
+    def incr(self, chave):
+        with self._lock:
+            item = self._valor(chave)
+            valor = int(item[0]) + 1 if item else 1
+            self._dados[chave] = (str(valor).encode(), item[1] if item else None)
+            return valor
+
+    def scan_iter(self, match='*'):
+        with self._lock:
+            return [chave for chave in list(self._dados) if fnmatch.fnmatchcase(chave, match)]
+
+    def delete(self, *chaves):
+        with self._lock:
+            return sum(self._dados.pop(chave, None) is not None for chave in chaves)
+
+
+def conferir(resultados, descricao, condicao):
+    print(f"{'ok   ' if condicao else 'FALHA'} {descricao}")
+    resultados.append(condicao)
+
+
+def verificar_backend(criar_backend, resultados):
+    from src.cache import RedisBackend
+
+    backend = criar_backend()
+    outro = RedisBackend(cliente=backend.cliente, prefixo=backend.prefixo.rstrip(':') + '-outro:')
+    conferir(resultados, 'get_many sem chaves retorna lista vazia', backend.get_many([]) == [])
+    conferir(resultados, 'chave ausente retorna None', backend.get_many(['ausente']) == [None])
+
+    backend.set('a', b'{"x": 1}', 300)
+    backend.set('b', b'{"x": 2}', 0)
+    conferir(resultados, 'set/get_many na ordem das chaves',
+             backend.get_many(['b', 'ausente', 'a']) == [b'{"x": 2}', None, b'{"x": 1}'])
+
+    conferir(resultados, 'incr começa em 1 e incrementa',
+             [backend.incr('tag:t'), backend.incr('tag:t'), backend.incr('tag:t')] == [1, 2, 3])
+    conferir(resultados, 'versão da tag lida por get_many', int(backend.get_many(['tag:t'])[0]) == 3)
+
+    backend.set('curta', b'1', 1)
+    time.sleep(1.1)
+    conferir(resultados, 'entrada expira após o TTL', backend.get_many(['curta']) == [None])
+
+    outro.set('a', b'outro', 300)
+    backend.clear()
+    conferir(resultados, 'clear remove as chaves do prefixo', backend.get_many(['a', 'b', 'tag:t']) == [None] * 3)
+    conferir(resultados, 'clear preserva as chaves de outro prefixo', outro.get_many(['a']) == [b'outro'])
+    outro.clear()
+
+
+def verificar_workers(criar_backend, resultados):
+    from flask import Flask, jsonify
+    from src.cache import Cache
+
+    backend = criar_backend()
+    leituras = {'clientes': 0}
+
+    def criar_worker():
+        app = Flask(__name__)
+        instancia = Cache()
+        instancia.init_app(app, backend=criar_backend(backend.cliente, backend.prefixo))
+
+        @app.route('/clientes')
+        @instancia.cached('clientes')
+        def listar_clientes():
+            leituras['clientes'] += 1
+            return jsonify({'leitura': leituras['clientes']})
+        return app.test_client(), instancia
+
+    worker_a, cache_a = criar_worker()
+    worker_b, cache_b = criar_worker()
+
+    primeira = worker_a.get('/clientes')
+    segunda = worker_a.get('/clientes')
+    outra = worker_b.get('/clientes')
+    conferir(resultados, 'worker A: MISS e depois HIT',
+             (primeira.headers['X-Cache'], segunda.headers['X-Cache']) == ('MISS', 'HIT'))
+    conferir(resultados, 'worker B encontra a resposta gravada pelo worker A',
+             outra.headers['X-Cache'] == 'HIT' and outra.get_json() == primeira.get_json())
+
+    cache_b.invalidate('clientes')
+    depois = worker_a.get('/clientes')
+    conferir(resultados, 'invalidate no worker B faz o worker A voltar a MISS',
+             depois.headers['X-Cache'] == 'MISS' and depois.get_json()['leitura'] == 2)
+    conferir(resultados, 'nova resposta do worker A é HIT no worker B',
+             worker_b.get('/clientes').headers['X-Cache'] == 'HIT')
+    cache_a.invalidate('pecas')
+    conferir(resultados, 'tag sem relação não invalida', worker_b.get('/clientes').headers['X-Cache'] == 'HIT')
+    backend.clear()
+
+
+def verificar_commits(criar_backend, resultados):
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cache.db')}")
+    os.environ.setdefault('CACHE_BACKEND', 'nenhum')
+    os.environ.setdefault('TAREFAS_WORKERS', '0')
+    from src.main import app
+    from src.cache import Cache, cache
+
+    backend = criar_backend()
+    cache.init_app(app, backend=backend)
+    outro_worker = Cache()
+    outro_worker.init_app(app, backend=criar_backend(backend.cliente, backend.prefixo))
+    cliente_http = app.test_client()
+
+    antes = outro_worker._versoes(('clientes',))
+    cliente_http.get('/api/clientes')
+    conferir(resultados, 'listagem em cache após a primeira leitura',
+             cliente_http.get('/api/clientes').headers['X-Cache'] == 'HIT')
+    cliente = cliente_http.post('/api/clientes', json={'nome': f'Cache {time.time_ns()}'}).get_json()
+    conferir(resultados, 'commit pela API incrementa a tag vista pelo outro worker',
+             outro_worker._versoes(('clientes',)) != antes)
+    resposta = cliente_http.get('/api/clientes')
+    conferir(resultados, 'listagem volta a MISS e traz o cliente novo',
+             resposta.headers['X-Cache'] == 'MISS'
+             and any(item['id'] == cliente['id'] for item in resposta.get_json()))
+
+    veiculo = cliente_http.post('/api/veiculos', json={
+        'placa': f'K{time.time_ns() % 10 ** 6:06d}', 'cliente_id': cliente['id']
+    }).get_json()
+    cliente_http.post('/api/ordens_servico', json={
+        'cliente_id': cliente['id'], 'veiculo_id': veiculo['id'], 'defeito_relatado': 'Freio rangendo'
+    })
+
+    cli = app.test_cli_runner()
+    rotas = [
+        ('indexar-ordens', '/api/ordens_servico/semelhantes?texto=freio'),
+        ('recalcular-historicos', f"/api/veiculos/{veiculo['id']}/historico"),
+        ('recalcular-historicos', f"/api/clientes/{cliente['id']}/historico")
+    ]
+    for comando, rota in rotas:
+        cliente_http.get(rota)
+        em_cache = cliente_http.get(rota).headers['X-Cache'] == 'HIT'
+        saida = cli.invoke(args=[comando])
+        depois = cliente_http.get(rota).headers['X-Cache']
+        conferir(resultados, f'{comando} invalida {rota.split("?")[0]}',
+                 em_cache and saida.exit_code == 0 and depois == 'MISS')
+    backend.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--redis-url', help='Redis real (use um banco vazio); sem ela, usa o substituto em memória')
+    parser.add_argument('--verificacao', choices=['backend', 'workers', 'commits', 'todas'], default='todas')
+    args = parser.parse_args()
+
+    from src.cache import RedisBackend
+
+    if args.redis_url:
+        import redis
+        cliente_padrao = redis.Redis.from_url(args.redis_url)
+    else:
+        cliente_padrao = RedisLocal()
+    prefixo_padrao = f'oficina:verificacao:{os.getpid()}:'
+
+    def criar_backend(cliente=None, prefixo=None):
+        return RedisBackend(cliente=cliente or cliente_padrao, prefixo=prefixo or prefixo_padrao)
+
+    resultados = []
+    if args.verificacao in ('backend', 'todas'):
+        verificar_backend(criar_backend, resultados)
+    if args.verificacao in ('workers', 'todas'):
+        verificar_workers(criar_backend, resultados)
+    if args.verificacao in ('commits', 'todas'):
+        verificar_commits(criar_backend, resultados)
+
+    print(f'OK: {len(resultados)} verificações' if all(resultados)
+          else f'FALHA: {resultados.count(False)} de {len(resultados)} verificações')
+    sys.exit(0 if all(resultados) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""
+Cache das respostas de relatórios e consultas de catálogo, compartilhado entre
+os workers do gunicorn.
+
+Backends (CACHE_BACKEND):
+    sqlite   arquivo SQLite local (CACHE_SQLITE_PATH), compartilhado pelos
+             processos da mesma máquina (padrão)
+    redis    servidor Redis (REDIS_URL); compartilhado entre máquinas
+    memoria  LRU no processo; só é consistente com um único worker
+    nenhum   desativa o cache
+
+A invalidação usa versões por tag: cada entrada é gravada sob as versões
+atuais das suas tags (nomes de tabelas, ex.: "clientes") e um commit que
+altera uma tabela incrementa a versão da tag correspondente. As entradas
+antigas deixam de ser encontradas e somem por TTL ou LRU.
+"""
+
+import collections
+import functools
+import itertools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+from flask import Response, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class MemoryBackend:
+    """
+    LRU em memória com TTL por entrada.
+
+    Os contadores de incr() (versões das tags) ficam fora do LRU: se uma tag
+    fosse descartada, voltaria a contar de 0 e revalidaria entradas gravadas
+    sob uma versão antiga.
+    """
+
+    nome = 'memoria'
+
+    def __init__(self, max_entradas=1000):
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._dados = collections.OrderedDict()
+        self._contadores = {}
+
+    def get_many(self, chaves):
+        agora = time.time()
+        valores = []
+        with self._lock:
+            for chave in chaves:
+                if chave in self._contadores:
+                    valores.append(self._contadores[chave])
+                    continue
+                item = self._dados.get(chave)
+                if item is None or (item[1] is not None and item[1] < agora):
+                    valores.append(None)
+                    continue
+                self._dados.move_to_end(chave)
+                valores.append(item[0])
+        return valores
+
+    def set(self, chave, valor, ttl):
+        with self._lock:
+            self._dados[chave] = (valor, time.time() + ttl if ttl else None)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+
+    def incr(self, chave):
+        with self._lock:
+            valor = self._contadores.get(chave, 0) + 1
+            self._contadores[chave] = valor
+            return valor
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+            self._contadores.clear()
+
+
+class SQLiteBackend:
+    """Arquivo SQLite em modo WAL, compartilhado pelos processos da máquina."""
+
+    nome = 'sqlite'
+
+    def __init__(self, caminho, max_entradas=10000):
+        self.caminho = caminho
+        self.max_entradas = max_entradas
+        self._local = threading.local()
+        self._escritas = itertools.count()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=5.0, isolation_level=None)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            conexao.execute(
+                'CREATE TABLE IF NOT EXISTS cache (chave TEXT PRIMARY KEY, valor BLOB, expira REAL)'
+            )
+            self._local.conexao = conexao
+        return conexao
+
+    def get_many(self, chaves):
+        if not chaves:
+            return []
+        marcadores = ','.join('?' * len(chaves))
+        linhas = dict(
+            (chave, (valor, expira)) for chave, valor, expira in self._conexao().execute(
+                f'SELECT chave, valor, expira FROM cache WHERE chave IN ({marcadores})', chaves
+            )
+        )
+        agora = time.time()
+        valores = []
+        for chave in chaves:
+            item = linhas.get(chave)
+            valores.append(None if item is None or (item[1] is not None and item[1] < agora) else item[0])
+        return valores
+
+    def set(self, chave, valor, ttl):
+        conexao = self._conexao()
+        conexao.execute(
+            'INSERT OR REPLACE INTO cache (chave, valor, expira) VALUES (?, ?, ?)',
+            (chave, valor, time.time() + ttl if ttl else None)
+        )
+        # Limpeza ocasional: entradas expiradas e excesso (as que expiram antes)
+        if next(self._escritas) % 100 == 0:
+            conexao.execute('DELETE FROM cache WHERE expira < ?', (time.time(),))
+            conexao.execute(
+                'DELETE FROM cache WHERE expira IS NOT NULL AND chave NOT IN '
+                '(SELECT chave FROM cache WHERE expira IS NOT NULL ORDER BY expira DESC LIMIT ?)',
+                (self.max_entradas,)
+            )
+
+    def incr(self, chave):
+        return self._conexao().execute(
+            'INSERT INTO cache (chave, valor, expira) VALUES (?, 1, NULL) '
+            'ON CONFLICT(chave) DO UPDATE SET valor = valor + 1 RETURNING valor',
+            (chave,)
+        ).fetchone()[0]
+
+    def clear(self):
+        self._conexao().execute('DELETE FROM cache')
+
+
+class RedisBackend:
+    """Redis (REDIS_URL). Aceita um cliente pronto, ex.: um substituto local nos testes."""
+
+    nome = 'redis'
+
+    def __init__(self, url=None, cliente=None, prefixo='oficina:cache:'):
+        if cliente is None:
+            import redis
+            cliente = redis.Redis.from_url(url)
+        self.cliente = cliente
+        self.prefixo = prefixo
+
+    def get_many(self, chaves):
+        if not chaves:
+            return []
+        return self.cliente.mget([self.prefixo + chave for chave in chaves])
+
+    def set(self, chave, valor, ttl):
+        self.cliente.set(self.prefixo + chave, valor, ex=int(ttl) if ttl else None)
+
+    def incr(self, chave):
+        return self.cliente.incr(self.prefixo + chave)
+
+    def clear(self):
+        for chave in self.cliente.scan_iter(match=self.prefixo + '*'):
+            self.cliente.delete(chave)
+
+
+class Cache:
+    def __init__(self):
+        self.backend = None
+        self.ttl = 300
+        self._lock = threading.Lock()
+        self._contadores = collections.defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self.erros = 0
+
+    def init_app(self, app, backend=None):
+        """
+        Configura o backend (CACHE_BACKEND, CACHE_TTL) e a invalidação
+        automática: após cada commit, as tags das tabelas alteradas na sessão
+        são invalidadas.
+        """
+        self.ttl = float(os.environ.get('CACHE_TTL', 300))
+        self.backend = backend if backend is not None else _criar_backend(os.environ.get('CACHE_BACKEND', 'sqlite'))
+        app.extensions['cache'] = self
+
+        if not event.contains(Session, 'after_commit', _invalidar_tabelas_alteradas):
+            event.listen(Session, 'after_flush', _registrar_tabelas_alteradas)
+            event.listen(Session, 'after_commit', _invalidar_tabelas_alteradas)
+            event.listen(Session, 'after_rollback', _descartar_tabelas_alteradas)
+
+    def _versoes(self, tags):
+        valores = self.backend.get_many([f'tag:{tag}' for tag in tags])
+        return ','.join(f'{tag}={int(valor or 0)}' for tag, valor in zip(tags, valores))
+
+    def invalidate(self, *tags):
+        """Incrementa a versão das tags; as entradas associadas deixam de valer."""
+        if self.backend is None:
+            return
+        for tag in tags:
+            try:
+                self.backend.incr(f'tag:{tag}')
+            except Exception:
+                self.erros += 1
+
+    def cached(self, *tags, ttl=None):
+        """
+        Decorador de rotas GET: guarda o corpo das respostas 200 por caminho e
+        parâmetros de consulta, sob as versões atuais das tags informadas.
+        A resposta traz X-Cache: HIT ou MISS.
+        """
+        tags = tuple(sorted(tags))
+
+        def decorador(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+
+                nome = view.__name__
+                consulta = urlencode(sorted(request.args.items(multi=True)))
+                try:
+                    chave = f'{nome}:{self._versoes(tags)}:{request.path}?{consulta}'
+                    corpo = self.backend.get_many([chave])[0]
+                except Exception:
+                    # Backend indisponível: atender sem cache
+                    self.erros += 1
+                    return view(*args, **kwargs)
+
+                if corpo is not None:
+                    self._contar(nome, 'hits')
+                    response = Response(corpo, status=200, mimetype='application/json')
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._contar(nome, 'misses')
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and response.mimetype == 'application/json':
+                    try:
+                        self.backend.set(chave, response.get_data(), ttl or self.ttl)
+                    except Exception:
+                        self.erros += 1
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorador
+
+    def _contar(self, nome, resultado):
+        with self._lock:
+            self._contadores[nome][resultado] += 1
+
+    def stats(self):
+        """Acertos e falhas por rota neste processo."""
+        with self._lock:
+            rotas = {nome: dict(contagem) for nome, contagem in self._contadores.items()}
+        hits = sum(contagem['hits'] for contagem in rotas.values())
+        misses = sum(contagem['misses'] for contagem in rotas.values())
+        return {
+            'backend': self.backend.nome if self.backend is not None else None,
+            'ttl': self.ttl,
+            'pid': os.getpid(),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'erros': self.erros,
+            'rotas': rotas
+        }
+
+
+def _criar_backend(nome):
+    if nome == 'nenhum':
+        return None
+    if nome == 'memoria':
+        return MemoryBackend(int(os.environ.get('CACHE_MAX_ENTRADAS', 1000)))
+    if nome == 'redis':
+        return RedisBackend(os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+    if nome == 'sqlite':
+        caminho = os.environ.get('CACHE_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'oficina_cache.db'))
+        return SQLiteBackend(caminho, int(os.environ.get('CACHE_MAX_ENTRADAS', 10000)))
+    raise ValueError(f'CACHE_BACKEND inválido: {nome} (use sqlite, redis, memoria ou nenhum)')
+
+
+def _registrar_tabelas_alteradas(session, flush_context):
+    tabelas = session.info.setdefault('tabelas_alteradas', set())
+    for objeto in itertools.chain(session.new, session.dirty, session.deleted):
+        tabela = getattr(objeto, '__tablename__', None)
+        if tabela:
+            tabelas.add(tabela)
+
+
+def _invalidar_tabelas_alteradas(session):
+    tabelas = session.info.pop('tabelas_alteradas', None)
+    if tabelas:
+        cache.invalidate(*tabelas)
+
+
+def _descartar_tabelas_alteradas(session):
+    session.info.pop('tabelas_alteradas', None)
+
+
+cache = Cache()
@@ -0,0 +1,138 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, update
+from src.models.oficina_models import db, OrdemServico, PecaUtilizada
+from src.tarefas import get_executor
+from src.cache import cache
+from src import indice_texto, historico, previsao, versoes
+
+@click.command('verificar-totais')
+@click.option('--corrigir', is_flag=True, help='Grava os totais recalculados nas ordens divergentes')
+@click.option('--tolerancia', default=0.005, show_default=True, help='Diferença máxima aceita, em reais')
+@with_appcontext
+def verificar_totais(corrigir, tolerancia):
+    """
+    Recalcula o valor_total de todas as ordens de serviço e relata divergências.
+
+    Uso: flask --app src.main verificar-totais [--corrigir]
+
+    O valor esperado (mão de obra + soma das peças) vem de uma única consulta
+    agregada; sem --corrigir o comando termina com código 1 se houver
+    divergência.
+    """
+    valor_pecas = db.session.query(
+        PecaUtilizada.ordem_servico_id.label('ordem_servico_id'),
+        func.sum(PecaUtilizada.preco_total).label('valor_pecas')
+    ).group_by(PecaUtilizada.ordem_servico_id).subquery()
+
+    linhas = db.session.query(
+        OrdemServico.id,
+        OrdemServico.valor_mao_obra,
+        OrdemServico.valor_total,
+        func.coalesce(valor_pecas.c.valor_pecas, 0.0)
+    ).outerjoin(valor_pecas, valor_pecas.c.ordem_servico_id == OrdemServico.id).order_by(OrdemServico.id).all()
+
+    divergentes = []
+    for ordem_id, valor_mao_obra, valor_total, soma_pecas in linhas:
+        esperado = (valor_mao_obra or 0.0) + soma_pecas
+        registrado = valor_total or 0.0
+        if abs(esperado - registrado) > tolerancia:
+            divergentes.append({'id': ordem_id, 'registrado': registrado, 'valor_total': esperado})
+
+    for ordem in divergentes:
+        click.echo(f"OS {ordem['id']}: registrado {ordem['registrado']:.2f}, "
+                   f"esperado {ordem['valor_total']:.2f} "
+                   f"(diferença {ordem['valor_total'] - ordem['registrado']:+.2f})")
+    click.echo(f'{len(linhas)} ordens verificadas, {len(divergentes)} com divergência')
+
+    if not divergentes:
+        return
+    if not corrigir:
+        raise SystemExit(1)
+
+    db.session.execute(
+        update(OrdemServico),
+        [{'id': ordem['id'], 'valor_total': ordem['valor_total']} for ordem in divergentes]
+    )
+    # ETags lidos antes da correção deixam de valer (If-Match responde 412)
+    versoes.incrementar_todos(OrdemServico, [ordem['id'] for ordem in divergentes])
+    afetadas = db.session.query(OrdemServico.veiculo_id, OrdemServico.cliente_id).filter(
+        OrdemServico.id.in_([ordem['id'] for ordem in divergentes])
+    ).all()
+    historico.atualizar(
+        veiculos=[veiculo_id for veiculo_id, _ in afetadas],
+        clientes=[cliente_id for _, cliente_id in afetadas]
+    )
+    db.session.commit()
+    # UPDATE em lote não passa pelos eventos da sessão que invalidam o cache
+    cache.invalidate('ordens_servico', 'resumos_veiculos', 'resumos_clientes')
+    click.echo(f'{len(divergentes)} ordens corrigidas')
+
+@click.command('executar-tarefas')
+@click.option('--continuo', is_flag=True, help='Continua aguardando novas tarefas em vez de sair quando a fila esvaziar')
+@click.option('--intervalo', default=2.0, show_default=True, help='Segundos entre consultas à fila no modo contínuo')
+@with_appcontext
+def executar_tarefas(continuo, intervalo):
+    """
+    Executa as tarefas pendentes neste processo (worker dedicado).
+
+    Uso: flask --app src.main executar-tarefas --continuo
+
+    Combine com TAREFAS_WORKERS=0 nos processos web para que relatórios
+    pesados nunca rodem no mesmo processo que atende as requisições.
+    """
+    executadas = get_executor().processar(continuo=continuo, intervalo=intervalo)
+    click.echo(f'{executadas} tarefas executadas')
+
+@click.command('limpar-tarefas')
+@with_appcontext
+def limpar_tarefas():
+    """Remove os arquivos de resultado expirados (TAREFAS_TTL_HORAS)."""
+    click.echo(f'{get_executor().limpar_expiradas()} resultados expirados removidos')
+
+@click.command('indexar-ordens')
+@with_appcontext
+def indexar_ordens():
+    """
+    Reconstrói o índice de texto usado na busca de ordens semelhantes.
+
+    Uso: flask --app src.main indexar-ordens
+
+    O índice é mantido pelas rotas; o comando serve para a primeira carga e
+    para ordens gravadas por fora da API.
+    """
+    indexadas = indice_texto.reconstruir()
+    # Gravações em lote: invalidar à mão as buscas de ordens semelhantes
+    cache.invalidate('termos_ordens_servico', 'frequencia_termos')
+    click.echo(f'{indexadas} ordens indexadas')
+
+@click.command('recalcular-historicos')
+@with_appcontext
+def recalcular_historicos():
+    """
+    Recalcula os resumos do histórico de todos os veículos e clientes.
+
+    Uso: flask --app src.main recalcular-historicos
+
+    Os resumos são mantidos pelas rotas; o comando serve para a primeira carga
+    e para dados gravados por fora da API.
+    """
+    veiculos, clientes = historico.recalcular_todos()
+    # Gravações em lote: invalidar à mão os históricos em cache
+    cache.invalidate('resumos_veiculos', 'resumos_clientes')
+    click.echo(f'{veiculos} veículos e {clientes} clientes recalculados')
+
+@click.command('calcular-previsoes')
+@with_appcontext
+def calcular_previsoes():
+    """
+    Recalcula o consumo previsto e o ponto de pedido de todas as peças.
+
+    Uso: flask --app src.main calcular-previsoes
+
+    Pensado para rodar uma vez por dia (cron); também disponível como a tarefa
+    previsao_estoque em POST /api/tarefas.
+    """
+    resultado = previsao.calcular()
+    click.echo(f"{resultado['pecas']} peças calculadas em {resultado['segundos']}s, "
+               f"{resultado['no_ponto_de_pedido']} no ponto de pedido")
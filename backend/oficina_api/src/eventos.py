@@ -0,0 +1,169 @@
+"""
+Feed de alterações das ordens de serviço (criação, mudança de status,
+atualização e exclusão) distribuído às telas conectadas por SSE.
+
+As rotas publicam um evento depois de cada commit; o broker o entrega a todas
+as assinaturas abertas no processo. Com REDIS_URL configurada, os eventos
+passam por um canal pub/sub do Redis, de modo que as telas conectadas a
+qualquer worker do gunicorn recebem as alterações feitas em todos eles.
+"""
+
+import collections
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+
+from flask import current_app
+
+
+class Assinatura:
+    """Fila de eventos de uma conexão SSE."""
+
+    def __init__(self, broker, tamanho_fila):
+        self._broker = broker
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self.excedida = False
+        # False se o histórico não cobre os eventos desde o Last-Event-ID
+        # (evento antigo demais ou processo reiniciado): a tela recarrega a lista
+        self.continua = False
+
+    def _entregar(self, evento):
+        try:
+            self._fila.put_nowait(evento)
+        except queue.Full:
+            # Cliente lento: a conexão é encerrada e o navegador reconecta
+            # com Last-Event-ID, recebendo os eventos perdidos do histórico
+            self.excedida = True
+
+    def get(self, timeout=None):
+        """Próximo evento, ou None se nada chegou dentro do timeout."""
+        try:
+            return self._fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker._remover(self)
+
+
+class EventBroker:
+    """Broker em memória: fan-out para as assinaturas deste processo."""
+
+    def __init__(self, historico=1000, tamanho_fila=256):
+        self.tamanho_fila = tamanho_fila
+        self._lock = threading.Lock()
+        self._assinaturas = set()
+        self._historico = collections.deque(maxlen=historico)
+        self._ids = itertools.count(1)
+
+    def _proximo_id(self):
+        return next(self._ids)
+
+    def publicar(self, tipo, dados):
+        """Publica um evento {"id", "tipo", "dados", "timestamp"}."""
+        evento = {'id': self._proximo_id(), 'tipo': tipo, 'dados': dados, 'timestamp': time.time()}
+        self._distribuir(evento)
+        return evento
+
+    def _distribuir(self, evento):
+        with self._lock:
+            self._historico.append(evento)
+            assinaturas = list(self._assinaturas)
+        for assinatura in assinaturas:
+            assinatura._entregar(evento)
+
+    def assinar(self, ultimo_id=None):
+        """
+        Abre uma assinatura; com ultimo_id, os eventos posteriores a ele que
+        ainda estão no histórico são entregues primeiro.
+        """
+        assinatura = Assinatura(self, self.tamanho_fila)
+        with self._lock:
+            if ultimo_id is not None:
+                primeiro = self._historico[0]['id'] if self._historico else None
+                ultimo = self._historico[-1]['id'] if self._historico else 0
+                assinatura.continua = ultimo_id <= ultimo and (primeiro is None or ultimo_id >= primeiro - 1)
+                for evento in self._historico:
+                    if evento['id'] > ultimo_id:
+                        assinatura._entregar(evento)
+            self._assinaturas.add(assinatura)
+        return assinatura
+
+    def _remover(self, assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+
+class RedisEventBroker(EventBroker):
+    """
+    Broker entre workers: os eventos são publicados em um canal do Redis e uma
+    thread por processo os repassa às assinaturas locais. Os ids vêm de um
+    contador no Redis, válidos para Last-Event-ID em qualquer worker.
+    """
+
+    def __init__(self, url, canal='oficina:ordens_servico', **kwargs):
+        super().__init__(**kwargs)
+        import redis
+
+        self.canal = canal
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(canal)
+        self._thread = threading.Thread(target=self._escutar, daemon=True)
+        self._thread.start()
+
+    def _proximo_id(self):
+        return self._redis.incr(f'{self.canal}:seq')
+
+    def publicar(self, tipo, dados):
+        evento = {'id': self._proximo_id(), 'tipo': tipo, 'dados': dados, 'timestamp': time.time()}
+        # A entrega local também acontece pela thread de escuta, na ordem do canal
+        self._redis.publish(self.canal, json.dumps(evento))
+        return evento
+
+    def _escutar(self):
+        while True:
+            try:
+                for mensagem in self._pubsub.listen():
+                    if mensagem['type'] == 'message':
+                        self._distribuir(json.loads(mensagem['data']))
+            except Exception:
+                # Conexão perdida: tentar reassinar o canal
+                time.sleep(1.0)
+                try:
+                    self._pubsub.subscribe(self.canal)
+                except Exception:
+                    pass
+
+
+_broker_lock = threading.Lock()
+_broker = None
+
+
+def get_broker():
+    """Broker do processo: Redis se REDIS_URL estiver configurada, senão em memória."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            opcoes = {
+                'historico': int(os.environ.get('EVENTOS_HISTORICO', 1000)),
+                'tamanho_fila': int(os.environ.get('EVENTOS_FILA', 256))
+            }
+            redis_url = os.environ.get('REDIS_URL')
+            _broker = RedisEventBroker(redis_url, **opcoes) if redis_url else EventBroker(**opcoes)
+        return _broker
+
+
+def publicar_evento(tipo, dados):
+    """
+    Publica um evento depois do commit da alteração. Falhas do broker são
+    registradas no log e não afetam a resposta da requisição.
+    """
+    try:
+        return get_broker().publicar(tipo, dados)
+    except Exception as e:
+        current_app.logger.warning('Falha ao publicar evento %s: %s', tipo, e)
+        return None
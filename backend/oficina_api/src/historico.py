@@ -0,0 +1,170 @@
+"""
+Histórico de atendimento por veículo e por cliente.
+
+Os agregados (visitas, total gasto, primeira e última visita e, no veículo,
+a evolução da quilometragem) ficam nas tabelas resumos_veiculos e
+resumos_clientes. As rotas que alteram ordens de serviço, peças utilizadas ou
+veículos chamam atualizar() antes do commit, que recalcula os resumos
+afetados com agregações sobre os índices por veículo e por cliente; a
+consulta do histórico apenas os lê.
+"""
+
+import math
+from datetime import date
+
+from flask import request
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+from src.models.oficina_models import (
+    db, upsert, OrdemServico, PecaUtilizada, Veiculo, LeituraQuilometragem, ResumoVeiculo, ResumoCliente
+)
+
+
+def registrar_quilometragem(veiculo, quilometragem, data=None, ordem_servico_id=None):
+    """Grava uma leitura do hodômetro e a torna a quilometragem atual do veículo."""
+    if quilometragem is None:
+        return
+    veiculo.quilometragem = quilometragem
+    db.session.add(LeituraQuilometragem(
+        veiculo_id=veiculo.id,
+        quilometragem=quilometragem,
+        data=data or date.today(),
+        ordem_servico_id=ordem_servico_id
+    ))
+
+
+def atualizar(veiculos=(), clientes=()):
+    """Recalcula os resumos dos veículos e clientes informados (ids)."""
+    for veiculo_id in set(veiculos) - {None}:
+        _gravar(ResumoVeiculo, 'veiculo_id', veiculo_id, calcular_resumo_veiculo(veiculo_id))
+    for cliente_id in set(clientes) - {None}:
+        _gravar(ResumoCliente, 'cliente_id', cliente_id, calcular_resumo_cliente(cliente_id))
+
+
+def remover(veiculo_id=None, cliente_id=None, ordem_servico_id=None):
+    """
+    Chamado antes de excluir um veículo, cliente ou ordem de serviço: apaga o
+    resumo (e as leituras do veículo); as leituras de uma ordem excluída
+    continuam no histórico do veículo, sem a ordem.
+    """
+    if ordem_servico_id is not None:
+        LeituraQuilometragem.query.filter_by(ordem_servico_id=ordem_servico_id).update(
+            {'ordem_servico_id': None}, synchronize_session=False
+        )
+    if veiculo_id is not None:
+        LeituraQuilometragem.query.filter_by(veiculo_id=veiculo_id).delete(synchronize_session=False)
+        ResumoVeiculo.query.filter_by(veiculo_id=veiculo_id).delete(synchronize_session=False)
+    if cliente_id is not None:
+        ResumoCliente.query.filter_by(cliente_id=cliente_id).delete(synchronize_session=False)
+
+
+def _gravar(modelo, chave, valor, resumo):
+    comando = upsert(modelo).values({chave: valor, **resumo})
+    db.session.execute(comando.on_conflict_do_update(index_elements=[chave], set_=resumo))
+
+
+def _agregados_ordens(coluna, valor):
+    visitas, total_gasto, primeira, ultima = db.session.query(
+        func.count(OrdemServico.id),
+        func.coalesce(func.sum(OrdemServico.valor_total), 0.0),
+        func.min(OrdemServico.data_entrada),
+        func.max(OrdemServico.data_entrada)
+    ).filter(coluna == valor).one()
+    return {'visitas': visitas, 'total_gasto': total_gasto, 'primeira_visita': primeira, 'ultima_visita': ultima}
+
+
+def calcular_resumo_veiculo(veiculo_id):
+    """Agregados do veículo calculados a partir das ordens e das leituras."""
+    resumo = _agregados_ordens(OrdemServico.veiculo_id, veiculo_id)
+
+    leituras = LeituraQuilometragem.query.filter_by(veiculo_id=veiculo_id)
+    primeira = leituras.order_by(LeituraQuilometragem.data, LeituraQuilometragem.id).first()
+    ultima = leituras.order_by(LeituraQuilometragem.data.desc(), LeituraQuilometragem.id.desc()).first()
+    if primeira is None:
+        # Veículo sem leituras registradas: apenas o valor do cadastro
+        atual = db.session.query(Veiculo.quilometragem).filter(Veiculo.id == veiculo_id).scalar()
+        resumo.update(quilometragem_inicial=atual, quilometragem_atual=atual, km_por_mes=None)
+        return resumo
+
+    dias = (ultima.data - primeira.data).days
+    resumo.update(
+        quilometragem_inicial=primeira.quilometragem,
+        quilometragem_atual=ultima.quilometragem,
+        km_por_mes=round((ultima.quilometragem - primeira.quilometragem) / dias * 30.0, 1) if dias >= 30 else None
+    )
+    return resumo
+
+
+def calcular_resumo_cliente(cliente_id):
+    """Agregados do cliente calculados a partir das suas ordens e veículos."""
+    resumo = _agregados_ordens(OrdemServico.cliente_id, cliente_id)
+    resumo['veiculos'] = db.session.query(func.count(Veiculo.id)).filter(Veiculo.cliente_id == cliente_id).scalar()
+    return resumo
+
+
+def resumo_veiculo(veiculo_id):
+    """Resumo gravado do veículo (calculado na hora se ainda não existir)."""
+    resumo = db.session.get(ResumoVeiculo, veiculo_id)
+    return resumo.to_dict() if resumo else ResumoVeiculo(**calcular_resumo_veiculo(veiculo_id)).to_dict()
+
+
+def resumo_cliente(cliente_id):
+    """Resumo gravado do cliente (calculado na hora se ainda não existir)."""
+    resumo = db.session.get(ResumoCliente, cliente_id)
+    return resumo.to_dict() if resumo else ResumoCliente(**calcular_resumo_cliente(cliente_id)).to_dict()
+
+
+def leituras(veiculo_id):
+    """Leituras do hodômetro do veículo, da mais antiga à mais recente."""
+    return [
+        leitura.to_dict() for leitura in LeituraQuilometragem.query.filter_by(veiculo_id=veiculo_id)
+        .order_by(LeituraQuilometragem.data, LeituraQuilometragem.id)
+    ]
+
+
+def pagina_ordens(filtro, total):
+    """
+    Página de ordens de serviço (mais recentes primeiro) com as peças, em duas
+    consultas. Lê ?pagina= e ?por_pagina= (padrão 20, máximo 100); total é o
+    número de visitas do resumo, sem COUNT sobre as ordens.
+    """
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    por_pagina = min(max(request.args.get('por_pagina', 20, type=int), 1), 100)
+    ordens = OrdemServico.query.options(
+        joinedload(OrdemServico.cliente),
+        joinedload(OrdemServico.veiculo),
+        selectinload(OrdemServico.pecas_utilizadas).joinedload(PecaUtilizada.peca)
+    ).filter(filtro).order_by(
+        OrdemServico.data_entrada.desc(), OrdemServico.id.desc()
+    ).offset((pagina - 1) * por_pagina).limit(por_pagina).all()
+
+    itens = []
+    for ordem in ordens:
+        ordem_dict = ordem.to_dict()
+        ordem_dict['pecas_utilizadas'] = [peca.to_dict() for peca in ordem.pecas_utilizadas]
+        itens.append(ordem_dict)
+    return {
+        'ordens_servico': itens,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'total': total,
+        'paginas': math.ceil(total / por_pagina)
+    }
+
+
+def recalcular_todos():
+    """
+    Recria todos os resumos, em uma transação (primeira carga ou dados
+    gravados por fora da API).
+
+    Returns:
+        tuple: (veículos, clientes) recalculados
+    """
+    ResumoVeiculo.query.delete(synchronize_session=False)
+    ResumoCliente.query.delete(synchronize_session=False)
+    veiculos = [id for (id,) in db.session.query(Veiculo.id)]
+    clientes = [id for (id,) in db.session.query(Veiculo.cliente_id).distinct()]
+    clientes += [id for (id,) in db.session.query(OrdemServico.cliente_id).distinct()]
+    atualizar(veiculos=veiculos, clientes=clientes)
+    db.session.commit()
+    return len(veiculos), len(set(clientes))
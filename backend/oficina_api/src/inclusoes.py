@@ -0,0 +1,97 @@
+"""
+Relações embutidas nas respostas de detalhe e listagem (?include=).
+
+Ex.: GET /api/ordens_servico/1?include=pecas,veiculo,cliente devolve a ordem
+com as peças utilizadas, o veículo e o cliente, para a tela renderizar a
+partir de uma requisição. Cada relação pedida é carregada com selectinload:
+uma consulta por relação (com IN sobre as chaves já lidas), qualquer que seja
+o número de registros da listagem.
+"""
+
+from flask import request
+from sqlalchemy.orm import selectinload
+from src.models.oficina_models import Cliente, Veiculo, OrdemServico, PecaUtilizada, FerramentaOrdemServico
+
+
+def _lista(relacao):
+    return lambda objeto: [item.to_dict() for item in getattr(objeto, relacao)]
+
+
+def _objeto(relacao):
+    def serializar(objeto):
+        item = getattr(objeto, relacao)
+        return item.to_dict() if item else None
+    return serializar
+
+
+# Relações lidas pelo to_dict() de cada modelo, carregadas sempre
+BASE = {
+    OrdemServico: lambda: [selectinload(OrdemServico.cliente), selectinload(OrdemServico.veiculo)],
+    Cliente: lambda: [],
+    Veiculo: lambda: [selectinload(Veiculo.cliente)]
+}
+
+# Por modelo: nome aceito em ?include= -> (opções de carga, chave na resposta, serialização)
+RELACOES = {
+    OrdemServico: {
+        'cliente': (lambda: [], 'cliente', _objeto('cliente')),
+        'veiculo': (lambda: [], 'veiculo', _objeto('veiculo')),
+        'pecas': (
+            lambda: [selectinload(OrdemServico.pecas_utilizadas).selectinload(PecaUtilizada.peca)],
+            'pecas_utilizadas', _lista('pecas_utilizadas')
+        ),
+        'ferramentas': (
+            lambda: [selectinload(OrdemServico.ferramentas).selectinload(FerramentaOrdemServico.ferramenta)],
+            'ferramentas', _lista('ferramentas')
+        )
+    },
+    Cliente: {
+        'veiculos': (lambda: [selectinload(Cliente.veiculos)], 'veiculos', _lista('veiculos')),
+        # O cliente da ordem já está na sessão; só o veículo precisa de consulta
+        'ordens_servico': (
+            lambda: [selectinload(Cliente.ordens_servico).selectinload(OrdemServico.veiculo)],
+            'ordens_servico', _lista('ordens_servico')
+        )
+    },
+    Veiculo: {
+        'cliente': (lambda: [], 'cliente', _objeto('cliente')),
+        'ordens_servico': (
+            lambda: [selectinload(Veiculo.ordens_servico).selectinload(OrdemServico.cliente)],
+            'ordens_servico', _lista('ordens_servico')
+        )
+    }
+}
+
+
+def ler(modelo, padrao=()):
+    """
+    Relações pedidas em ?include= (separadas por vírgula), mais as incluídas
+    por padrão na rota.
+
+    Raises:
+        ValueError: Relação desconhecida para o modelo
+    """
+    nomes = [nome.strip() for nome in request.args.get('include', '').split(',') if nome.strip()]
+    desconhecidas = [nome for nome in nomes if nome not in RELACOES[modelo]]
+    if desconhecidas:
+        raise ValueError(
+            f"include inválido: {', '.join(desconhecidas)} (use {', '.join(RELACOES[modelo])})"
+        )
+    return list(dict.fromkeys([*padrao, *nomes]))
+
+
+def opcoes(modelo, nomes):
+    """Opções de carga (query.options) para as relações informadas."""
+    carregar = BASE[modelo]()
+    for nome in nomes:
+        carregar.extend(RELACOES[modelo][nome][0]())
+    return carregar
+
+
+def serializar(objeto, nomes):
+    """to_dict() do objeto com as relações informadas embutidas."""
+    dados = objeto.to_dict()
+    for nome in nomes:
+        _, chave, valor = RELACOES[type(objeto)][nome]
+        dados[chave] = valor(objeto)
+    return dados
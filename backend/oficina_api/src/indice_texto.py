@@ -0,0 +1,237 @@
+"""
+Índice de texto das ordens de serviço para encontrar reparos semelhantes.
+
+O defeito relatado e os serviços a realizar de cada ordem viram um vetor
+TF-IDF guardado em um índice invertido (tabela termos_ordens_servico: termo,
+ordem, peso), mantido pelas rotas a cada criação, alteração e exclusão de
+ordem. A frequência de cada termo (em quantas ordens ele aparece) fica na
+tabela frequencia_termos, de modo que o IDF de uma consulta sai de poucas
+linhas e não de uma contagem sobre todas as ordens.
+
+Ponderação lnc.ltc: na ordem, 1 + log(tf) normalizado pela norma do vetor;
+na consulta, 1 + log(tf) vezes log(1 + N/df), também normalizado. A
+similaridade é o produto interno, calculado no banco em uma consulta de duas
+etapas: as candidatas são as ordens de maior peso em cada termo pesquisado
+(INDICE_CANDIDATOS divididas entre os termos conforme o peso na consulta,
+lidas do índice por termo e peso, sem percorrer a lista inteira de termos
+comuns como "barulho"), e só elas recebem a soma exata. A busca é, portanto,
+aproximada: uma ordem com pesos medianos em todos os termos pode ficar de
+fora; aumentar INDICE_CANDIDATOS troca tempo por cobertura.
+"""
+
+import collections
+import math
+import os
+import re
+import unicodedata
+
+from sqlalchemy import case, desc, insert, select, union
+from src.models.oficina_models import db, upsert, OrdemServico, TermoOrdemServico, FrequenciaTermo
+
+# Linha de frequencia_termos com o total de ordens indexadas (N do IDF)
+TOTAL = '*'
+
+# Ordens candidatas por consulta, divididas entre os termos pesquisados
+CANDIDATOS = int(os.environ.get('INDICE_CANDIDATOS', 3000))
+
+_PALAVRA = re.compile(r'[a-z0-9]+')
+
+STOPWORDS = frozenset('''
+    a o as os um uma uns umas ao aos de da do das dos em na no nas nos num numa
+    por pela pelo pelas pelos para pra com sem sob sobre entre ate apos e ou mas
+    que se como quando onde qual quais quem cujo porque pois ja nao sim muito
+    muita muitos muitas pouco mais menos bem mal tambem so apenas ainda sempre
+    nunca foi era sao ser estar esta estao estava tem ter tinha teve fica ficou
+    faz fazer feito ele ela eles elas isso isto esse essa este aquele aquela
+    seu sua seus suas meu minha lhe the cliente carro veiculo
+'''.split())
+
+
+def tokenizar(texto):
+    """
+    Separa o texto em termos: minúsculas sem acentos, sem stopwords, com
+    plural simples reduzido ao singular ("freios" -> "freio").
+    """
+    if not texto:
+        return []
+    texto = unicodedata.normalize('NFKD', texto.lower()).encode('ascii', 'ignore').decode('ascii')
+    termos = []
+    for palavra in _PALAVRA.findall(texto):
+        if palavra in STOPWORDS or (len(palavra) < 3 and not any(c.isdigit() for c in palavra)):
+            continue
+        if len(palavra) > 4 and palavra.endswith('s') and not palavra.endswith('ss'):
+            palavra = palavra[:-1]
+        termos.append(palavra[:40])
+    return termos
+
+
+def vetor(texto):
+    """Vetor normalizado {termo: (1 + log tf) / norma} do texto."""
+    contagem = collections.Counter(tokenizar(texto))
+    pesos = {termo: 1.0 + math.log(tf) for termo, tf in contagem.items()}
+    norma = math.sqrt(sum(peso * peso for peso in pesos.values()))
+    return {termo: peso / norma for termo, peso in pesos.items()}
+
+
+def texto_ordem(ordem):
+    """Texto indexado de uma ordem de serviço."""
+    return '\n'.join(filter(None, (ordem.defeito_relatado, ordem.servicos_a_realizar)))
+
+
+def indexar(ordem):
+    """
+    Atualiza o índice com o texto atual da ordem (chamar antes do commit,
+    com a ordem já com id; em criações, depois de um flush).
+    """
+    novo = vetor(texto_ordem(ordem))
+    antigo = dict(
+        db.session.query(TermoOrdemServico.termo, TermoOrdemServico.peso)
+        .filter(TermoOrdemServico.ordem_servico_id == ordem.id)
+    )
+    if novo == antigo:
+        return
+
+    db.session.query(TermoOrdemServico).filter(
+        TermoOrdemServico.ordem_servico_id == ordem.id
+    ).delete(synchronize_session=False)
+    if novo:
+        db.session.execute(insert(TermoOrdemServico), [
+            {'termo': termo, 'ordem_servico_id': ordem.id, 'peso': peso} for termo, peso in novo.items()
+        ])
+
+    variacoes = {termo: 1 for termo in novo.keys() - antigo.keys()}
+    variacoes.update({termo: -1 for termo in antigo.keys() - novo.keys()})
+    if bool(novo) != bool(antigo):
+        variacoes[TOTAL] = 1 if novo else -1
+    _ajustar_frequencias(variacoes)
+
+
+def remover(ordem_id):
+    """Retira a ordem do índice (chamar na exclusão, antes do commit)."""
+    termos = [
+        termo for (termo,) in
+        db.session.query(TermoOrdemServico.termo).filter(TermoOrdemServico.ordem_servico_id == ordem_id)
+    ]
+    if not termos:
+        return
+    db.session.query(TermoOrdemServico).filter(
+        TermoOrdemServico.ordem_servico_id == ordem_id
+    ).delete(synchronize_session=False)
+    variacoes = dict.fromkeys(termos, -1)
+    variacoes[TOTAL] = -1
+    _ajustar_frequencias(variacoes)
+
+
+def _ajustar_frequencias(variacoes):
+    if not variacoes:
+        return
+    # Upsert: duas ordens com um termo novo ao mesmo tempo não colidem na chave
+    comando = upsert(FrequenciaTermo)
+    comando = comando.on_conflict_do_update(
+        index_elements=['termo'],
+        set_={'documentos': FrequenciaTermo.documentos + comando.excluded.documentos}
+    )
+    db.session.execute(comando, [
+        {'termo': termo, 'documentos': variacao} for termo, variacao in variacoes.items()
+    ])
+    if any(variacao < 0 for variacao in variacoes.values()):
+        db.session.query(FrequenciaTermo).filter(
+            FrequenciaTermo.termo.in_([termo for termo, variacao in variacoes.items() if variacao < 0]),
+            FrequenciaTermo.documentos <= 0
+        ).delete(synchronize_session=False)
+
+
+def buscar(texto, limite=5, excluir_id=None):
+    """
+    Ordens de serviço mais semelhantes ao texto.
+
+    Args:
+        texto: Defeito relatado e/ou serviços a realizar
+        limite: Número máximo de resultados
+        excluir_id: Ordem a ignorar (a própria ordem consultada)
+
+    Returns:
+        list: Pares (ordem_servico_id, similaridade entre 0 e 1), do mais
+            semelhante ao menos semelhante
+    """
+    consulta = vetor(texto)
+    if not consulta:
+        return []
+
+    frequencias = dict(
+        db.session.query(FrequenciaTermo.termo, FrequenciaTermo.documentos)
+        .filter(FrequenciaTermo.termo.in_(list(consulta) + [TOTAL]))
+    )
+    total = frequencias.pop(TOTAL, 0)
+    if not total:
+        return []  # Índice vazio ou ainda não construído
+
+    termos = list(frequencias)
+    if not termos:
+        return []
+
+    pesos = {termo: consulta[termo] * math.log(1.0 + total / frequencias[termo]) for termo in termos}
+    norma = math.sqrt(sum(peso * peso for peso in pesos.values()))
+    pesos = {termo: peso / norma for termo, peso in pesos.items()}
+
+    similaridade = db.func.sum(
+        TermoOrdemServico.peso * case(pesos, value=TermoOrdemServico.termo)
+    ).label('similaridade')
+    candidatas = []
+    for termo in termos:
+        # Os pesos da consulta têm norma 1: a fração do termo é o seu peso ao quadrado
+        por_termo = max(int(CANDIDATOS * pesos[termo] ** 2), 50)
+        melhores = select(TermoOrdemServico.ordem_servico_id).where(
+            TermoOrdemServico.termo == termo
+        ).order_by(TermoOrdemServico.peso.desc()).limit(por_termo).subquery()
+        candidatas.append(select(melhores.c.ordem_servico_id))
+    consulta_indice = db.session.query(TermoOrdemServico.ordem_servico_id, similaridade).filter(
+        TermoOrdemServico.termo.in_(termos),
+        TermoOrdemServico.ordem_servico_id.in_(union(*candidatas) if len(candidatas) > 1 else candidatas[0])
+    )
+    if excluir_id is not None:
+        consulta_indice = consulta_indice.filter(TermoOrdemServico.ordem_servico_id != excluir_id)
+    linhas = consulta_indice.group_by(TermoOrdemServico.ordem_servico_id).order_by(
+        desc('similaridade'), desc(TermoOrdemServico.ordem_servico_id)
+    ).limit(limite).all()
+    return [(ordem_id, round(valor, 4)) for ordem_id, valor in linhas]
+
+
+def reconstruir(lote=2000):
+    """
+    Recria o índice a partir de todas as ordens de serviço, em uma transação.
+
+    Returns:
+        int: Número de ordens indexadas (com texto)
+    """
+    db.session.query(TermoOrdemServico).delete(synchronize_session=False)
+    db.session.query(FrequenciaTermo).delete(synchronize_session=False)
+
+    frequencias = collections.Counter()
+    indexadas = 0
+    ultimo_id = 0
+    while True:
+        ordens = db.session.query(
+            OrdemServico.id, OrdemServico.defeito_relatado, OrdemServico.servicos_a_realizar
+        ).filter(OrdemServico.id > ultimo_id).order_by(OrdemServico.id).limit(lote).all()
+        if not ordens:
+            break
+        linhas = []
+        for ordem in ordens:
+            pesos = vetor(texto_ordem(ordem))
+            if pesos:
+                indexadas += 1
+                frequencias.update(pesos.keys())
+                linhas.extend(
+                    {'termo': termo, 'ordem_servico_id': ordem.id, 'peso': peso} for termo, peso in pesos.items()
+                )
+        if linhas:
+            db.session.execute(insert(TermoOrdemServico), linhas)
+        ultimo_id = ordens[-1].id
+
+    frequencias[TOTAL] = indexadas
+    linhas = [{'termo': termo, 'documentos': documentos} for termo, documentos in frequencias.items()]
+    for inicio in range(0, len(linhas), lote):
+        db.session.execute(insert(FrequenciaTermo), linhas[inicio:inicio + lote])
+    db.session.commit()
+    return indexadas
@@ -12,6 +12,12 @@ from src.routes.veiculos import veiculos_bp
 from src.routes.ordens_servico import ordens_servico_bp
 from src.routes.pecas import pecas_bp
 from src.routes.relatorios import relatorios_bp
+from src.routes.ferramentas import ferramentas_bp
+from src.routes.tarefas import tarefas_bp
+from src.routes.cache import cache_bp
+from src.cache import cache
+from src.commands import verificar_totais, executar_tarefas, limpar_tarefas, indexar_ordens, recalcular_historicos, calcular_previsoes
+from src import tarefas
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -25,6 +31,17 @@ app.register_blueprint(veiculos_bp, url_prefix='/api')
 app.register_blueprint(ordens_servico_bp, url_prefix='/api')
 app.register_blueprint(pecas_bp, url_prefix='/api')
 app.register_blueprint(relatorios_bp, url_prefix='/api')
+app.register_blueprint(ferramentas_bp, url_prefix='/api')
+app.register_blueprint(tarefas_bp, url_prefix='/api')
+app.register_blueprint(cache_bp, url_prefix='/api')
+
+# Comandos de manutenção (flask --app src.main <comando>)
+app.cli.add_command(verificar_totais)
+app.cli.add_command(executar_tarefas)
+app.cli.add_command(limpar_tarefas)
+app.cli.add_command(indexar_ordens)
+app.cli.add_command(recalcular_historicos)
+app.cli.add_command(calcular_previsoes)
 
 # uncomment if you need to use database
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
@@ -36,6 +53,16 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    # create_all não cria os índices novos de tabelas que já existiam
+    for tabela in db.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            indice.create(db.engine, checkfirst=True)
+
+# Cache de relatórios e catálogos, invalidado pelos commits (CACHE_BACKEND)
+cache.init_app(app)
+
+# Relatórios e exportações em segundo plano (/api/tarefas)
+tarefas.init_app(app)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
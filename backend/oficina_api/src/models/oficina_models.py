@@ -1,8 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import json
 
 db = SQLAlchemy()
 
+def upsert(modelo):
+    """INSERT com ON CONFLICT no dialeto em uso (SQLite ou PostgreSQL)."""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(modelo)
+
 class Cliente(db.Model):
     __tablename__ = 'clientes'
     id = db.Column(db.Integer, primary_key=True)
@@ -26,6 +35,7 @@ class Cliente(db.Model):
 
 class Veiculo(db.Model):
     __tablename__ = 'veiculos'
+    __table_args__ = (db.Index('ix_veiculos_cliente', 'cliente_id'),)
     id = db.Column(db.Integer, primary_key=True)
     placa = db.Column(db.String(10), unique=True, nullable=False)
     modelo = db.Column(db.String(50))
@@ -52,6 +62,13 @@ class Veiculo(db.Model):
 
 class OrdemServico(db.Model):
     __tablename__ = 'ordens_servico'
+    __table_args__ = (
+        # Histórico por veículo e por cliente, do mais recente ao mais antigo
+        db.Index('ix_ordens_servico_veiculo_data', 'veiculo_id', 'data_entrada', 'id'),
+        db.Index('ix_ordens_servico_cliente_data', 'cliente_id', 'data_entrada', 'id'),
+        # Série de faturamento: a consulta agrupada é respondida só pelo índice
+        db.Index('ix_ordens_servico_data_status', 'data_entrada', 'status', 'valor_total', 'valor_mao_obra'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     data_entrada = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     defeito_relatado = db.Column(db.Text)
@@ -66,6 +83,7 @@ class OrdemServico(db.Model):
     cliente = db.relationship('Cliente', back_populates='ordens_servico')
     veiculo = db.relationship('Veiculo', back_populates='ordens_servico')
     pecas_utilizadas = db.relationship('PecaUtilizada', back_populates='ordem_servico', lazy=True, cascade='all, delete-orphan')
+    ferramentas = db.relationship('FerramentaOrdemServico', back_populates='ordem_servico', lazy=True, cascade='all, delete-orphan')
 
     def to_dict(self):
         return {
@@ -82,6 +100,20 @@ class OrdemServico(db.Model):
             'veiculo_placa': self.veiculo.placa if self.veiculo else None
         }
 
+    def atualizar_valor_total(self):
+        """
+        Recalcula valor_total (mão de obra + peças) com uma agregação no banco.
+
+        Deve ser chamado nas escritas que alteram a mão de obra ou as peças da
+        ordem, depois de adicioná-las ou removê-las da sessão (o autoflush
+        inclui as alterações pendentes na soma).
+        """
+        valor_pecas = db.session.query(
+            db.func.coalesce(db.func.sum(PecaUtilizada.preco_total), 0.0)
+        ).filter(PecaUtilizada.ordem_servico_id == self.id).scalar()
+        self.valor_total = (self.valor_mao_obra or 0.0) + valor_pecas
+        return self.valor_total
+
     def __repr__(self):
         return f"<OrdemServico(id={self.id}, status='{self.status}')>"
 
@@ -107,6 +139,7 @@ class Peca(db.Model):
 
 class PecaUtilizada(db.Model):
     __tablename__ = 'pecas_utilizadas'
+    __table_args__ = (db.Index('ix_pecas_utilizadas_ordem', 'ordem_servico_id'),)
     id = db.Column(db.Integer, primary_key=True)
     quantidade = db.Column(db.Integer, nullable=False)
     preco_total = db.Column(db.Float, nullable=False)
@@ -118,16 +151,270 @@ class PecaUtilizada(db.Model):
     peca = db.relationship('Peca', back_populates='pecas_utilizadas')
 
     def to_dict(self):
+        peca = self.peca
         return {
             'id': self.id,
             'quantidade': self.quantidade,
             'preco_total': self.preco_total,
             'ordem_servico_id': self.ordem_servico_id,
             'peca_id': self.peca_id,
-            'peca_nome': self.peca.nome if self.peca else None,
-            'preco_unitario': self.peca.preco_unitario if self.peca else None
+            'peca_nome': peca.nome if peca else None,
+            'preco_unitario': peca.preco_unitario if peca else None
         }
 
     def __repr__(self):
         return f"<PecaUtilizada(peca='{self.peca.nome if self.peca else 'N/A'}', quantidade={self.quantidade})>"
 
+
+class Ferramenta(db.Model):
+    __tablename__ = 'ferramentas'
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(50), nullable=False, unique=True)  # Classe do modelo de reconhecimento
+    nome_exibicao = db.Column(db.String(100))
+    categoria = db.Column(db.String(50))
+
+    usos = db.relationship('FerramentaOrdemServico', back_populates='ferramenta', lazy=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nome': self.nome,
+            'nome_exibicao': self.nome_exibicao,
+            'categoria': self.categoria
+        }
+
+    def __repr__(self):
+        return f"<Ferramenta(nome='{self.nome}')>"
+
+class Baia(db.Model):
+    __tablename__ = 'baias'
+    id = db.Column(db.Integer, primary_key=True)
+    camera = db.Column(db.String(100), nullable=False, unique=True)  # Identificador da câmera da baia
+    ordem_servico_id = db.Column(db.Integer, db.ForeignKey('ordens_servico.id'))
+
+    ordem_servico = db.relationship('OrdemServico')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'camera': self.camera,
+            'ordem_servico_id': self.ordem_servico_id
+        }
+
+    def __repr__(self):
+        return f"<Baia(camera='{self.camera}', ordem_servico_id={self.ordem_servico_id})>"
+
+class FerramentaOrdemServico(db.Model):
+    __tablename__ = 'ferramentas_ordens_servico'
+    __table_args__ = (db.UniqueConstraint('ordem_servico_id', 'ferramenta_id', 'camera'),)
+    id = db.Column(db.Integer, primary_key=True)
+    camera = db.Column(db.String(100), nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)  # Maior quantidade vista ao mesmo tempo
+    janelas = db.Column(db.Integer, nullable=False, default=0)  # Janelas de detecção em que a ferramenta apareceu
+    primeira_deteccao = db.Column(db.DateTime, nullable=False)  # Retirada (check-out)
+    ultima_deteccao = db.Column(db.DateTime, nullable=False)  # Última vez vista na baia (check-in após este momento)
+
+    ordem_servico_id = db.Column(db.Integer, db.ForeignKey('ordens_servico.id'), nullable=False)
+    ferramenta_id = db.Column(db.Integer, db.ForeignKey('ferramentas.id'), nullable=False)
+
+    ordem_servico = db.relationship('OrdemServico', back_populates='ferramentas')
+    ferramenta = db.relationship('Ferramenta', back_populates='usos')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'camera': self.camera,
+            'quantidade': self.quantidade,
+            'janelas': self.janelas,
+            'primeira_deteccao': self.primeira_deteccao.isoformat() if self.primeira_deteccao else None,
+            'ultima_deteccao': self.ultima_deteccao.isoformat() if self.ultima_deteccao else None,
+            'ordem_servico_id': self.ordem_servico_id,
+            'ferramenta_id': self.ferramenta_id,
+            'ferramenta_nome': self.ferramenta.nome if self.ferramenta else None,
+            'ferramenta_nome_exibicao': self.ferramenta.nome_exibicao if self.ferramenta else None,
+            'categoria': self.ferramenta.categoria if self.ferramenta else None
+        }
+
+    def __repr__(self):
+        return f"<FerramentaOrdemServico(ordem_servico_id={self.ordem_servico_id}, ferramenta_id={self.ferramenta_id})>"
+
+class JanelaFerramenta(db.Model):
+    """Janela de detecção já registrada: reenvios do mesmo evento são ignorados."""
+    __tablename__ = 'janelas_ferramentas'
+    __table_args__ = ({'sqlite_with_rowid': False},)
+    camera = db.Column(db.String(100), primary_key=True)
+    class_name = db.Column(db.String(50), primary_key=True)
+    window_start = db.Column(db.Float, primary_key=True)  # Timestamp Unix enviado pelo reconhecimento
+    registrada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<JanelaFerramenta(camera='{self.camera}', class_name='{self.class_name}', window_start={self.window_start})>"
+
+class Tarefa(db.Model):
+    __tablename__ = 'tarefas'
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 em hexadecimal
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.Text)  # JSON
+    status = db.Column(db.String(20), nullable=False, default='pendente', index=True)  # pendente, executando, concluida, erro, expirada
+    progresso = db.Column(db.Float, nullable=False, default=0.0)  # 0 a 1
+    mensagem = db.Column(db.Text)  # Etapa atual ou mensagem de erro
+    arquivo = db.Column(db.String(255))  # Caminho do resultado em disco
+    criada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    iniciada_em = db.Column(db.DateTime)
+    atualizada_em = db.Column(db.DateTime)  # Último sinal de vida do executor
+    concluida_em = db.Column(db.DateTime)
+    expira_em = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'parametros': json.loads(self.parametros) if self.parametros else {},
+            'status': self.status,
+            'progresso': self.progresso,
+            'mensagem': self.mensagem,
+            'criada_em': self.criada_em.isoformat() if self.criada_em else None,
+            'iniciada_em': self.iniciada_em.isoformat() if self.iniciada_em else None,
+            'concluida_em': self.concluida_em.isoformat() if self.concluida_em else None,
+            'expira_em': self.expira_em.isoformat() if self.expira_em else None
+        }
+
+    def __repr__(self):
+        return f"<Tarefa(id='{self.id}', tipo='{self.tipo}', status='{self.status}')>"
+
+class TermoOrdemServico(db.Model):
+    """Índice invertido do texto das ordens de serviço (ver src/indice_texto.py)."""
+    __tablename__ = 'termos_ordens_servico'
+    # Sem rowid no SQLite: o peso fica junto da chave e a busca por termo lê só o índice
+    __table_args__ = (
+        db.Index('ix_termos_ordens_servico_ordem', 'ordem_servico_id'),
+        db.Index('ix_termos_ordens_servico_peso', 'termo', 'peso'),  # Maiores pesos de um termo
+        {'sqlite_with_rowid': False}
+    )
+    termo = db.Column(db.String(40), primary_key=True)
+    ordem_servico_id = db.Column(db.Integer, db.ForeignKey('ordens_servico.id'), primary_key=True)
+    peso = db.Column(db.Float, nullable=False)  # tf logarítmico normalizado pela norma da ordem
+
+    def __repr__(self):
+        return f"<TermoOrdemServico(termo='{self.termo}', ordem_servico_id={self.ordem_servico_id})>"
+
+class FrequenciaTermo(db.Model):
+    """Número de ordens de serviço indexadas que contêm cada termo."""
+    __tablename__ = 'frequencia_termos'
+    termo = db.Column(db.String(40), primary_key=True)
+    documentos = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<FrequenciaTermo(termo='{self.termo}', documentos={self.documentos})>"
+
+class LeituraQuilometragem(db.Model):
+    __tablename__ = 'leituras_quilometragem'
+    __table_args__ = (db.Index('ix_leituras_quilometragem_veiculo', 'veiculo_id', 'data'),)
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, nullable=False, default=datetime.utcnow)
+    quilometragem = db.Column(db.Integer, nullable=False)
+
+    veiculo_id = db.Column(db.Integer, db.ForeignKey('veiculos.id'), nullable=False)
+    ordem_servico_id = db.Column(db.Integer, db.ForeignKey('ordens_servico.id'))  # Leitura feita na entrada da ordem
+
+    def to_dict(self):
+        return {
+            'data': self.data.isoformat() if self.data else None,
+            'quilometragem': self.quilometragem,
+            'ordem_servico_id': self.ordem_servico_id
+        }
+
+    def __repr__(self):
+        return f"<LeituraQuilometragem(veiculo_id={self.veiculo_id}, quilometragem={self.quilometragem})>"
+
+class ResumoVeiculo(db.Model):
+    """Agregados do histórico do veículo, gravados a cada escrita (ver src/historico.py)."""
+    __tablename__ = 'resumos_veiculos'
+    veiculo_id = db.Column(db.Integer, db.ForeignKey('veiculos.id'), primary_key=True)
+    visitas = db.Column(db.Integer, nullable=False, default=0)
+    total_gasto = db.Column(db.Float, nullable=False, default=0.0)
+    primeira_visita = db.Column(db.Date)
+    ultima_visita = db.Column(db.Date)
+    quilometragem_inicial = db.Column(db.Integer)
+    quilometragem_atual = db.Column(db.Integer)
+    km_por_mes = db.Column(db.Float)
+
+    def to_dict(self):
+        return {
+            'visitas': self.visitas,
+            'total_gasto': self.total_gasto,
+            'primeira_visita': self.primeira_visita.isoformat() if self.primeira_visita else None,
+            'ultima_visita': self.ultima_visita.isoformat() if self.ultima_visita else None,
+            'quilometragem_inicial': self.quilometragem_inicial,
+            'quilometragem_atual': self.quilometragem_atual,
+            'km_por_mes': self.km_por_mes
+        }
+
+    def __repr__(self):
+        return f"<ResumoVeiculo(veiculo_id={self.veiculo_id}, visitas={self.visitas})>"
+
+class ResumoCliente(db.Model):
+    """Agregados do histórico do cliente, gravados a cada escrita (ver src/historico.py)."""
+    __tablename__ = 'resumos_clientes'
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), primary_key=True)
+    veiculos = db.Column(db.Integer, nullable=False, default=0)
+    visitas = db.Column(db.Integer, nullable=False, default=0)
+    total_gasto = db.Column(db.Float, nullable=False, default=0.0)
+    primeira_visita = db.Column(db.Date)
+    ultima_visita = db.Column(db.Date)
+
+    def to_dict(self):
+        return {
+            'veiculos': self.veiculos,
+            'visitas': self.visitas,
+            'total_gasto': self.total_gasto,
+            'primeira_visita': self.primeira_visita.isoformat() if self.primeira_visita else None,
+            'ultima_visita': self.ultima_visita.isoformat() if self.ultima_visita else None
+        }
+
+    def __repr__(self):
+        return f"<ResumoCliente(cliente_id={self.cliente_id}, visitas={self.visitas})>"
+
+class PrevisaoPeca(db.Model):
+    """Consumo previsto e ponto de pedido da peça, gravados pelo cálculo em lote (src/previsao.py)."""
+    __tablename__ = 'previsoes_pecas'
+    peca_id = db.Column(db.Integer, db.ForeignKey('pecas.id'), primary_key=True)
+    consumo_medio = db.Column(db.Float, nullable=False)  # Unidades por dia (média móvel)
+    consumo_suavizado = db.Column(db.Float, nullable=False)  # Unidades por dia (suavização exponencial)
+    consumo_diario = db.Column(db.Float, nullable=False)  # O maior dos dois, usado no ponto de pedido
+    desvio_diario = db.Column(db.Float, nullable=False)
+    estoque_seguranca = db.Column(db.Float, nullable=False)
+    ponto_pedido = db.Column(db.Float, nullable=False, index=True)
+    quantidade_sugerida = db.Column(db.Integer, nullable=False)
+    dias_de_estoque = db.Column(db.Float)  # Nulo para peças sem consumo
+    calculado_em = db.Column(db.DateTime, nullable=False)
+
+    peca = db.relationship('Peca')
+
+    def to_dict(self):
+        return {
+            'peca_id': self.peca_id,
+            'consumo_medio': self.consumo_medio,
+            'consumo_suavizado': self.consumo_suavizado,
+            'consumo_diario': self.consumo_diario,
+            'desvio_diario': self.desvio_diario,
+            'estoque_seguranca': self.estoque_seguranca,
+            'ponto_pedido': self.ponto_pedido,
+            'quantidade_sugerida': self.quantidade_sugerida,
+            'dias_de_estoque': self.dias_de_estoque,
+            'calculado_em': self.calculado_em.isoformat() if self.calculado_em else None
+        }
+
+    def __repr__(self):
+        return f"<PrevisaoPeca(peca_id={self.peca_id}, ponto_pedido={self.ponto_pedido})>"
+
+class VersaoRegistro(db.Model):
+    """Versão de cada ordem de serviço e peça alterada, para o controle otimista (ver src/versoes.py)."""
+    __tablename__ = 'versoes_registros'
+    __table_args__ = ({'sqlite_with_rowid': False},)
+    tabela = db.Column(db.String(40), primary_key=True)
+    registro_id = db.Column(db.Integer, primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<VersaoRegistro(tabela='{self.tabela}', registro_id={self.registro_id}, versao={self.versao})>"
@@ -0,0 +1,168 @@
+"""
+Previsão de consumo de peças e ponto de pedido.
+
+Um cálculo em lote (flask --app src.main calcular-previsoes ou a tarefa
+previsao_estoque) lê o consumo diário de todas as peças em uma única consulta
+agrupada (data de entrada da ordem x peça), monta a matriz densa dia x peça em
+blocos de colunas e calcula, para todas as peças de uma vez:
+
+    consumo_medio     média diária dos últimos PREVISAO_MEDIA_DIAS dias
+    consumo_suavizado suavização exponencial (PREVISAO_ALFA) sobre a janela
+    consumo_diario    o maior dos dois, usado no ponto de pedido
+    desvio_diario     desvio padrão do consumo diário na janela da média
+    ponto_pedido      consumo x prazo + estoque de segurança
+                      (z do PREVISAO_NIVEL_SERVICO x desvio x raiz do prazo)
+
+O resultado fica na tabela previsoes_pecas; GET /api/pecas/estoque_baixo
+compara o estoque atual com o ponto de pedido gravado.
+"""
+
+import math
+import os
+import time
+from datetime import date, datetime, timedelta
+from statistics import NormalDist
+
+import numpy as np
+from sqlalchemy import String, cast, func, insert, select
+from src.cache import cache
+from src.models.oficina_models import db, Peca, PecaUtilizada, OrdemServico, PrevisaoPeca
+
+JANELA_DIAS = int(os.environ.get('PREVISAO_JANELA_DIAS', 1095))
+MEDIA_DIAS = int(os.environ.get('PREVISAO_MEDIA_DIAS', 28))
+ALFA = float(os.environ.get('PREVISAO_ALFA', 0.1))
+PRAZO_DIAS = float(os.environ.get('PREVISAO_PRAZO_DIAS', 7))
+REVISAO_DIAS = float(os.environ.get('PREVISAO_REVISAO_DIAS', 14))
+NIVEL_SERVICO = float(os.environ.get('PREVISAO_NIVEL_SERVICO', 0.95))
+
+# Peças por bloco da matriz dia x peça (float32: JANELA_DIAS x BLOCO x 4 bytes)
+BLOCO = 4096
+
+
+def consumo_diario(inicio, fim):
+    """
+    Consumo agregado por dia e peça no período, em uma consulta.
+
+    Returns:
+        tuple: Arrays (dia desde o início, peca_id, quantidade)
+    """
+    # Data como texto ISO: convertida em bloco pelo NumPy, sem criar um
+    # objeto date por linha
+    linhas = db.session.execute(
+        select(cast(OrdemServico.data_entrada, String), PecaUtilizada.peca_id, func.sum(PecaUtilizada.quantidade))
+        .join(OrdemServico, PecaUtilizada.ordem_servico_id == OrdemServico.id)
+        .where(OrdemServico.data_entrada >= inicio, OrdemServico.data_entrada <= fim)
+        .group_by(OrdemServico.data_entrada, PecaUtilizada.peca_id)
+    ).all()
+    if not linhas:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    datas, pecas, quantidades = zip(*linhas)
+    dias = (np.array(datas, dtype='datetime64[D]') - np.datetime64(inicio, 'D')).astype(np.int64)
+    return dias, np.array(pecas, dtype=np.int64), np.array(quantidades, dtype=np.float32)
+
+
+def taxas_consumo(dias, colunas, quantidades, n_dias, n_pecas):
+    """
+    Média móvel, suavização exponencial e desvio do consumo diário por peça.
+
+    Args:
+        dias, colunas, quantidades: Consumo por (dia, coluna da peça), sem repetição
+        n_dias: Dias da janela (linhas da matriz)
+        n_pecas: Peças (colunas da matriz)
+
+    Returns:
+        tuple: Arrays (consumo_medio, consumo_suavizado, desvio_diario)
+    """
+    media_dias = min(MEDIA_DIAS, n_dias)
+    # Pesos da suavização exponencial: alfa x (1 - alfa)^idade, normalizados
+    # para não subestimar o consumo no início da janela
+    pesos = ALFA * (1.0 - ALFA) ** np.arange(n_dias - 1, -1, -1, dtype=np.float64)
+    pesos = (pesos / pesos.sum()).astype(np.float32)
+
+    consumo_medio = np.zeros(n_pecas, dtype=np.float64)
+    consumo_suavizado = np.zeros(n_pecas, dtype=np.float64)
+    desvio_diario = np.zeros(n_pecas, dtype=np.float64)
+
+    ordem = np.argsort(colunas, kind='stable')
+    dias, colunas, quantidades = dias[ordem], colunas[ordem], quantidades[ordem]
+    limites = np.searchsorted(colunas, np.arange(0, n_pecas + BLOCO, BLOCO))
+
+    for bloco, inicio in enumerate(range(0, n_pecas, BLOCO)):
+        fim = min(inicio + BLOCO, n_pecas)
+        a, b = limites[bloco], limites[bloco + 1]
+        matriz = np.zeros((n_dias, fim - inicio), dtype=np.float32)
+        matriz[dias[a:b], colunas[a:b] - inicio] = quantidades[a:b]
+
+        recentes = matriz[-media_dias:]
+        consumo_medio[inicio:fim] = recentes.mean(axis=0)
+        desvio_diario[inicio:fim] = recentes.std(axis=0, ddof=1) if media_dias > 1 else 0.0
+        consumo_suavizado[inicio:fim] = pesos @ matriz
+
+    return consumo_medio, consumo_suavizado, desvio_diario
+
+
+def calcular(hoje=None):
+    """
+    Recalcula e grava a previsão de todas as peças.
+
+    Returns:
+        dict: Peças calculadas, quantas estão no ponto de pedido e duração
+    """
+    comeco = time.monotonic()
+    hoje = hoje or date.today()
+    inicio = hoje - timedelta(days=JANELA_DIAS - 1)
+
+    pecas = db.session.query(Peca.id, Peca.estoque).order_by(Peca.id).all()
+    ids = np.fromiter((peca_id for peca_id, _ in pecas), dtype=np.int64, count=len(pecas))
+    estoque = np.fromiter((estoque or 0 for _, estoque in pecas), dtype=np.float64, count=len(pecas))
+
+    dias, peca_ids, quantidades = consumo_diario(inicio, hoje)
+    colunas = np.searchsorted(ids, peca_ids)
+    # Peças excluídas depois do uso não têm coluna
+    validas = (colunas < len(ids)) & (ids[np.minimum(colunas, len(ids) - 1)] == peca_ids) if len(ids) else colunas < 0
+    consumo_medio, consumo_suavizado, desvio_diario = taxas_consumo(
+        dias[validas], colunas[validas], quantidades[validas], JANELA_DIAS, len(ids)
+    )
+
+    # A média reage a picos recentes; a suavização cobre peças de giro esporádico
+    consumo = np.maximum(consumo_medio, consumo_suavizado)
+    z = NormalDist().inv_cdf(NIVEL_SERVICO)
+    estoque_seguranca = z * desvio_diario * math.sqrt(PRAZO_DIAS)
+    # Arredondado antes das comparações: o valor gravado é o que a rota compara
+    ponto_pedido = np.round(consumo * PRAZO_DIAS + estoque_seguranca, 2)
+    quantidade_sugerida = np.ceil(np.maximum(ponto_pedido + consumo * REVISAO_DIAS - estoque, 0.0))
+    quantidade_sugerida[(estoque > ponto_pedido) | (ponto_pedido <= 0)] = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dias_de_estoque = np.where(consumo > 0, estoque / consumo, np.nan)
+
+    calculado_em = datetime.utcnow()
+    colunas_resultado = {
+        'peca_id': ids.tolist(),
+        'consumo_medio': np.round(consumo_medio, 4).tolist(),
+        'consumo_suavizado': np.round(consumo_suavizado, 4).tolist(),
+        'consumo_diario': np.round(consumo, 4).tolist(),
+        'desvio_diario': np.round(desvio_diario, 4).tolist(),
+        'estoque_seguranca': np.round(estoque_seguranca, 2).tolist(),
+        'ponto_pedido': ponto_pedido.tolist(),
+        'quantidade_sugerida': quantidade_sugerida.astype(np.int64).tolist(),
+        'dias_de_estoque': [None if math.isnan(valor) else round(valor, 1) for valor in dias_de_estoque.tolist()]
+    }
+    linhas = [
+        dict(zip(colunas_resultado, valores), calculado_em=calculado_em)
+        for valores in zip(*colunas_resultado.values())
+    ]
+
+    PrevisaoPeca.query.delete(synchronize_session=False)
+    for inicio_lote in range(0, len(linhas), 5000):
+        db.session.execute(insert(PrevisaoPeca), linhas[inicio_lote:inicio_lote + 5000])
+    db.session.commit()
+    # Gravação em lote: fora dos eventos da sessão que invalidam o cache
+    cache.invalidate('previsoes_pecas')
+
+    return {
+        'pecas': len(linhas),
+        'no_ponto_de_pedido': int(np.count_nonzero((estoque <= ponto_pedido) & (ponto_pedido > 0))),
+        'consumos_lidos': int(len(dias)),
+        'segundos': round(time.monotonic() - comeco, 2)
+    }
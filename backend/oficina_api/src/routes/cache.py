@@ -0,0 +1,18 @@
+from flask import Blueprint, jsonify
+from src.cache import cache
+
+cache_bp = Blueprint('cache', __name__)
+
+@cache_bp.route('/cache/estatisticas', methods=['GET'])
+def estatisticas_cache():
+    """Acertos e falhas do cache por rota (contadores do worker que atendeu)."""
+    return jsonify(cache.stats()), 200
+
+@cache_bp.route('/cache', methods=['DELETE'])
+def limpar_cache():
+    try:
+        if cache.backend is not None:
+            cache.backend.clear()
+        return jsonify({'message': 'Cache limpo com sucesso'}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,24 +1,33 @@
 from flask import Blueprint, request, jsonify
-from src.models.oficina_models import db, Cliente, Veiculo
+from src.models.oficina_models import db, Cliente, Veiculo, OrdemServico
+from src.cache import cache
+from src import historico, inclusoes
 
 clientes_bp = Blueprint('clientes', __name__)
 
 @clientes_bp.route('/clientes', methods=['GET'])
+@cache.cached('clientes', 'veiculos', 'ordens_servico')
 def listar_clientes():
     try:
-        clientes = Cliente.query.all()
-        return jsonify([cliente.to_dict() for cliente in clientes]), 200
+        # ?include=veiculos,ordens_servico embute as relações (ver src/inclusoes.py)
+        incluir = inclusoes.ler(Cliente)
+        clientes = Cliente.query.options(*inclusoes.opcoes(Cliente, incluir)).all()
+        return jsonify([inclusoes.serializar(cliente, incluir) for cliente in clientes]), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @clientes_bp.route('/clientes/<int:id>', methods=['GET'])
+@cache.cached('clientes', 'veiculos', 'ordens_servico')
 def obter_cliente(id):
     try:
-        cliente = Cliente.query.get_or_404(id)
-        cliente_dict = cliente.to_dict()
-        # Incluir veículos do cliente
-        cliente_dict['veiculos'] = [veiculo.to_dict() for veiculo in cliente.veiculos]
-        return jsonify(cliente_dict), 200
+        # Veículos do cliente sempre incluídos; ?include=ordens_servico acrescenta as ordens
+        incluir = inclusoes.ler(Cliente, padrao=('veiculos',))
+        cliente = Cliente.query.options(*inclusoes.opcoes(Cliente, incluir)).filter_by(id=id).first_or_404()
+        return jsonify(inclusoes.serializar(cliente, incluir)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -73,6 +82,7 @@ def excluir_cliente(id):
         if cliente.veiculos or cliente.ordens_servico:
             return jsonify({'error': 'Não é possível excluir cliente com veículos ou ordens de serviço associadas'}), 400
         
+        historico.remover(cliente_id=id)
         db.session.delete(cliente)
         db.session.commit()
         
@@ -81,3 +91,24 @@ def excluir_cliente(id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+
+@clientes_bp.route('/clientes/<int:id>/historico', methods=['GET'])
+@cache.cached('ordens_servico', 'pecas_utilizadas', 'pecas', 'veiculos', 'clientes', 'resumos_clientes')
+def historico_cliente(id):
+    """
+    Histórico do cliente: resumo (veículos, visitas, total gasto) e as ordens
+    de serviço de todos os seus veículos com as peças, paginadas (?pagina=, ?por_pagina=).
+    """
+    try:
+        cliente = Cliente.query.get_or_404(id)
+        resumo = historico.resumo_cliente(id)
+        
+        resultado = {
+            'cliente': cliente.to_dict(),
+            'resumo': resumo
+        }
+        resultado.update(historico.pagina_ordens(OrdemServico.cliente_id == id, resumo['visitas']))
+        
+        return jsonify(resultado), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,210 @@
+from flask import Blueprint, request, jsonify
+from datetime import datetime
+from src.models.oficina_models import db, Ferramenta, Baia, FerramentaOrdemServico, OrdemServico, JanelaFerramenta
+from src.cache import cache
+
+ferramentas_bp = Blueprint('ferramentas', __name__)
+
+# Catálogo de ferramentas reconhecidas
+@ferramentas_bp.route('/ferramentas', methods=['GET'])
+@cache.cached('ferramentas')
+def listar_ferramentas():
+    try:
+        ferramentas = Ferramenta.query.order_by(Ferramenta.nome).all()
+        return jsonify([ferramenta.to_dict() for ferramenta in ferramentas]), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ferramentas_bp.route('/ferramentas', methods=['POST'])
+def criar_ferramenta():
+    try:
+        data = request.get_json()
+
+        if not data or not data.get('nome'):
+            return jsonify({'error': 'Nome é obrigatório'}), 400
+
+        if Ferramenta.query.filter_by(nome=data['nome']).first():
+            return jsonify({'error': 'Ferramenta já cadastrada'}), 400
+
+        ferramenta = Ferramenta(
+            nome=data['nome'],
+            nome_exibicao=data.get('nome_exibicao'),
+            categoria=data.get('categoria')
+        )
+
+        db.session.add(ferramenta)
+        db.session.commit()
+
+        return jsonify(ferramenta.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Associação entre a câmera de uma baia e a ordem de serviço em atendimento
+@ferramentas_bp.route('/baias', methods=['GET'])
+def listar_baias():
+    try:
+        baias = Baia.query.order_by(Baia.camera).all()
+        return jsonify([baia.to_dict() for baia in baias]), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ferramentas_bp.route('/baias/<camera>', methods=['PUT'])
+def atribuir_baia(camera):
+    try:
+        data = request.get_json()
+
+        if data is None or 'ordem_servico_id' not in data:
+            return jsonify({'error': 'ordem_servico_id é obrigatório (null libera a baia)'}), 400
+
+        ordem_servico_id = data['ordem_servico_id']
+        if ordem_servico_id is not None and not OrdemServico.query.get(ordem_servico_id):
+            return jsonify({'error': 'Ordem de serviço não encontrada'}), 404
+
+        baia = Baia.query.filter_by(camera=camera).first()
+        if not baia:
+            baia = Baia(camera=camera)
+            db.session.add(baia)
+        baia.ordem_servico_id = ordem_servico_id
+
+        db.session.commit()
+
+        return jsonify(baia.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Eventos agregados enviados pelo serviço de reconhecimento
+@ferramentas_bp.route('/ferramentas/eventos', methods=['POST'])
+def registrar_eventos():
+    """
+    Registra um lote de eventos de detecção em uma única transação.
+
+    Cada evento resume uma janela de detecção de uma câmera:
+    {"camera", "class_name", "display_name", "category", "count",
+     "window_start", "window_end" (timestamps Unix), "ordem_servico_id" (opcional)}
+
+    A ordem de serviço é a informada no evento ou a atribuída à baia da câmera;
+    eventos sem ordem são ignorados.
+
+    O registro é idempotente: cada janela (camera, class_name, window_start)
+    é aplicada uma vez, e um lote reenviado pelo reconhecimento (ex.: após um
+    timeout de uma requisição já gravada) não conta as janelas de novo.
+    """
+    try:
+        data = request.get_json()
+        eventos = data.get('events') if isinstance(data, dict) else None
+
+        if not isinstance(eventos, list):
+            return jsonify({'error': 'Campo "events" deve ser uma lista'}), 400
+
+        for evento in eventos:
+            if (not isinstance(evento, dict) or not evento.get('camera') or not evento.get('class_name')
+                    or not isinstance(evento.get('window_start'), (int, float))
+                    or not isinstance(evento.get('window_end'), (int, float))):
+                return jsonify({'error': 'Cada evento precisa de camera, class_name, window_start e window_end'}), 400
+            try:
+                evento['count'] = int(evento.get('count', 1))
+            except (TypeError, ValueError):
+                return jsonify({'error': 'count deve ser um número inteiro'}), 400
+            if evento['count'] < 0:
+                return jsonify({'error': 'count não pode ser negativo'}), 400
+
+        # Resolver ordens, ferramentas e registros existentes com poucas consultas
+        cameras = {evento['camera'] for evento in eventos}
+        ordens_por_camera = {
+            baia.camera: baia.ordem_servico_id
+            for baia in Baia.query.filter(Baia.camera.in_(cameras), Baia.ordem_servico_id.isnot(None))
+        }
+        for evento in eventos:
+            evento['ordem_servico_id'] = evento.get('ordem_servico_id') or ordens_por_camera.get(evento['camera'])
+
+        ordem_ids = {evento['ordem_servico_id'] for evento in eventos if evento['ordem_servico_id']}
+        ordem_ids = {
+            ordem_id for (ordem_id,) in
+            db.session.query(OrdemServico.id).filter(OrdemServico.id.in_(ordem_ids))
+        }
+        validos = [evento for evento in eventos if evento['ordem_servico_id'] in ordem_ids]
+
+        # Janelas já registradas (reenvio) ou repetidas no próprio lote
+        chaves = {(evento['camera'], evento['class_name'], evento['window_start']) for evento in validos}
+        registradas = {
+            (janela.camera, janela.class_name, janela.window_start)
+            for janela in JanelaFerramenta.query.filter(
+                JanelaFerramenta.camera.in_({camera for camera, _, _ in chaves}),
+                JanelaFerramenta.window_start.in_({inicio for _, _, inicio in chaves})
+            )
+        } if chaves else set()
+        novos = []
+        for evento in validos:
+            chave = (evento['camera'], evento['class_name'], evento['window_start'])
+            if chave not in registradas:
+                registradas.add(chave)
+                novos.append(evento)
+                db.session.add(JanelaFerramenta(camera=chave[0], class_name=chave[1], window_start=chave[2]))
+        repetidos = len(validos) - len(novos)
+        validos = novos
+
+        nomes = {evento['class_name'] for evento in validos}
+        ferramentas = {f.nome: f for f in Ferramenta.query.filter(Ferramenta.nome.in_(nomes))}
+        for evento in validos:
+            if evento['class_name'] not in ferramentas:
+                ferramenta = Ferramenta(
+                    nome=evento['class_name'],
+                    nome_exibicao=evento.get('display_name'),
+                    categoria=evento.get('category')
+                )
+                db.session.add(ferramenta)
+                ferramentas[ferramenta.nome] = ferramenta
+        db.session.flush()
+
+        usos = {
+            (uso.ordem_servico_id, uso.ferramenta_id, uso.camera): uso
+            for uso in FerramentaOrdemServico.query.filter(FerramentaOrdemServico.ordem_servico_id.in_(ordem_ids))
+        }
+        for evento in validos:
+            ferramenta = ferramentas[evento['class_name']]
+            inicio = datetime.utcfromtimestamp(evento['window_start'])
+            fim = datetime.utcfromtimestamp(evento['window_end'])
+            quantidade = evento['count']
+
+            chave = (evento['ordem_servico_id'], ferramenta.id, evento['camera'])
+            uso = usos.get(chave)
+            if uso is None:
+                uso = FerramentaOrdemServico(
+                    ordem_servico_id=evento['ordem_servico_id'],
+                    ferramenta_id=ferramenta.id,
+                    camera=evento['camera'],
+                    quantidade=quantidade,
+                    janelas=1,
+                    primeira_deteccao=inicio,
+                    ultima_deteccao=fim
+                )
+                db.session.add(uso)
+                usos[chave] = uso
+            else:
+                uso.quantidade = max(uso.quantidade, quantidade)
+                uso.janelas += 1
+                uso.primeira_deteccao = min(uso.primeira_deteccao, inicio)
+                uso.ultima_deteccao = max(uso.ultima_deteccao, fim)
+
+        db.session.commit()
+
+        return jsonify({
+            'recebidos': len(eventos),
+            'registrados': len(validos),
+            'repetidos': repetidos,
+            'ignorados': len(eventos) - len(validos) - repetidos
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@ferramentas_bp.route('/ordens_servico/<int:id>/ferramentas', methods=['GET'])
+def listar_ferramentas_ordem(id):
+    try:
+        ordem = OrdemServico.query.get_or_404(id)
+        usos = sorted(ordem.ferramentas, key=lambda uso: uso.primeira_deteccao)
+        return jsonify([uso.to_dict() for uso in usos]), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
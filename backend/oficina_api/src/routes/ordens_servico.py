@@ -1,32 +1,114 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload
 from src.models.oficina_models import db, OrdemServico, Cliente, Veiculo, PecaUtilizada
+from src.eventos import get_broker, publicar_evento
+from src.cache import cache
+from src import indice_texto, historico, inclusoes, versoes
+import json
+import os
 
 ordens_servico_bp = Blueprint('ordens_servico', __name__)
 
 @ordens_servico_bp.route('/ordens_servico', methods=['GET'])
 def listar_ordens_servico():
     try:
+        # ?include=pecas,veiculo,cliente,ferramentas embute as relações (ver src/inclusoes.py)
+        incluir = inclusoes.ler(OrdemServico)
+        query = OrdemServico.query.options(*inclusoes.opcoes(OrdemServico, incluir))
         status_filter = request.args.get('status')
         if status_filter:
-            ordens = OrdemServico.query.filter_by(status=status_filter).all()
+            ordens = query.filter_by(status=status_filter).all()
         else:
-            ordens = OrdemServico.query.all()
+            ordens = query.all()
         
-        return jsonify([ordem.to_dict() for ordem in ordens]), 200
+        return jsonify([inclusoes.serializar(ordem, incluir) for ordem in ordens]), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Intervalo entre comentários de keep-alive do SSE (mantém proxies com a conexão aberta)
+EVENTOS_KEEPALIVE = float(os.environ.get('EVENTOS_KEEPALIVE', 15.0))
+
+def _evento_sse(evento_id, tipo, dados):
+    linhas = [f'event: {tipo}', f'data: {json.dumps(dados)}']
+    if evento_id is not None:
+        linhas.insert(0, f'id: {evento_id}')
+    return '\n'.join(linhas) + '\n\n'
+
+def _evento_no_filtro(evento, status_filtro):
+    if not status_filtro:
+        return True
+    dados = evento['dados']
+    # Transições para fora do status filtrado também são enviadas (a tela remove a ordem)
+    return dados['ordem'].get('status') in status_filtro or dados.get('status_anterior') in status_filtro
+
+@ordens_servico_bp.route('/ordens_servico/eventos', methods=['GET'])
+def eventos_ordens_servico():
+    """
+    Feed SSE (text/event-stream) das alterações das ordens de serviço.
+
+    Eventos: criada, atualizada, status e excluida, com data
+    {"ordem": {...}, "status_anterior": "..."}. O parâmetro ?status= (pode se
+    repetir) limita o feed às ordens que entram ou saem desses status.
+
+    Na primeira conexão é enviado um evento snapshot com a lista atual (já
+    filtrada); ao reconectar, o navegador envia Last-Event-ID e recebe apenas
+    os eventos perdidos, ou um novo snapshot se eles já saíram do histórico.
+    """
+    try:
+        status_filtro = set(request.args.getlist('status'))
+        ultimo_id = request.headers.get('Last-Event-ID') or request.args.get('ultimo_id')
+        try:
+            ultimo_id = int(ultimo_id) if ultimo_id else None
+        except ValueError:
+            return jsonify({'error': 'Last-Event-ID inválido'}), 400
+
+        # Assinar antes do snapshot para não perder alterações feitas entre os dois
+        assinatura = get_broker().assinar(ultimo_id)
+        snapshot = None
+        if not assinatura.continua:
+            query = OrdemServico.query
+            if status_filtro:
+                query = query.filter(OrdemServico.status.in_(status_filtro))
+            snapshot = [ordem.to_dict() for ordem in query.all()]
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    def gerar():
+        try:
+            yield 'retry: 3000\n\n'
+            if snapshot is not None:
+                yield _evento_sse(None, 'snapshot', snapshot)
+            while not assinatura.excedida:
+                evento = assinatura.get(timeout=EVENTOS_KEEPALIVE)
+                if evento is None:
+                    yield ': keep-alive\n\n'
+                elif _evento_no_filtro(evento, status_filtro):
+                    yield _evento_sse(evento['id'], evento['tipo'], evento['dados'])
+        finally:
+            assinatura.close()
+
+    return Response(gerar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @ordens_servico_bp.route('/ordens_servico/<int:id>', methods=['GET'])
 def obter_ordem_servico(id):
     try:
-        ordem = OrdemServico.query.get_or_404(id)
-        ordem_dict = ordem.to_dict()
-        
-        # Incluir peças utilizadas
-        ordem_dict['pecas_utilizadas'] = [peca.to_dict() for peca in ordem.pecas_utilizadas]
+        # Peças utilizadas sempre incluídas; ?include=veiculo,cliente,ferramentas acrescenta as demais
+        incluir = inclusoes.ler(OrdemServico, padrao=('pecas',))
+        versao = versoes.ler(OrdemServico, id)
+        ordem = OrdemServico.query.options(
+            *inclusoes.opcoes(OrdemServico, incluir)
+        ).filter_by(id=id).first_or_404()
         
-        return jsonify(ordem_dict), 200
+        # ETag com a versão, para o If-Match das alterações
+        return versoes.com_etag(jsonify(inclusoes.serializar(ordem, incluir)), ordem, versao), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -59,20 +141,30 @@ def criar_ordem_servico():
             except ValueError:
                 return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD'}), 400
         
+        valor_mao_obra = data.get('valor_mao_obra', 0.0)
         ordem = OrdemServico(
             data_entrada=data_entrada,
             defeito_relatado=data.get('defeito_relatado'),
             servicos_a_realizar=data.get('servicos_a_realizar'),
             status=data.get('status', 'Em andamento'),
-            valor_mao_obra=data.get('valor_mao_obra', 0.0),
+            valor_mao_obra=valor_mao_obra,
+            valor_total=valor_mao_obra,
             cliente_id=data['cliente_id'],
             veiculo_id=data['veiculo_id']
         )
         
         db.session.add(ordem)
+        db.session.flush()
+        indice_texto.indexar(ordem)
+        if data.get('quilometragem') is not None:
+            historico.registrar_quilometragem(veiculo, data['quilometragem'], data_entrada, ordem.id)
+        historico.atualizar(veiculos=[ordem.veiculo_id], clientes=[ordem.cliente_id])
         db.session.commit()
         
-        return jsonify(ordem.to_dict()), 201
+        ordem_dict = ordem.to_dict()
+        publicar_evento('criada', {'ordem': ordem_dict})
+        
+        return jsonify(ordem_dict), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -80,7 +172,11 @@ def criar_ordem_servico():
 @ordens_servico_bp.route('/ordens_servico/<int:id>', methods=['PUT'])
 def atualizar_ordem_servico(id):
     try:
+        versao = versoes.ler(OrdemServico, id)
         ordem = OrdemServico.query.get_or_404(id)
+        precondicao = versoes.precondicao(ordem, versao)
+        if precondicao:
+            return precondicao
         data = request.get_json()
         
         if not data:
@@ -93,6 +189,7 @@ def atualizar_ordem_servico(id):
             except ValueError:
                 return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD'}), 400
         
+        status_anterior = ordem.status
         ordem.defeito_relatado = data.get('defeito_relatado', ordem.defeito_relatado)
         ordem.servicos_a_realizar = data.get('servicos_a_realizar', ordem.servicos_a_realizar)
         ordem.status = data.get('status', ordem.status)
@@ -100,12 +197,21 @@ def atualizar_ordem_servico(id):
         
         # Recalcular valor total se necessário
         if 'valor_mao_obra' in data:
-            valor_pecas = sum(peca.preco_total for peca in ordem.pecas_utilizadas)
-            ordem.valor_total = ordem.valor_mao_obra + valor_pecas
+            ordem.atualizar_valor_total()
+        
+        if 'defeito_relatado' in data or 'servicos_a_realizar' in data:
+            indice_texto.indexar(ordem)
+        historico.atualizar(veiculos=[ordem.veiculo_id], clientes=[ordem.cliente_id])
         
+        # Outra requisição gravou a ordem depois da leitura: não sobrescrever
+        if not versoes.incrementar(ordem, versao):
+            return versoes.conflito()
         db.session.commit()
         
-        return jsonify(ordem.to_dict()), 200
+        ordem_dict = ordem.to_dict()
+        publicar_evento('atualizada', {'ordem': ordem_dict, 'status_anterior': status_anterior})
+        
+        return versoes.com_etag(jsonify(ordem_dict), ordem, versao + 1), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -113,7 +219,11 @@ def atualizar_ordem_servico(id):
 @ordens_servico_bp.route('/ordens_servico/<int:id>/status', methods=['PUT'])
 def atualizar_status_ordem_servico(id):
     try:
+        versao = versoes.ler(OrdemServico, id)
         ordem = OrdemServico.query.get_or_404(id)
+        precondicao = versoes.precondicao(ordem, versao)
+        if precondicao:
+            return precondicao
         data = request.get_json()
         
         if not data or 'status' not in data:
@@ -123,10 +233,17 @@ def atualizar_status_ordem_servico(id):
         if data['status'] not in status_validos:
             return jsonify({'error': f'Status deve ser um dos seguintes: {", ".join(status_validos)}'}), 400
         
+        status_anterior = ordem.status
         ordem.status = data['status']
+        if not versoes.incrementar(ordem, versao):
+            return versoes.conflito()
         db.session.commit()
         
-        return jsonify(ordem.to_dict()), 200
+        ordem_dict = ordem.to_dict()
+        if status_anterior != ordem.status:
+            publicar_evento('status', {'ordem': ordem_dict, 'status_anterior': status_anterior})
+        
+        return versoes.com_etag(jsonify(ordem_dict), ordem, versao + 1), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -134,29 +251,97 @@ def atualizar_status_ordem_servico(id):
 @ordens_servico_bp.route('/ordens_servico/<int:id>', methods=['DELETE'])
 def excluir_ordem_servico(id):
     try:
+        versao = versoes.ler(OrdemServico, id)
         ordem = OrdemServico.query.get_or_404(id)
+        falha = versoes.precondicao(ordem, versao)
+        if falha:
+            return falha
         
         # As peças utilizadas serão excluídas automaticamente devido ao cascade
+        status_anterior = ordem.status
+        indice_texto.remover(id)
+        historico.remover(ordem_servico_id=id)
         db.session.delete(ordem)
+        historico.atualizar(veiculos=[ordem.veiculo_id], clientes=[ordem.cliente_id])
+        
+        # A versão continua valendo após a exclusão: um id reaproveitado não
+        # aceita o ETag do registro excluído
+        if not versoes.incrementar(ordem, versao):
+            return versoes.conflito()
         db.session.commit()
         
+        publicar_evento('excluida', {'ordem': {'id': id}, 'status_anterior': status_anterior})
+        
         return jsonify({'message': 'Ordem de serviço excluída com sucesso'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _ordens_semelhantes(texto, excluir_id=None):
+    limite = min(max(request.args.get('limite', 5, type=int), 1), 50)
+    resultados = indice_texto.buscar(texto, limite=limite, excluir_id=excluir_id)
+    ordens = {
+        ordem.id: ordem for ordem in OrdemServico.query.options(
+            joinedload(OrdemServico.cliente),
+            joinedload(OrdemServico.veiculo),
+            selectinload(OrdemServico.pecas_utilizadas).joinedload(PecaUtilizada.peca)
+        ).filter(OrdemServico.id.in_([ordem_id for ordem_id, _ in resultados]))
+    }
+    semelhantes = []
+    for ordem_id, similaridade in resultados:
+        ordem = ordens.get(ordem_id)
+        if ordem is None:
+            continue
+        ordem_dict = ordem.to_dict()
+        ordem_dict['similaridade'] = similaridade
+        ordem_dict['pecas_utilizadas'] = [peca.to_dict() for peca in ordem.pecas_utilizadas]
+        semelhantes.append(ordem_dict)
+    return semelhantes
+
+@ordens_servico_bp.route('/ordens_servico/semelhantes', methods=['GET'])
+@cache.cached('ordens_servico', 'pecas_utilizadas', 'pecas', 'termos_ordens_servico', 'frequencia_termos')
+def buscar_ordens_semelhantes():
+    """Ordens com defeito semelhante a um texto livre (?texto=, ?limite=), ex.: na abertura da ordem."""
+    try:
+        texto = request.args.get('texto', '').strip()
+        if not texto:
+            return jsonify({'error': 'Parâmetro texto é obrigatório'}), 400
+        return jsonify(_ordens_semelhantes(texto)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ordens_servico_bp.route('/ordens_servico/<int:id>/semelhantes', methods=['GET'])
+@cache.cached('ordens_servico', 'pecas_utilizadas', 'pecas', 'termos_ordens_servico', 'frequencia_termos')
+def listar_ordens_semelhantes(id):
+    """Ordens anteriores com defeito e serviços semelhantes aos da ordem, com as peças usadas."""
+    try:
+        ordem = OrdemServico.query.get_or_404(id)
+        return jsonify(_ordens_semelhantes(indice_texto.texto_ordem(ordem), excluir_id=id)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @ordens_servico_bp.route('/ordens_servico/<int:id>/orcamento', methods=['GET'])
 def gerar_orcamento(id):
+    """
+    Orçamento da ordem de serviço, sem escrita no banco.
+
+    O valor_total da ordem é mantido nas escritas (peças e mão de obra); aqui
+    ele é recalculado a partir das peças carregadas, com o cliente, o veículo
+    e as peças obtidos por JOIN. A resposta traz um ETag do conteúdo e aceita
+    If-None-Match (304 enquanto o orçamento não mudar).
+    """
     try:
-        ordem = OrdemServico.query.get_or_404(id)
+        ordem = OrdemServico.query.options(
+            joinedload(OrdemServico.cliente),
+            joinedload(OrdemServico.veiculo)
+        ).filter_by(id=id).first_or_404()
+        pecas_utilizadas = PecaUtilizada.query.options(
+            joinedload(PecaUtilizada.peca)
+        ).filter_by(ordem_servico_id=id).order_by(PecaUtilizada.id).all()
         
         # Calcular valor das peças
-        valor_pecas = sum(peca.preco_total for peca in ordem.pecas_utilizadas)
-        valor_total = ordem.valor_mao_obra + valor_pecas
-        
-        # Atualizar valor total na ordem
-        ordem.valor_total = valor_total
-        db.session.commit()
+        valor_pecas = sum(peca.preco_total for peca in pecas_utilizadas)
+        valor_total = (ordem.valor_mao_obra or 0.0) + valor_pecas
         
         orcamento = {
             'ordem_servico_id': ordem.id,
@@ -167,11 +352,13 @@ def gerar_orcamento(id):
             'valor_mao_obra': ordem.valor_mao_obra,
             'valor_pecas': valor_pecas,
             'valor_total': valor_total,
-            'pecas_utilizadas': [peca.to_dict() for peca in ordem.pecas_utilizadas]
+            'pecas_utilizadas': [peca.to_dict() for peca in pecas_utilizadas]
         }
         
-        return jsonify(orcamento), 200
+        response = jsonify(orcamento)
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
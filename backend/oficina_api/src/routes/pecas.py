@@ -1,10 +1,14 @@
 from flask import Blueprint, request, jsonify
-from src.models.oficina_models import db, Peca, PecaUtilizada, OrdemServico
+from src.models.oficina_models import db, Peca, PecaUtilizada, OrdemServico, PrevisaoPeca
+from src.cache import cache
+from src.tarefas import tarefa
+from src import historico, previsao, versoes
 
 pecas_bp = Blueprint('pecas', __name__)
 
 # CRUD de Peças
 @pecas_bp.route('/pecas', methods=['GET'])
+@cache.cached('pecas')
 def listar_pecas():
     try:
         pecas = Peca.query.all()
@@ -12,11 +16,13 @@ def listar_pecas():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Sem cache de resposta: o cache guarda só o corpo, e a rota responde o ETag da versão
 @pecas_bp.route('/pecas/<int:id>', methods=['GET'])
 def obter_peca(id):
     try:
+        versao = versoes.ler(Peca, id)
         peca = Peca.query.get_or_404(id)
-        return jsonify(peca.to_dict()), 200
+        return versoes.com_etag(jsonify(peca.to_dict()), peca, versao), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -50,7 +56,11 @@ def criar_peca():
 @pecas_bp.route('/pecas/<int:id>', methods=['PUT'])
 def atualizar_peca(id):
     try:
+        versao = versoes.ler(Peca, id)
         peca = Peca.query.get_or_404(id)
+        precondicao = versoes.precondicao(peca, versao)
+        if precondicao:
+            return precondicao
         data = request.get_json()
         
         if not data:
@@ -66,9 +76,12 @@ def atualizar_peca(id):
         peca.preco_unitario = data.get('preco_unitario', peca.preco_unitario)
         peca.estoque = data.get('estoque', peca.estoque)
         
+        # Outra requisição gravou a peça depois da leitura: não sobrescrever
+        if not versoes.incrementar(peca, versao):
+            return versoes.conflito()
         db.session.commit()
         
-        return jsonify(peca.to_dict()), 200
+        return versoes.com_etag(jsonify(peca.to_dict()), peca, versao + 1), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -76,13 +89,22 @@ def atualizar_peca(id):
 @pecas_bp.route('/pecas/<int:id>', methods=['DELETE'])
 def excluir_peca(id):
     try:
+        versao = versoes.ler(Peca, id)
         peca = Peca.query.get_or_404(id)
+        falha = versoes.precondicao(peca, versao)
+        if falha:
+            return falha
         
         # Verificar se a peça foi utilizada em alguma ordem de serviço
         if peca.pecas_utilizadas:
             return jsonify({'error': 'Não é possível excluir peça que já foi utilizada em ordens de serviço'}), 400
         
+        PrevisaoPeca.query.filter_by(peca_id=id).delete()
         db.session.delete(peca)
+        
+        # A versão continua valendo após a exclusão (id reaproveitado)
+        if not versoes.incrementar(peca, versao):
+            return versoes.conflito()
         db.session.commit()
         
         return jsonify({'message': 'Peça excluída com sucesso'}), 200
@@ -90,16 +112,53 @@ def excluir_peca(id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Previsão de consumo e estoque baixo
+@tarefa('previsao_estoque')
+def tarefa_previsao_estoque(parametros, progresso):
+    return previsao.calcular()
+
+@pecas_bp.route('/pecas/estoque_baixo', methods=['GET'])
+@cache.cached('pecas', 'previsoes_pecas')
+def listar_pecas_estoque_baixo():
+    """
+    Peças com estoque no ponto de pedido ou abaixo, das que acabam primeiro às
+    que acabam depois, com a previsão de consumo e a quantidade sugerida.
+    O ponto de pedido vem do último cálculo (calcular-previsoes ou a tarefa
+    previsao_estoque); o estoque é o atual.
+    """
+    try:
+        linhas = db.session.query(Peca, PrevisaoPeca).join(
+            PrevisaoPeca, PrevisaoPeca.peca_id == Peca.id
+        ).filter(
+            PrevisaoPeca.ponto_pedido > 0,
+            Peca.estoque <= PrevisaoPeca.ponto_pedido
+        ).order_by(
+            (Peca.estoque / PrevisaoPeca.consumo_diario).asc(),
+            Peca.id
+        ).all()
+        
+        resultado = []
+        for peca, previsao_peca in linhas:
+            item = peca.to_dict()
+            item['previsao'] = previsao_peca.to_dict()
+            resultado.append(item)
+        
+        return jsonify(resultado), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Peças Utilizadas em Ordens de Serviço
 @pecas_bp.route('/ordens_servico/<int:os_id>/pecas', methods=['POST'])
 def adicionar_peca_ordem_servico(os_id):
     try:
-        ordem = OrdemServico.query.get_or_404(os_id)
         data = request.get_json()
         
         if not data or not data.get('peca_id') or not data.get('quantidade'):
             return jsonify({'error': 'peca_id e quantidade são obrigatórios'}), 400
         
+        # Versões lidas antes dos registros (ver src/versoes.py)
+        versao_ordem, versao_peca = versoes.ler(OrdemServico, os_id), versoes.ler(Peca, data['peca_id'])
+        ordem = OrdemServico.query.get_or_404(os_id)
         peca = Peca.query.get(data['peca_id'])
         if not peca:
             return jsonify({'error': 'Peça não encontrada'}), 404
@@ -125,9 +184,14 @@ def adicionar_peca_ordem_servico(os_id):
         peca.estoque -= quantidade
         
         # Atualizar valor total da ordem de serviço
-        ordem.valor_total = ordem.valor_mao_obra + sum(pu.preco_total for pu in ordem.pecas_utilizadas) + preco_total
-        
         db.session.add(peca_utilizada)
+        ordem.atualizar_valor_total()
+        historico.atualizar(veiculos=[ordem.veiculo_id], clientes=[ordem.cliente_id])
+        
+        # Estoque e valor total foram calculados sobre o que foi lido: se a
+        # peça ou a ordem mudaram desde então, desfazer em vez de sobrescrever
+        if not (versoes.incrementar(ordem, versao_ordem) and versoes.incrementar(peca, versao_peca)):
+            return versoes.conflito()
         db.session.commit()
         
         return jsonify(peca_utilizada.to_dict()), 201
@@ -138,6 +202,7 @@ def adicionar_peca_ordem_servico(os_id):
 @pecas_bp.route('/ordens_servico/<int:os_id>/pecas/<int:peca_utilizada_id>', methods=['DELETE'])
 def remover_peca_ordem_servico(os_id, peca_utilizada_id):
     try:
+        versao_ordem = versoes.ler(OrdemServico, os_id)
         ordem = OrdemServico.query.get_or_404(os_id)
         peca_utilizada = PecaUtilizada.query.get_or_404(peca_utilizada_id)
         
@@ -145,14 +210,18 @@ def remover_peca_ordem_servico(os_id, peca_utilizada_id):
         if peca_utilizada.ordem_servico_id != os_id:
             return jsonify({'error': 'Peça utilizada não pertence a esta ordem de serviço'}), 400
         
-        # Devolver ao estoque
+        # Devolver ao estoque (a versão da peça antes de carregá-la)
+        versao_peca = versoes.ler(Peca, peca_utilizada.peca_id)
         peca = peca_utilizada.peca
         peca.estoque += peca_utilizada.quantidade
         
         # Atualizar valor total da ordem de serviço
-        ordem.valor_total -= peca_utilizada.preco_total
-        
         db.session.delete(peca_utilizada)
+        ordem.atualizar_valor_total()
+        historico.atualizar(veiculos=[ordem.veiculo_id], clientes=[ordem.cliente_id])
+        
+        if not (versoes.incrementar(ordem, versao_ordem) and versoes.incrementar(peca, versao_peca)):
+            return versoes.conflito()
         db.session.commit()
         
         return jsonify({'message': 'Peça removida da ordem de serviço com sucesso'}), 200
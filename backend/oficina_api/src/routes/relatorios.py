@@ -1,138 +1,375 @@
 from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from sqlalchemy import func, extract
-from src.models.oficina_models import db, OrdemServico, PecaUtilizada, Peca
+from src.models.oficina_models import db, OrdemServico, PecaUtilizada, Peca, Cliente, Veiculo
+from src.tarefas import tarefa, get_executor
+from src.cache import cache
 
 relatorios_bp = Blueprint('relatorios', __name__)
 
+# Linhas lidas por consulta nos relatórios e exportações percorridos em blocos
+TAMANHO_BLOCO = 1000
+
+# Períodos da série de faturamento e máximo de pontos por consulta
+GRANULARIDADES = ('dia', 'semana', 'mes')
+MAX_PERIODOS = 3660
+
+def _submeter_assincrono(tipo, parametros):
+    """Com ?assincrono=1, enfileira o relatório como tarefa e responde 202."""
+    if request.args.get('assincrono') not in ('1', 'true'):
+        return None
+    tarefa_criada = get_executor().submeter(tipo, parametros)
+    response = jsonify(tarefa_criada.to_dict())
+    response.headers['Location'] = f'/api/tarefas/{tarefa_criada.id}'
+    return response, 202
+
+def _em_blocos(query, coluna_id):
+    """Percorre a consulta em blocos por id, sem manter um cursor aberto entre eles."""
+    ultimo_id = 0
+    while True:
+        bloco = query.filter(coluna_id > ultimo_id).order_by(coluna_id).limit(TAMANHO_BLOCO).all()
+        if not bloco:
+            return
+        yield bloco
+        ultimo_id = bloco[-1].id
+
+def relatorio_faturamento_mensal(ano, mes):
+    # Consultar ordens de serviço do mês/ano especificado
+    ordens = db.session.query(OrdemServico).filter(
+        extract('year', OrdemServico.data_entrada) == ano,
+        extract('month', OrdemServico.data_entrada) == mes,
+        OrdemServico.status == 'Entregue'  # Apenas ordens entregues
+    ).all()
+    
+    total_faturamento = sum(ordem.valor_total for ordem in ordens)
+    total_ordens = len(ordens)
+    
+    # Faturamento por dia do mês
+    faturamento_diario = {}
+    for ordem in ordens:
+        dia = ordem.data_entrada.day
+        if dia not in faturamento_diario:
+            faturamento_diario[dia] = {'valor': 0, 'ordens': 0}
+        faturamento_diario[dia]['valor'] += ordem.valor_total
+        faturamento_diario[dia]['ordens'] += 1
+    
+    return {
+        'ano': ano,
+        'mes': mes,
+        'total_faturamento': total_faturamento,
+        'total_ordens': total_ordens,
+        'faturamento_diario': faturamento_diario,
+        'ordens_detalhadas': [ordem.to_dict() for ordem in ordens]
+    }
+
+def relatorio_pecas_mais_usadas(dias):
+    data_limite = datetime.now().date() - timedelta(days=dias)
+    
+    # Consultar peças mais utilizadas
+    pecas_utilizadas = db.session.query(
+        Peca.nome,
+        func.sum(PecaUtilizada.quantidade).label('total_quantidade'),
+        func.sum(PecaUtilizada.preco_total).label('total_valor'),
+        func.count(PecaUtilizada.id).label('total_usos')
+    ).join(
+        PecaUtilizada, Peca.id == PecaUtilizada.peca_id
+    ).join(
+        OrdemServico, PecaUtilizada.ordem_servico_id == OrdemServico.id
+    ).filter(
+        OrdemServico.data_entrada >= data_limite
+    ).group_by(
+        Peca.id, Peca.nome
+    ).order_by(
+        func.sum(PecaUtilizada.quantidade).desc()
+    ).limit(10).all()
+    
+    return {
+        'periodo_dias': dias,
+        'data_inicio': data_limite.isoformat(),
+        'pecas_mais_usadas': [
+            {
+                'nome': peca.nome,
+                'total_quantidade': peca.total_quantidade,
+                'total_valor': float(peca.total_valor),
+                'total_usos': peca.total_usos
+            }
+            for peca in pecas_utilizadas
+        ]
+    }
+
+def relatorio_servicos_mais_realizados(dias, progresso=None):
+    data_limite = datetime.now().date() - timedelta(days=dias)
+    
+    # Consultar ordens de serviço do período (apenas as colunas usadas, em blocos)
+    query = db.session.query(
+        OrdemServico.id, OrdemServico.servicos_a_realizar, OrdemServico.valor_total
+    ).filter(
+        OrdemServico.data_entrada >= data_limite,
+        OrdemServico.status == 'Entregue'
+    )
+    total_ordens = query.count()
+    
+    # Contar serviços (baseado no campo servicos_a_realizar)
+    servicos_count = {}
+    lidas = 0
+    for bloco in _em_blocos(query, OrdemServico.id):
+        for ordem in bloco:
+            if ordem.servicos_a_realizar:
+                # Dividir por vírgula ou ponto e vírgula para contar serviços individuais
+                servicos = [s.strip() for s in ordem.servicos_a_realizar.replace(';', ',').split(',')]
+                for servico in servicos:
+                    if servico:
+                        servico_lower = servico.lower()
+                        if servico_lower not in servicos_count:
+                            servicos_count[servico_lower] = {'nome': servico, 'quantidade': 0, 'valor_total': 0}
+                        servicos_count[servico_lower]['quantidade'] += 1
+                        servicos_count[servico_lower]['valor_total'] += ordem.valor_total
+        lidas += len(bloco)
+        if progresso:
+            progresso(lidas / max(total_ordens, lidas), f'{lidas} de {total_ordens} ordens')
+    
+    # Ordenar por quantidade
+    servicos_ordenados = sorted(
+        servicos_count.values(),
+        key=lambda x: x['quantidade'],
+        reverse=True
+    )[:10]  # Top 10
+    
+    return {
+        'periodo_dias': dias,
+        'data_inicio': data_limite.isoformat(),
+        'total_ordens_periodo': total_ordens,
+        'servicos_mais_realizados': servicos_ordenados
+    }
+
+def exportar_ordens_servico(status=None, progresso=None):
+    """Linhas CSV (cabeçalho primeiro) com as ordens de serviço, cliente e veículo."""
+    query = db.session.query(
+        OrdemServico.id, OrdemServico.data_entrada, OrdemServico.status,
+        Cliente.nome.label('cliente_nome'), Veiculo.placa.label('veiculo_placa'),
+        OrdemServico.servicos_a_realizar, OrdemServico.valor_mao_obra, OrdemServico.valor_total
+    ).join(
+        Cliente, OrdemServico.cliente_id == Cliente.id
+    ).join(
+        Veiculo, OrdemServico.veiculo_id == Veiculo.id
+    )
+    if status:
+        query = query.filter(OrdemServico.status == status)
+    total_ordens = query.count()
+    
+    yield ['id', 'data_entrada', 'status', 'cliente_nome', 'veiculo_placa',
+           'servicos_a_realizar', 'valor_mao_obra', 'valor_total']
+    lidas = 0
+    for bloco in _em_blocos(query, OrdemServico.id):
+        for ordem in bloco:
+            yield [ordem.id, ordem.data_entrada.isoformat() if ordem.data_entrada else '', ordem.status,
+                   ordem.cliente_nome, ordem.veiculo_placa, ordem.servicos_a_realizar or '',
+                   ordem.valor_mao_obra, ordem.valor_total]
+        lidas += len(bloco)
+        if progresso:
+            progresso(lidas / max(total_ordens, lidas), f'{lidas} de {total_ordens} ordens')
+
+def _inicio_periodo(dia, granularidade):
+    """Primeiro dia do período (dia, semana começando na segunda-feira ou mês)."""
+    if granularidade == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+def _numero_periodos(inicio, fim, granularidade):
+    """Quantidade de períodos entre inicio e fim, sem montá-los."""
+    if granularidade == 'mes':
+        return (fim.year - inicio.year) * 12 + fim.month - inicio.month + 1
+    dias = (fim - _inicio_periodo(inicio, granularidade)).days
+    return dias // 7 + 1 if granularidade == 'semana' else dias + 1
+
+def _periodos(inicio, fim, granularidade):
+    """Primeiro dia de cada período entre inicio e fim, inclusive."""
+    atual = _inicio_periodo(inicio, granularidade)
+    periodos = []
+    while atual <= fim:
+        periodos.append(atual)
+        try:
+            if granularidade == 'mes':
+                atual = (atual.replace(day=28) + timedelta(days=4)).replace(day=1)
+            else:
+                atual += timedelta(days=7 if granularidade == 'semana' else 1)
+        except OverflowError:
+            break  # Último período antes de date.max
+    return periodos
+
+def relatorio_serie_faturamento(inicio, fim, granularidade='mes', dividir_por=None, status='Entregue'):
+    """
+    Faturamento por dia, semana ou mês entre inicio e fim, com os períodos sem
+    ordens preenchidos com zero.
+
+    Args:
+        inicio, fim: Datas (inclusive) de entrada das ordens
+        granularidade: 'dia', 'semana' ou 'mes'
+        dividir_por: None, 'status' (valor de cada status no período) ou
+            'origem' (mão de obra e peças)
+        status: Status considerado; None considera todos
+
+    Returns:
+        dict: Períodos com valor e número de ordens, e o total do intervalo
+    """
+    # Uma consulta agrupada por dia, respondida pelo índice de data e status;
+    # os dias (no máximo um por data do intervalo) são somados nos períodos
+    # aqui, sem funções de data específicas do SQLite ou do PostgreSQL
+    colunas = [
+        OrdemServico.data_entrada,
+        func.coalesce(func.sum(OrdemServico.valor_total), 0.0),
+        func.count(OrdemServico.id),
+        func.coalesce(func.sum(OrdemServico.valor_mao_obra), 0.0)
+    ]
+    agrupamento = [OrdemServico.data_entrada]
+    if dividir_por == 'status':
+        colunas.append(OrdemServico.status)
+        agrupamento.append(OrdemServico.status)
+
+    query = db.session.query(*colunas).filter(
+        OrdemServico.data_entrada >= inicio,
+        OrdemServico.data_entrada <= fim
+    )
+    if status:
+        query = query.filter(OrdemServico.status == status)
+    linhas = query.group_by(*agrupamento).all()
+
+    def vazio():
+        item = {'valor': 0.0, 'ordens': 0}
+        if dividir_por == 'origem':
+            item.update(mao_obra=0.0, pecas=0.0)
+        if dividir_por == 'status':
+            item['por_status'] = {}
+        return item
+
+    series = {periodo.isoformat(): vazio() for periodo in _periodos(inicio, fim, granularidade)}
+    total = vazio()
+    for linha in linhas:
+        chave = _inicio_periodo(linha[0], granularidade).isoformat()
+        valor, ordens, mao_obra = float(linha[1]), linha[2], float(linha[3])
+        for item in (series[chave], total):
+            item['valor'] += valor
+            item['ordens'] += ordens
+            if dividir_por == 'origem':
+                item['mao_obra'] += mao_obra
+                item['pecas'] += valor - mao_obra
+            elif dividir_por == 'status':
+                por_status = item['por_status'].setdefault(linha[4], {'valor': 0.0, 'ordens': 0})
+                por_status['valor'] += valor
+                por_status['ordens'] += ordens
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'granularidade': granularidade,
+        'dividir_por': dividir_por,
+        'status': status,
+        'total': total,
+        'series': [{'periodo': periodo, **item} for periodo, item in series.items()]
+    }
+
+# Relatórios executados como tarefas em segundo plano (ver src/tarefas.py)
+@tarefa('faturamento_mensal')
+def _tarefa_faturamento_mensal(parametros, progresso):
+    hoje = datetime.now()
+    return relatorio_faturamento_mensal(int(parametros.get('ano', hoje.year)), int(parametros.get('mes', hoje.month)))
+
+@tarefa('pecas_mais_usadas')
+def _tarefa_pecas_mais_usadas(parametros, progresso):
+    return relatorio_pecas_mais_usadas(int(parametros.get('dias', 30)))
+
+@tarefa('servicos_mais_realizados')
+def _tarefa_servicos_mais_realizados(parametros, progresso):
+    return relatorio_servicos_mais_realizados(int(parametros.get('dias', 30)), progresso)
+
+@tarefa('exportar_ordens_servico', extensao='csv')
+def _tarefa_exportar_ordens_servico(parametros, progresso):
+    return exportar_ordens_servico(parametros.get('status'), progresso)
+
 @relatorios_bp.route('/relatorios/faturamento_mensal', methods=['GET'])
+@cache.cached('ordens_servico', 'clientes', 'veiculos')
 def faturamento_mensal():
     try:
         # Parâmetros opcionais para ano e mês
         ano = request.args.get('ano', datetime.now().year, type=int)
         mes = request.args.get('mes', datetime.now().month, type=int)
         
-        # Consultar ordens de serviço do mês/ano especificado
-        ordens = db.session.query(OrdemServico).filter(
-            extract('year', OrdemServico.data_entrada) == ano,
-            extract('month', OrdemServico.data_entrada) == mes,
-            OrdemServico.status == 'Entregue'  # Apenas ordens entregues
-        ).all()
-        
-        total_faturamento = sum(ordem.valor_total for ordem in ordens)
-        total_ordens = len(ordens)
+        assincrono = _submeter_assincrono('faturamento_mensal', {'ano': ano, 'mes': mes})
+        if assincrono:
+            return assincrono
         
-        # Faturamento por dia do mês
-        faturamento_diario = {}
-        for ordem in ordens:
-            dia = ordem.data_entrada.day
-            if dia not in faturamento_diario:
-                faturamento_diario[dia] = {'valor': 0, 'ordens': 0}
-            faturamento_diario[dia]['valor'] += ordem.valor_total
-            faturamento_diario[dia]['ordens'] += 1
-        
-        relatorio = {
-            'ano': ano,
-            'mes': mes,
-            'total_faturamento': total_faturamento,
-            'total_ordens': total_ordens,
-            'faturamento_diario': faturamento_diario,
-            'ordens_detalhadas': [ordem.to_dict() for ordem in ordens]
-        }
-        
-        return jsonify(relatorio), 200
+        return jsonify(relatorio_faturamento_mensal(ano, mes)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@relatorios_bp.route('/relatorios/faturamento', methods=['GET'])
+@cache.cached('ordens_servico')
+def serie_faturamento():
+    try:
+        hoje = datetime.now().date()
+        fim = date.fromisoformat(request.args['fim']) if request.args.get('fim') else hoje
+        if request.args.get('inicio'):
+            inicio = date.fromisoformat(request.args['inicio'])
+        else:
+            # Padrão: os últimos doze meses, incluindo o atual
+            inicio = date(fim.year - 1, fim.month, 1) + timedelta(days=31)
+            inicio = inicio.replace(day=1)
+        granularidade = request.args.get('granularidade', 'mes')
+        dividir_por = request.args.get('dividir_por') or None
+        # Dividido por status, considera todos os status salvo filtro explícito
+        status = request.args.get('status', None if dividir_por == 'status' else 'Entregue')
+        if status == 'todos':
+            status = None
+
+        if granularidade not in GRANULARIDADES:
+            return jsonify({'error': 'granularidade deve ser dia, semana ou mes'}), 400
+        if dividir_por not in (None, 'status', 'origem'):
+            return jsonify({'error': 'dividir_por deve ser status ou origem'}), 400
+        if inicio > fim:
+            return jsonify({'error': 'inicio deve ser anterior ou igual a fim'}), 400
+        if _numero_periodos(inicio, fim, granularidade) > MAX_PERIODOS:
+            return jsonify({'error': f'Intervalo com mais de {MAX_PERIODOS} períodos; use uma granularidade maior'}), 400
+
+        return jsonify(relatorio_serie_faturamento(inicio, fim, granularidade, dividir_por, status)), 200
+    except ValueError:
+        return jsonify({'error': 'Datas devem estar no formato AAAA-MM-DD'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @relatorios_bp.route('/relatorios/pecas_mais_usadas', methods=['GET'])
+@cache.cached('pecas', 'pecas_utilizadas', 'ordens_servico')
 def pecas_mais_usadas():
     try:
         # Parâmetros opcionais para período
         dias = request.args.get('dias', 30, type=int)  # Últimos 30 dias por padrão
-        data_limite = datetime.now().date() - timedelta(days=dias)
-        
-        # Consultar peças mais utilizadas
-        pecas_utilizadas = db.session.query(
-            Peca.nome,
-            func.sum(PecaUtilizada.quantidade).label('total_quantidade'),
-            func.sum(PecaUtilizada.preco_total).label('total_valor'),
-            func.count(PecaUtilizada.id).label('total_usos')
-        ).join(
-            PecaUtilizada, Peca.id == PecaUtilizada.peca_id
-        ).join(
-            OrdemServico, PecaUtilizada.ordem_servico_id == OrdemServico.id
-        ).filter(
-            OrdemServico.data_entrada >= data_limite
-        ).group_by(
-            Peca.id, Peca.nome
-        ).order_by(
-            func.sum(PecaUtilizada.quantidade).desc()
-        ).limit(10).all()
         
-        relatorio = {
-            'periodo_dias': dias,
-            'data_inicio': data_limite.isoformat(),
-            'pecas_mais_usadas': [
-                {
-                    'nome': peca.nome,
-                    'total_quantidade': peca.total_quantidade,
-                    'total_valor': float(peca.total_valor),
-                    'total_usos': peca.total_usos
-                }
-                for peca in pecas_utilizadas
-            ]
-        }
+        assincrono = _submeter_assincrono('pecas_mais_usadas', {'dias': dias})
+        if assincrono:
+            return assincrono
         
-        return jsonify(relatorio), 200
+        return jsonify(relatorio_pecas_mais_usadas(dias)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @relatorios_bp.route('/relatorios/servicos_mais_realizados', methods=['GET'])
+@cache.cached('ordens_servico')
 def servicos_mais_realizados():
     try:
         # Parâmetros opcionais para período
         dias = request.args.get('dias', 30, type=int)  # Últimos 30 dias por padrão
-        data_limite = datetime.now().date() - timedelta(days=dias)
         
-        # Consultar ordens de serviço do período
-        ordens = db.session.query(OrdemServico).filter(
-            OrdemServico.data_entrada >= data_limite,
-            OrdemServico.status == 'Entregue'
-        ).all()
-        
-        # Contar serviços (baseado no campo servicos_a_realizar)
-        servicos_count = {}
-        for ordem in ordens:
-            if ordem.servicos_a_realizar:
-                # Dividir por vírgula ou ponto e vírgula para contar serviços individuais
-                servicos = [s.strip() for s in ordem.servicos_a_realizar.replace(';', ',').split(',')]
-                for servico in servicos:
-                    if servico:
-                        servico_lower = servico.lower()
-                        if servico_lower not in servicos_count:
-                            servicos_count[servico_lower] = {'nome': servico, 'quantidade': 0, 'valor_total': 0}
-                        servicos_count[servico_lower]['quantidade'] += 1
-                        servicos_count[servico_lower]['valor_total'] += ordem.valor_total
-        
-        # Ordenar por quantidade
-        servicos_ordenados = sorted(
-            servicos_count.values(),
-            key=lambda x: x['quantidade'],
-            reverse=True
-        )[:10]  # Top 10
-        
-        relatorio = {
-            'periodo_dias': dias,
-            'data_inicio': data_limite.isoformat(),
-            'total_ordens_periodo': len(ordens),
-            'servicos_mais_realizados': servicos_ordenados
-        }
+        assincrono = _submeter_assincrono('servicos_mais_realizados', {'dias': dias})
+        if assincrono:
+            return assincrono
         
-        return jsonify(relatorio), 200
+        return jsonify(relatorio_servicos_mais_realizados(dias)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @relatorios_bp.route('/relatorios/dashboard', methods=['GET'])
+@cache.cached('ordens_servico')
 def dashboard():
     try:
         # Estatísticas gerais
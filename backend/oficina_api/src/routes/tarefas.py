@@ -0,0 +1,81 @@
+from flask import Blueprint, request, jsonify, send_file
+import os
+from src.models.oficina_models import Tarefa
+from src.tarefas import TIPOS, get_executor
+
+tarefas_bp = Blueprint('tarefas', __name__)
+
+@tarefas_bp.route('/tarefas', methods=['POST'])
+def criar_tarefa():
+    """
+    Enfileira um relatório ou exportação para execução em segundo plano.
+
+    Espera {"tipo": "servicos_mais_realizados", "parametros": {"dias": 3650}};
+    responde 202 com a tarefa e o cabeçalho Location para acompanhar o andamento.
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('tipo'):
+            return jsonify({'error': 'Tipo é obrigatório', 'tipos': sorted(TIPOS)}), 400
+        
+        if data['tipo'] not in TIPOS:
+            return jsonify({'error': 'Tipo de tarefa desconhecido', 'tipos': sorted(TIPOS)}), 400
+        
+        parametros = data.get('parametros') or {}
+        if not isinstance(parametros, dict):
+            return jsonify({'error': 'Campo "parametros" deve ser um objeto'}), 400
+        
+        tarefa = get_executor().submeter(data['tipo'], parametros)
+        
+        response = jsonify(tarefa.to_dict())
+        response.headers['Location'] = f'/api/tarefas/{tarefa.id}'
+        return response, 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@tarefas_bp.route('/tarefas', methods=['GET'])
+def listar_tarefas():
+    try:
+        query = Tarefa.query
+        status_filter = request.args.get('status')
+        if status_filter:
+            query = query.filter_by(status=status_filter)
+        tarefas = query.order_by(Tarefa.criada_em.desc()).limit(100).all()
+        return jsonify([tarefa.to_dict() for tarefa in tarefas]), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@tarefas_bp.route('/tarefas/<id>', methods=['GET'])
+def obter_tarefa(id):
+    try:
+        tarefa = Tarefa.query.get_or_404(id)
+        tarefa_dict = tarefa.to_dict()
+        if tarefa.status == 'concluida':
+            tarefa_dict['resultado_url'] = f'/api/tarefas/{tarefa.id}/resultado'
+        return jsonify(tarefa_dict), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@tarefas_bp.route('/tarefas/<id>/resultado', methods=['GET'])
+def obter_resultado_tarefa(id):
+    try:
+        tarefa = Tarefa.query.get_or_404(id)
+        
+        if tarefa.status == 'expirada':
+            return jsonify({'error': 'Resultado expirado; envie a tarefa novamente'}), 410
+        if tarefa.status == 'erro':
+            return jsonify({'error': f'Tarefa falhou: {tarefa.mensagem}'}), 500
+        if tarefa.status != 'concluida':
+            return jsonify({'error': 'Tarefa ainda não concluída', 'status': tarefa.status,
+                            'progresso': tarefa.progresso}), 409
+        if not tarefa.arquivo or not os.path.exists(tarefa.arquivo):
+            return jsonify({'error': 'Arquivo de resultado não encontrado'}), 410
+        
+        return send_file(
+            os.path.abspath(tarefa.arquivo),
+            as_attachment=tarefa.arquivo.endswith('.csv'),
+            download_name=f'{tarefa.tipo}-{tarefa.id}{os.path.splitext(tarefa.arquivo)[1]}'
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
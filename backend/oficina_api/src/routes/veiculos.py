@@ -1,25 +1,37 @@
 from flask import Blueprint, request, jsonify
-from src.models.oficina_models import db, Veiculo, Cliente
+from src.models.oficina_models import db, Veiculo, Cliente, OrdemServico
+from src.cache import cache
+from src import historico, inclusoes
 
 veiculos_bp = Blueprint('veiculos', __name__)
 
 @veiculos_bp.route('/veiculos', methods=['GET'])
+@cache.cached('veiculos', 'clientes', 'ordens_servico')
 def listar_veiculos():
     try:
-        veiculos = Veiculo.query.all()
-        return jsonify([veiculo.to_dict() for veiculo in veiculos]), 200
+        # ?include=cliente,ordens_servico embute as relações (ver src/inclusoes.py)
+        incluir = inclusoes.ler(Veiculo)
+        veiculos = Veiculo.query.options(*inclusoes.opcoes(Veiculo, incluir)).all()
+        return jsonify([inclusoes.serializar(veiculo, incluir) for veiculo in veiculos]), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @veiculos_bp.route('/veiculos/<int:id>', methods=['GET'])
+@cache.cached('veiculos', 'clientes', 'ordens_servico')
 def obter_veiculo(id):
     try:
-        veiculo = Veiculo.query.get_or_404(id)
-        return jsonify(veiculo.to_dict()), 200
+        incluir = inclusoes.ler(Veiculo)
+        veiculo = Veiculo.query.options(*inclusoes.opcoes(Veiculo, incluir)).filter_by(id=id).first_or_404()
+        return jsonify(inclusoes.serializar(veiculo, incluir)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @veiculos_bp.route('/veiculos/cliente/<int:cliente_id>', methods=['GET'])
+@cache.cached('veiculos', 'clientes')
 def listar_veiculos_cliente(cliente_id):
     try:
         cliente = Cliente.query.get_or_404(cliente_id)
@@ -29,6 +41,7 @@ def listar_veiculos_cliente(cliente_id):
         return jsonify({'error': str(e)}), 500
 
 @veiculos_bp.route('/veiculos/buscar/<string:placa>', methods=['GET'])
+@cache.cached('veiculos', 'clientes')
 def buscar_veiculo_por_placa(placa):
     try:
         veiculo = Veiculo.query.filter_by(placa=placa.upper()).first()
@@ -61,11 +74,13 @@ def criar_veiculo():
             placa=placa_upper,
             modelo=data.get('modelo'),
             ano=data.get('ano'),
-            quilometragem=data.get('quilometragem'),
             cliente_id=data['cliente_id']
         )
         
         db.session.add(veiculo)
+        db.session.flush()
+        historico.registrar_quilometragem(veiculo, data.get('quilometragem'))
+        historico.atualizar(veiculos=[veiculo.id], clientes=[veiculo.cliente_id])
         db.session.commit()
         
         return jsonify(veiculo.to_dict()), 201
@@ -92,14 +107,17 @@ def atualizar_veiculo(id):
         
         veiculo.modelo = data.get('modelo', veiculo.modelo)
         veiculo.ano = data.get('ano', veiculo.ano)
-        veiculo.quilometragem = data.get('quilometragem', veiculo.quilometragem)
+        if data.get('quilometragem') is not None and data['quilometragem'] != veiculo.quilometragem:
+            historico.registrar_quilometragem(veiculo, data['quilometragem'])
         
+        cliente_anterior = veiculo.cliente_id
         if 'cliente_id' in data:
             cliente = Cliente.query.get(data['cliente_id'])
             if not cliente:
                 return jsonify({'error': 'Cliente não encontrado'}), 404
             veiculo.cliente_id = data['cliente_id']
         
+        historico.atualizar(veiculos=[veiculo.id], clientes=[cliente_anterior, veiculo.cliente_id])
         db.session.commit()
         
         return jsonify(veiculo.to_dict()), 200
@@ -116,10 +134,34 @@ def excluir_veiculo(id):
         if veiculo.ordens_servico:
             return jsonify({'error': 'Não é possível excluir veículo com ordens de serviço associadas'}), 400
         
+        historico.remover(veiculo_id=id)
         db.session.delete(veiculo)
+        historico.atualizar(clientes=[veiculo.cliente_id])
         db.session.commit()
         
         return jsonify({'message': 'Veículo excluído com sucesso'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+@veiculos_bp.route('/veiculos/<int:id>/historico', methods=['GET'])
+@cache.cached('ordens_servico', 'pecas_utilizadas', 'pecas', 'veiculos', 'clientes', 'leituras_quilometragem', 'resumos_veiculos')
+def historico_veiculo(id):
+    """
+    Histórico do veículo: resumo (visitas, total gasto, quilometragem), leituras
+    do hodômetro e as ordens de serviço com as peças, paginadas (?pagina=, ?por_pagina=).
+    """
+    try:
+        veiculo = Veiculo.query.get_or_404(id)
+        resumo = historico.resumo_veiculo(id)
+        
+        resultado = {
+            'veiculo': veiculo.to_dict(),
+            'resumo': resumo,
+            'quilometragem': historico.leituras(id)
+        }
+        resultado.update(historico.pagina_ordens(OrdemServico.veiculo_id == id, resumo['visitas']))
+        
+        return jsonify(resultado), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
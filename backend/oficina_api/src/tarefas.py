@@ -0,0 +1,282 @@
+"""
+Execução de relatórios e exportações pesadas fora da thread da requisição.
+
+Cada tarefa é uma linha da tabela tarefas; o resultado é gravado em um arquivo
+(TAREFAS_DIR) que fica disponível até expirar (TAREFAS_TTL_HORAS). As tarefas
+rodam em um pool de threads de cada processo web (TAREFAS_WORKERS) e/ou em um
+processo dedicado (flask --app src.main executar-tarefas). A reserva de uma
+tarefa é um UPDATE condicional, então vários processos podem disputar a mesma
+fila sem executar uma tarefa duas vezes. Enquanto a tarefa executa, uma thread
+de batimento renova atualizada_em; só as tarefas sem batimento (processo
+encerrado no meio) voltam para a fila, e as gravações de andamento e de
+conclusão valem apenas para a execução que ainda detém a tarefa.
+
+Os tipos de tarefa são registrados com o decorador @tarefa nos módulos de
+rotas (ex.: src/routes/relatorios.py).
+"""
+
+import concurrent.futures
+import csv
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from src.models.oficina_models import db, Tarefa
+
+# tipo -> (função, extensão do arquivo de resultado)
+TIPOS = {}
+
+
+def tarefa(tipo, extensao='json'):
+    """
+    Registra uma função como tipo de tarefa.
+
+    A função recebe (parametros, progresso) e retorna o resultado: um objeto
+    serializável em JSON (extensao='json') ou um iterável de linhas, a primeira
+    com os nomes das colunas (extensao='csv'). progresso(fracao, mensagem=None)
+    informa o andamento (0 a 1).
+    """
+    def registrar(funcao):
+        TIPOS[tipo] = (funcao, extensao)
+        return funcao
+    return registrar
+
+
+class ExecutorTarefas:
+    def __init__(self, app, workers=2, pasta='tarefas', ttl_horas=24.0, timeout_orfa_minutos=10.0):
+        """
+        Args:
+            app: Aplicação Flask (as tarefas rodam em um app_context próprio)
+            workers: Threads de execução neste processo (0 apenas enfileira)
+            pasta: Diretório dos arquivos de resultado
+            ttl_horas: Tempo até o resultado expirar
+            timeout_orfa_minutos: Tarefas em execução sem batimento há mais que
+                isso (processo encerrado no meio) voltam para a fila; o batimento
+                é gravado a cada quarto desse tempo
+        """
+        self.app = app
+        self.workers = workers
+        self.pasta = pasta
+        self.ttl = timedelta(hours=ttl_horas)
+        self.timeout_orfa = timedelta(minutes=timeout_orfa_minutos)
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers) if workers > 0 else None
+        self._lock = threading.Lock()
+        self._ultima_limpeza = 0.0
+        os.makedirs(pasta, exist_ok=True)
+
+    def submeter(self, tipo, parametros=None):
+        """Cria a tarefa e a agenda no pool local (se houver). Retorna a Tarefa."""
+        if tipo not in TIPOS:
+            raise ValueError(f'Tipo de tarefa desconhecido: {tipo}. Tipos: {", ".join(sorted(TIPOS))}')
+
+        tarefa = Tarefa(id=uuid.uuid4().hex, tipo=tipo, parametros=json.dumps(parametros or {}))
+        db.session.add(tarefa)
+        db.session.commit()
+
+        if self._executor is not None:
+            self._executor.submit(self._executar_com_contexto, tarefa.id)
+        self._limpar_periodicamente()
+        return tarefa
+
+    def retomar_pendentes(self):
+        """Reagenda as tarefas pendentes e as órfãs (chamado na inicialização)."""
+        if self._executor is None:
+            return
+        with self.app.app_context():
+            self._liberar_orfas()
+            pendentes = [id for (id,) in db.session.query(Tarefa.id).filter_by(status='pendente')]
+        for tarefa_id in pendentes:
+            self._executor.submit(self._executar_com_contexto, tarefa_id)
+
+    def processar(self, continuo=False, intervalo=2.0):
+        """
+        Executa as tarefas pendentes no processo atual (worker dedicado).
+
+        Returns:
+            int: Número de tarefas executadas
+        """
+        executadas = 0
+        while True:
+            self._liberar_orfas()
+            pendentes = [
+                id for (id,) in
+                db.session.query(Tarefa.id).filter_by(status='pendente').order_by(Tarefa.criada_em)
+            ]
+            db.session.commit()
+            for tarefa_id in pendentes:
+                if self._executar(tarefa_id):
+                    executadas += 1
+            self.limpar_expiradas()
+            if not continuo:
+                return executadas
+            if not pendentes:
+                time.sleep(intervalo)
+
+    def _executar_com_contexto(self, tarefa_id):
+        with self.app.app_context():
+            try:
+                self._executar(tarefa_id)
+            finally:
+                db.session.remove()
+
+    def _executar(self, tarefa_id):
+        agora = datetime.utcnow()
+        reservada = db.session.execute(
+            update(Tarefa)
+            .where(Tarefa.id == tarefa_id, Tarefa.status == 'pendente')
+            .values(status='executando', iniciada_em=agora, atualizada_em=agora, progresso=0.0)
+        ).rowcount
+        db.session.commit()
+        if not reservada:
+            return False  # Outro processo já reservou a tarefa
+
+        tarefa = db.session.get(Tarefa, tarefa_id)
+        funcao, extensao = TIPOS.get(tarefa.tipo, (None, None))
+        caminho = os.path.join(self.pasta, f'{tarefa.id}.{extensao}')
+        batimento = self._batimento(tarefa_id, agora)
+        try:
+            if funcao is None:
+                raise ValueError(f'Tipo de tarefa desconhecido: {tarefa.tipo}')
+            resultado = funcao(json.loads(tarefa.parametros or '{}'), self._progresso(tarefa.id, agora))
+            self._gravar(resultado, caminho, extensao)
+        except Exception as e:
+            db.session.rollback()
+            self._atualizar(tarefa_id, agora, status='erro', mensagem=str(e), concluida_em=datetime.utcnow())
+            return True
+        finally:
+            batimento.set()
+
+        concluida_em = datetime.utcnow()
+        self._atualizar(
+            tarefa_id, agora, status='concluida', progresso=1.0, mensagem=None, arquivo=caminho,
+            concluida_em=concluida_em, expira_em=concluida_em + self.ttl
+        )
+        return True
+
+    def _batimento(self, tarefa_id, iniciada_em):
+        """
+        Inicia a thread que renova atualizada_em enquanto a tarefa executa, para
+        que uma consulta longa sem chamadas a progresso() não seja tomada como
+        órfã. Retorna o Event que a encerra.
+        """
+        parar = threading.Event()
+        intervalo = max(1.0, self.timeout_orfa.total_seconds() / 4)
+
+        def bater():
+            with self.app.app_context():
+                while not parar.wait(intervalo):
+                    try:
+                        if not self._atualizar(tarefa_id, iniciada_em):
+                            return  # A tarefa não é mais desta execução
+                    except Exception:
+                        pass  # Banco ocupado: tentar no próximo intervalo
+
+        threading.Thread(target=bater, name=f'batimento-{tarefa_id[:8]}', daemon=True).start()
+        return parar
+
+    def _gravar(self, resultado, caminho, extensao):
+        # Arquivo temporário + rename: o resultado nunca fica visível pela metade
+        temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporario, 'w', encoding='utf-8', newline='') as arquivo:
+            if extensao == 'csv':
+                csv.writer(arquivo).writerows(resultado)
+            else:
+                json.dump(resultado, arquivo, ensure_ascii=False, default=str)
+        os.replace(temporario, caminho)
+
+    def _progresso(self, tarefa_id, iniciada_em):
+        ultimo = [0.0]
+
+        def progresso(fracao, mensagem=None):
+            # No máximo uma escrita por segundo
+            agora = time.monotonic()
+            if agora - ultimo[0] < 1.0:
+                return
+            ultimo[0] = agora
+            valores = {'progresso': max(0.0, min(1.0, float(fracao))), 'atualizada_em': datetime.utcnow()}
+            if mensagem is not None:
+                valores['mensagem'] = mensagem
+            try:
+                self._atualizar(tarefa_id, iniciada_em, **valores)
+            except Exception:
+                # O andamento é informativo; banco ocupado não interrompe a tarefa
+                pass
+        return progresso
+
+    def _atualizar(self, tarefa_id, iniciada_em, **valores):
+        """
+        Grava na tarefa se ela ainda está em execução pela reserva feita em
+        iniciada_em (e não foi reiniciada por órfã e reservada de novo).
+
+        Returns:
+            bool: False se a tarefa não pertence mais a esta execução
+        """
+        # Conexão própria: não interfere na sessão usada pela função da tarefa
+        valores.setdefault('atualizada_em', datetime.utcnow())
+        with db.engine.begin() as conexao:
+            return conexao.execute(
+                update(Tarefa)
+                .where(Tarefa.id == tarefa_id, Tarefa.status == 'executando', Tarefa.iniciada_em == iniciada_em)
+                .values(**valores)
+            ).rowcount == 1
+
+    def _liberar_orfas(self):
+        limite = datetime.utcnow() - self.timeout_orfa
+        db.session.execute(
+            update(Tarefa)
+            .where(Tarefa.status == 'executando', Tarefa.atualizada_em < limite)
+            .values(status='pendente', mensagem='Reiniciada após interrupção do executor')
+        )
+        db.session.commit()
+
+    def _limpar_periodicamente(self):
+        with self._lock:
+            if time.monotonic() - self._ultima_limpeza < 600:
+                return
+            self._ultima_limpeza = time.monotonic()
+        self.limpar_expiradas()
+
+    def limpar_expiradas(self):
+        """Remove os arquivos dos resultados expirados. Retorna quantos expiraram."""
+        expiradas = Tarefa.query.filter(Tarefa.status == 'concluida', Tarefa.expira_em < datetime.utcnow()).all()
+        for tarefa in expiradas:
+            if tarefa.arquivo and os.path.exists(tarefa.arquivo):
+                os.remove(tarefa.arquivo)
+            tarefa.status = 'expirada'
+            tarefa.arquivo = None
+        db.session.commit()
+        return len(expiradas)
+
+
+_executor = None
+
+
+def init_app(app):
+    """Cria o executor do processo a partir da configuração (variáveis TAREFAS_*)."""
+    global _executor
+    _executor = ExecutorTarefas(
+        app,
+        workers=int(os.environ.get('TAREFAS_WORKERS', 2)),
+        pasta=os.environ.get('TAREFAS_DIR', os.path.join(os.path.dirname(__file__), 'database', 'tarefas')),
+        ttl_horas=float(os.environ.get('TAREFAS_TTL_HORAS', 24.0))
+    )
+
+    # Retomar a fila só no servidor web (na primeira requisição), e não nos
+    # comandos flask, que terminariam esperando as tarefas
+    retomada = threading.Event()
+
+    @app.before_request
+    def retomar_tarefas():
+        if not retomada.is_set():
+            retomada.set()
+            _executor.retomar_pendentes()
+
+    return _executor
+
+
+def get_executor():
+    return _executor
@@ -0,0 +1,103 @@
+"""
+Controle de concorrência otimista das ordens de serviço e peças.
+
+Cada registro alterado tem uma versão na tabela versoes_registros (sem linha,
+versão 0). As rotas de escrita leem a versão antes do registro (assim uma
+gravação entre as duas leituras só pode causar um conflito a mais, nunca um
+a menos) e, antes do commit, a incrementam com um compare-and-set:
+
+    INSERT ... ON CONFLICT DO UPDATE SET versao = versao + 1 WHERE versao = <lida>
+
+Se outra requisição gravou o registro nesse meio tempo, nenhuma linha é
+afetada e a rota desfaz a transação e responde 409, em vez de sobrescrever a
+alteração alheia. O bloqueio é só da linha da versão, durante o commit; as
+demais ordens e peças seguem sendo gravadas em paralelo.
+
+A exclusão também incrementa a versão (a linha fica), para que um id
+reaproveitado por um registro novo não aceite ETags do registro excluído; as
+correções em lote (verificar-totais --corrigir) usam incrementar_todos.
+
+As respostas trazem a versão no ETag ("ordens_servico-12-v3"). Um cliente que
+envia If-Match com um ETag que não é mais o atual recebe 412: o registro
+mudou desde que ele o leu.
+"""
+
+from flask import jsonify, request
+from src.models.oficina_models import db, upsert, VersaoRegistro
+
+
+def ler(modelo, registro_id):
+    """Versão atual do registro (0 se nunca foi alterado); ler antes do registro."""
+    versao = db.session.query(VersaoRegistro.versao).filter_by(
+        tabela=modelo.__tablename__, registro_id=registro_id
+    ).scalar()
+    return versao or 0
+
+
+def etag(objeto, versao):
+    return f'{objeto.__tablename__}-{objeto.id}-v{versao}'
+
+
+def precondicao(objeto, versao):
+    """
+    Confere o If-Match da requisição com a versão lida.
+
+    Returns:
+        Resposta 412 se o If-Match não corresponde à versão atual; None se
+        confere ou se a requisição não enviou If-Match
+    """
+    if not request.if_match or request.if_match.contains(etag(objeto, versao)):
+        return None
+    response = jsonify({
+        'error': 'Registro alterado desde a última leitura; recarregue e tente novamente',
+        'etag': etag(objeto, versao)
+    })
+    response.set_etag(etag(objeto, versao))
+    return response, 412
+
+
+def incrementar(objeto, versao):
+    """
+    Passa o registro da versão lida para a seguinte, na transação atual.
+
+    Returns:
+        bool: False se outra transação já alterou o registro (conflito)
+    """
+    comando = upsert(VersaoRegistro).values(
+        tabela=objeto.__tablename__, registro_id=objeto.id, versao=versao + 1
+    )
+    comando = comando.on_conflict_do_update(
+        index_elements=['tabela', 'registro_id'],
+        set_={'versao': VersaoRegistro.versao + 1},
+        where=VersaoRegistro.versao == versao
+    )
+    return db.session.execute(comando).rowcount == 1
+
+
+def incrementar_todos(modelo, registro_ids):
+    """
+    Incrementa, sem compare-and-set, a versão dos registros alterados por uma
+    gravação em lote, na transação atual: os ETags lidos antes deixam de valer.
+    """
+    if not registro_ids:
+        return
+    comando = upsert(VersaoRegistro).on_conflict_do_update(
+        index_elements=['tabela', 'registro_id'],
+        set_={'versao': VersaoRegistro.versao + 1}
+    )
+    db.session.execute(comando, [
+        {'tabela': modelo.__tablename__, 'registro_id': registro_id, 'versao': 1}
+        for registro_id in registro_ids
+    ])
+
+
+def conflito():
+    """Resposta 409 (após o rollback) quando incrementar() detecta outra gravação."""
+    db.session.rollback()
+    return jsonify({'error': 'Registro alterado por outra requisição ao mesmo tempo; recarregue e tente novamente'}), 409
+
+
+def com_etag(response, objeto, versao):
+    """Acrescenta o ETag da versão à resposta jsonify."""
+    response.set_etag(etag(objeto, versao))
+    return response
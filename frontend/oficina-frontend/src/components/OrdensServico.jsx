@@ -45,6 +45,22 @@ const OrdensServico = () => {
     carregarDados();
   }, []);
 
+  // Alterações feitas em outras telas chegam pelo feed SSE, sem recarregar a lista
+  useEffect(() => {
+    const fonte = ordensServicoAPI.eventos();
+    const aplicar = (tipo) => (event) => {
+      const { ordem } = JSON.parse(event.data);
+      setOrdens(prev => {
+        if (tipo === 'excluida') return prev.filter(o => o.id !== ordem.id);
+        if (prev.some(o => o.id === ordem.id)) return prev.map(o => (o.id === ordem.id ? ordem : o));
+        return [...prev, ordem];
+      });
+    };
+    fonte.addEventListener('snapshot', (event) => setOrdens(JSON.parse(event.data)));
+    ['criada', 'atualizada', 'status', 'excluida'].forEach(tipo => fonte.addEventListener(tipo, aplicar(tipo)));
+    return () => fonte.close();
+  }, []);
+
   useEffect(() => {
     if (formData.cliente_id) {
       carregarVeiculosCliente(formData.cliente_id);
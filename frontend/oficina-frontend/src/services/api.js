@@ -1,8 +1,10 @@
 import axios from 'axios';
 
+// Usa a variável de ambiente para a URL da API em produção, ou localhost para desenvolvimento
+export const API_BASE_URL = `${import.meta.env.VITE_API_URL || 'http://127.0.0.1:5000'}/api`;
+
 const api = axios.create({
-  // Usa a variável de ambiente para a URL da API em produção, ou localhost para desenvolvimento
-   baseURL: `${import.meta.env.VITE_API_URL || 'http://127.0.0.1:5000'}/api`,
+  baseURL: API_BASE_URL,
   headers: {
     'Content-Type': 'application/json',
   },
@@ -19,33 +21,43 @@ api.interceptors.response.use(
 
 // Serviços de Clientes
 export const clientesAPI = {
-  listar: () => api.get('/clientes'),
-  obter: (id) => api.get(`/clientes/${id}`),
+  listar: (include = null) => api.get('/clientes', { params: include ? { include } : {} }),
+  obter: (id, include = null) => api.get(`/clientes/${id}`, { params: include ? { include } : {} }),
   criar: (cliente) => api.post('/clientes', cliente),
   atualizar: (id, cliente) => api.put(`/clientes/${id}`, cliente),
   excluir: (id) => api.delete(`/clientes/${id}`),
+  historico: (id, pagina = 1, porPagina = 20) => api.get(`/clientes/${id}/historico`, { params: { pagina, por_pagina: porPagina } }),
 };
 
 // Serviços de Veículos
 export const veiculosAPI = {
-  listar: () => api.get('/veiculos'),
-  obter: (id) => api.get(`/veiculos/${id}`),
+  listar: (include = null) => api.get('/veiculos', { params: include ? { include } : {} }),
+  obter: (id, include = null) => api.get(`/veiculos/${id}`, { params: include ? { include } : {} }),
   listarPorCliente: (clienteId) => api.get(`/veiculos/cliente/${clienteId}`),
   buscarPorPlaca: (placa) => api.get(`/veiculos/buscar/${placa}`),
   criar: (veiculo) => api.post('/veiculos', veiculo),
   atualizar: (id, veiculo) => api.put(`/veiculos/${id}`, veiculo),
   excluir: (id) => api.delete(`/veiculos/${id}`),
+  historico: (id, pagina = 1, porPagina = 20) => api.get(`/veiculos/${id}/historico`, { params: { pagina, por_pagina: porPagina } }),
 };
 
 // Serviços de Ordens de Serviço
 export const ordensServicoAPI = {
-  listar: (status = null) => api.get('/ordens_servico', { params: status ? { status } : {} }),
-  obter: (id) => api.get(`/ordens_servico/${id}`),
+  listar: (status = null, include = null) => api.get('/ordens_servico', { params: { ...(status ? { status } : {}), ...(include ? { include } : {}) } }),
+  // include: 'veiculo,cliente' embute as relações na resposta
+  obter: (id, include = null) => api.get(`/ordens_servico/${id}`, { params: include ? { include } : {} }),
   criar: (ordem) => api.post('/ordens_servico', ordem),
-  atualizar: (id, ordem) => api.put(`/ordens_servico/${id}`, ordem),
-  atualizarStatus: (id, status) => api.put(`/ordens_servico/${id}/status`, { status }),
+  // etag: cabeçalho ETag do GET; a API responde 412 se a ordem mudou desde então
+  atualizar: (id, ordem, etag = null) => api.put(`/ordens_servico/${id}`, ordem, { headers: etag ? { 'If-Match': etag } : {} }),
+  atualizarStatus: (id, status, etag = null) => api.put(`/ordens_servico/${id}/status`, { status }, { headers: etag ? { 'If-Match': etag } : {} }),
   excluir: (id) => api.delete(`/ordens_servico/${id}`),
   gerarOrcamento: (id) => api.get(`/ordens_servico/${id}/orcamento`),
+  semelhantes: (id, limite = 5) => api.get(`/ordens_servico/${id}/semelhantes`, { params: { limite } }),
+  buscarSemelhantes: (texto, limite = 5) => api.get('/ordens_servico/semelhantes', { params: { texto, limite } }),
+  // Feed SSE de alterações (criada, atualizada, status, excluida e snapshot inicial)
+  eventos: (status = null) => new EventSource(
+    `${API_BASE_URL}/ordens_servico/eventos${status ? `?status=${encodeURIComponent(status)}` : ''}`
+  ),
 };
 
 // Serviços de Peças
@@ -53,8 +65,9 @@ export const pecasAPI = {
   listar: () => api.get('/pecas'),
   obter: (id) => api.get(`/pecas/${id}`),
   criar: (peca) => api.post('/pecas', peca),
-  atualizar: (id, peca) => api.put(`/pecas/${id}`, peca),
+  atualizar: (id, peca, etag = null) => api.put(`/pecas/${id}`, peca, { headers: etag ? { 'If-Match': etag } : {} }),
   excluir: (id) => api.delete(`/pecas/${id}`),
+  estoqueBaixo: () => api.get('/pecas/estoque_baixo'),
   
   // Peças utilizadas em ordens de serviço
   listarPecasOrdem: (osId) => api.get(`/ordens_servico/${osId}/pecas`),
@@ -66,6 +79,8 @@ export const pecasAPI = {
 export const relatoriosAPI = {
   faturamentoMensal: (ano = null, mes = null) => 
     api.get('/relatorios/faturamento_mensal', { params: { ano, mes } }),
+  serieFaturamento: (params = {}) =>
+    api.get('/relatorios/faturamento', { params }),
   pecasMaisUsadas: (dias = 30) => 
     api.get('/relatorios/pecas_mais_usadas', { params: { dias } }),
   servicosMaisRealizados: (dias = 30) => 
@@ -73,4 +88,12 @@ export const relatoriosAPI = {
   dashboard: () => api.get('/relatorios/dashboard'),
 };
 
+// Relatórios e exportações em segundo plano
+export const tarefasAPI = {
+  criar: (tipo, parametros = {}) => api.post('/tarefas', { tipo, parametros }),
+  obter: (id) => api.get(`/tarefas/${id}`),
+  resultado: (id) => api.get(`/tarefas/${id}/resultado`),
+  listar: (status = null) => api.get('/tarefas', { params: status ? { status } : {} }),
+};
+
 export default api;
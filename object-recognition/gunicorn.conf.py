@@ -0,0 +1,25 @@
+"""
+Configuração do gunicorn carregada automaticamente a partir do diretório de trabalho.
+
+Prepara o modo multiprocesso do prometheus_client para que /api/metrics agregue
+as métricas de todos os workers (e dos processos de inferência).
+"""
+
+import os
+import shutil
+import tempfile
+
+
+def on_starting(server):
+    # Definida no processo mestre antes do fork, herdada pelos workers
+    directory = os.environ.setdefault(
+        'PROMETHEUS_MULTIPROC_DIR',
+        os.path.join(tempfile.gettempdir(), 'prometheus-recognition')
+    )
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
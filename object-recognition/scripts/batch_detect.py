@@ -0,0 +1,279 @@
+"""
+Detecção em lote, offline, sobre pastas de imagens e arquivos de vídeo.
+
+Uso:
+    python scripts/batch_detect.py fotos_inspecao/ --output fotos.ndjson
+    python scripts/batch_detect.py gravacoes/baia1.mp4 --stride 15 --format parquet --output baia1.parquet
+    python scripts/batch_detect.py arquivo/ --recursive --batch-size 8 --format npz --output arquivo.npz
+
+A decodificação, a inferência e a gravação rodam em threads separadas ligadas
+por filas limitadas, e a inferência é feita em lotes (ObjectDetector.predict_batch).
+Cada linha da saída é uma detecção com: source, frame, timestamp (segundos no
+vídeo; vazio para imagens), class_id, class_name, confidence, x1, y1, x2, y2.
+
+Formatos:
+    ndjson   uma detecção JSON por linha (padrão)
+    parquet  colunar, requer pyarrow
+    npz      colunar, um array NumPy por coluna (np.load)
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.object_detector import ObjectDetector
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+COLUMNS = ('source', 'frame', 'timestamp', 'class_id', 'class_name', 'confidence', 'x1', 'y1', 'x2', 'y2')
+
+# Marca de fim das filas do pipeline
+_END = object()
+
+
+def find_inputs(paths, recursive=False):
+    """Expande os caminhos em (arquivos de imagem, arquivos de vídeo) ordenados."""
+    images, videos = [], []
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                files = [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+            else:
+                files = [os.path.join(path, name) for name in os.listdir(path)]
+        else:
+            files = [path]
+        for file in sorted(files):
+            extension = os.path.splitext(file)[1].lower()
+            if extension in IMAGE_EXTENSIONS:
+                images.append(file)
+            elif extension in VIDEO_EXTENSIONS:
+                videos.append(file)
+    return images, videos
+
+
+def read_image(path):
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def produce_frames(images, videos, frames, stride, decode_workers, stats):
+    """Decodifica imagens (em paralelo, mantendo a ordem) e frames de vídeo com stride."""
+    try:
+        _decode_loop(images, videos, frames, stride, decode_workers, stats)
+    except Exception as e:
+        stats['error'] = f'decodificação: {e}'
+    finally:
+        # Sempre encerrar a fila, para que a inferência e a gravação terminem
+        frames.put(_END)
+
+
+def _decode_loop(images, videos, frames, stride, decode_workers, stats):
+    # Blocos pequenos para não decodificar a pasta inteira antes da inferência
+    chunk = decode_workers * 4
+    with concurrent.futures.ThreadPoolExecutor(decode_workers) as pool:
+        for offset in range(0, len(images), chunk):
+            paths = images[offset:offset + chunk]
+            for path, image in zip(paths, pool.map(read_image, paths)):
+                if image is None:
+                    stats['unreadable'] += 1
+                    continue
+                frames.put((path, 0, None, image))
+
+    for path in videos:
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            stats['unreadable'] += 1
+            continue
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        index = 0
+        while True:
+            # grab() avança sem decodificar; só os frames usados são decodificados
+            if not capture.grab():
+                break
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    timestamp = index / fps if fps else None
+                    frames.put((path, index, timestamp, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+            index += 1
+        capture.release()
+
+
+def run_inference(detector, frames, rows, batch_size, threshold, class_filter, stats):
+    """Agrupa os frames em lotes, executa a inferência e envia as detecções ao escritor."""
+    state = {'ended': False}
+    try:
+        _inference_loop(detector, frames, rows, batch_size, threshold, class_filter, stats, state)
+    except Exception as e:
+        stats['error'] = str(e)
+        # Esvaziar a fila para que a leitura termine (se o fim ainda não foi lido)
+        while not state['ended']:
+            state['ended'] = frames.get() is _END
+    finally:
+        rows.put(_END)
+
+
+def _inference_loop(detector, frames, rows, batch_size, threshold, class_filter, stats, state):
+    while not state['ended']:
+        batch = []
+        while len(batch) < batch_size:
+            item = frames.get()
+            if item is _END:
+                state['ended'] = True
+                break
+            batch.append(item)
+        if not batch:
+            break
+
+        start = time.perf_counter()
+        results = detector.predict_batch([item[3] for item in batch], threshold, batch_size)
+        stats['inference_time'] += time.perf_counter() - start
+        stats['frames'] += len(batch)
+
+        for (source, frame, timestamp, _), (boxes, confidences, class_ids) in zip(batch, results):
+            for (x1, y1, x2, y2), confidence, class_id in zip(boxes, confidences, class_ids):
+                class_name = detector.classes[class_id]
+                if class_filter is not None and class_name not in class_filter:
+                    continue
+                rows.put((source, frame, timestamp, int(class_id), class_name, float(confidence),
+                          float(x1), float(y1), float(x2), float(y2)))
+
+
+class NDJSONWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, row):
+        self.file.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ColumnarWriter:
+    """Acumula as detecções em colunas e grava ao final (Parquet ou NPZ)."""
+
+    def __init__(self, path, file_format):
+        self.path = path
+        self.format = file_format
+        self.columns = {name: [] for name in COLUMNS}
+        if file_format == 'parquet':
+            # Verificar antes de processar, e não só ao gravar
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit('O formato parquet requer pyarrow (pip install pyarrow); use --format npz ou ndjson')
+
+    def write(self, row):
+        for name, value in zip(COLUMNS, row):
+            self.columns[name].append(value)
+
+    def close(self):
+        if self.format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            pq.write_table(pa.table(self.columns), self.path, compression='zstd')
+            return
+
+        arrays = {
+            'source': np.array(self.columns['source'], dtype=str),
+            'frame': np.array(self.columns['frame'], dtype=np.int64),
+            'timestamp': np.array([np.nan if t is None else t for t in self.columns['timestamp']], dtype=np.float64),
+            'class_id': np.array(self.columns['class_id'], dtype=np.int16),
+            'class_name': np.array(self.columns['class_name'], dtype=str),
+        }
+        for name in ('confidence', 'x1', 'y1', 'x2', 'y2'):
+            arrays[name] = np.array(self.columns[name], dtype=np.float32)
+        np.savez_compressed(self.path, **arrays)
+
+
+def write_rows(writer, rows, stats):
+    while True:
+        row = rows.get()
+        if row is _END:
+            break
+        writer.write(row)
+        stats['detections'] += 1
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detecção em lote sobre pastas de imagens e vídeos')
+    parser.add_argument('inputs', nargs='+', help='Pastas, imagens ou arquivos de vídeo')
+    parser.add_argument('--output', required=True, help='Arquivo de saída')
+    parser.add_argument('--format', choices=['ndjson', 'parquet', 'npz'], default='ndjson')
+    parser.add_argument('--recursive', action='store_true', help='Percorrer subpastas')
+    parser.add_argument('--stride', type=int, default=1, help='Processar um a cada N frames de vídeo')
+    parser.add_argument('--batch-size', type=int, default=8, help='Frames por passe de inferência')
+    parser.add_argument('--threshold', type=float, default=None, help='Limiar de confiança (padrão do detector)')
+    parser.add_argument('--all-classes', action='store_true',
+                        help='Gravar todas as classes do COCO (padrão: apenas as classes de ferramentas)')
+    parser.add_argument('--decode-workers', type=int, default=4, help='Threads de decodificação de imagens')
+    parser.add_argument('--queue-size', type=int, default=32, help='Frames decodificados em espera')
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--backend', default=None)
+    parser.add_argument('--input-size', type=int, default=None)
+    parser.add_argument('--threads', type=int, default=None, help='Threads de inferência')
+    args = parser.parse_args()
+
+    images, videos = find_inputs(args.inputs, args.recursive)
+    if not images and not videos:
+        raise SystemExit('Nenhuma imagem ou vídeo encontrado')
+
+    if args.format == 'ndjson':
+        writer = NDJSONWriter(args.output)
+    else:
+        writer = ColumnarWriter(args.output, args.format)
+
+    detector = ObjectDetector(
+        model_path=args.model,
+        backend=args.backend,
+        num_threads=args.threads,
+        input_size=args.input_size,
+        pool_size=1
+    )
+    class_filter = None if args.all_classes else set(detector.target_classes)
+    print(f'{len(images)} imagens e {len(videos)} vídeos; backend {detector.backend.name}, lote {args.batch_size}')
+
+    stats = {'frames': 0, 'detections': 0, 'unreadable': 0, 'inference_time': 0.0, 'error': None}
+    frames = queue.Queue(maxsize=args.queue_size)
+    rows = queue.Queue(maxsize=args.queue_size * 64)
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=produce_frames, daemon=True,
+                         args=(images, videos, frames, max(1, args.stride), args.decode_workers, stats)),
+        threading.Thread(target=run_inference, daemon=True,
+                         args=(detector, frames, rows, args.batch_size, args.threshold, class_filter, stats)),
+        threading.Thread(target=write_rows, daemon=True, args=(writer, rows, stats)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    fps = stats['frames'] / elapsed if elapsed else 0.0
+    inference_fps = stats['frames'] / stats['inference_time'] if stats['inference_time'] else 0.0
+    print(f'{stats["frames"]} frames em {elapsed:.1f} s: {fps:.1f} FPS '
+          f'(inferência {inference_fps:.1f} FPS), {stats["detections"]} detecções gravadas em {args.output}')
+    if stats['unreadable']:
+        print(f'{stats["unreadable"]} arquivos não puderam ser lidos')
+    if stats['error']:
+        raise SystemExit(f'Inferência interrompida: {stats["error"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Mede throughput e latência da detecção sob requisições paralelas.
+
+Uso (no processo, variando o pool de inferência):
+    python scripts/concurrency_benchmark.py --model yolov8n.onnx --pool-size 1 --threads 4 --clients 1 2 4 8
+
+Uso (comparando inferência em threads e em processos com memória compartilhada):
+    python scripts/concurrency_benchmark.py --mode process --pool-size 4 --threads 1 --clients 1 2 4 8
+
+Uso (contra o servidor em execução):
+    python scripts/concurrency_benchmark.py --url http://localhost:5001/api/detect --clients 1 2 4 8
+
+Com o pool limitado, o throughput deve se manter estável à medida que o número
+de clientes cresce (o excedente apenas aguarda), em vez de cair por disputa de CPU.
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_image(width=1280, height=720):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+
+def local_caller(args):
+    from src.object_detector import ObjectDetector
+    from src.process_pool import ProcessPoolDetector
+
+    detector_class = ProcessPoolDetector if args.mode == 'process' else ObjectDetector
+    detector = detector_class(
+        model_path=args.model,
+        backend=args.backend,
+        num_threads=args.threads,
+        pool_size=args.pool_size
+    )
+    # Imagem codificada, como chega pelas rotas, para incluir a decodificação na medida
+    ok, encoded = cv2.imencode('.jpg', make_image())
+    image = encoded.tobytes()
+    detector.detect_objects(image)
+    print(f'Modo {args.mode}, backend {detector.backend.name}, pool {detector.pool_size}, threads por instância {detector.num_threads}')
+    return lambda: detector.detect_objects(image)
+
+
+def http_caller(args):
+    ok, encoded = cv2.imencode('.jpg', make_image())
+    body = json.dumps({
+        'image': 'data:image/jpeg;base64,' + base64.b64encode(encoded.tobytes()).decode('ascii')
+    }).encode('utf-8')
+
+    def call():
+        request = urllib.request.Request(args.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    call()
+    print(f'Servidor {args.url}')
+    return call
+
+
+def run_level(call, clients, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                result = call()
+                failed = not result.get('success', False)
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return len(latencies) / total, np.percentile(latencies, 50), np.percentile(latencies, 95), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de concorrência da detecção')
+    parser.add_argument('--url', default=None, help='Endpoint /api/detect do servidor (padrão: no processo)')
+    parser.add_argument('--model', default='yolov8n.onnx')
+    parser.add_argument('--backend', default='auto')
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                        help='Inferência em threads do processo ou em processos worker')
+    parser.add_argument('--pool-size', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=None, help='Threads por instância do modelo')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos por nível de concorrência')
+    args = parser.parse_args()
+
+    call = http_caller(args) if args.url else local_caller(args)
+
+    print(f'\n{"clientes":>8s} {"req/s":>8s} {"p50":>9s} {"p95":>9s} {"erros":>6s}')
+    for clients in args.clients:
+        throughput, p50, p95, errors = run_level(call, clients, args.duration)
+        print(f'{clients:8d} {throughput:8.1f} {p50:6.1f} ms {p95:6.1f} ms {errors:6d}')
+
+
+if __name__ == '__main__':
+    main()
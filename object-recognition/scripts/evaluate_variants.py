@@ -0,0 +1,212 @@
+"""
+Avalia variantes do modelo (FP32/INT8, resoluções de entrada) em um conjunto rotulado local.
+
+Uso:
+    python scripts/evaluate_variants.py dataset/ yolov8n.onnx:640 yolov8n.onnx:416 yolov8n-int8.onnx:320
+
+O conjunto segue o formato YOLO: dataset/images/*.jpg e dataset/labels/*.txt,
+com uma linha "classe cx cy largura altura" (coordenadas normalizadas e ids de
+classe do COCO) por objeto. Cada variante roda em um processo separado para
+que a memória residente (RSS) medida seja apenas a dela.
+
+Relata mAP@0.5, mAP@0.5:0.95, latência por frame e RSS de cada variante.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def load_dataset(folder, limit=None):
+    """Retorna [(caminho da imagem, array (K, 5) com classe e caixa normalizada)]."""
+    images_dir = os.path.join(folder, 'images')
+    labels_dir = os.path.join(folder, 'labels')
+
+    samples = []
+    for name in sorted(os.listdir(images_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        label_path = os.path.join(labels_dir, os.path.splitext(name)[0] + '.txt')
+        labels = np.zeros((0, 5))
+        if os.path.exists(label_path):
+            labels = np.loadtxt(label_path, ndmin=2).reshape(-1, 5)
+        samples.append((os.path.join(images_dir, name), labels))
+        if limit and len(samples) >= limit:
+            break
+    return samples
+
+
+def box_iou(box, boxes):
+    """IoU entre uma caixa (4,) e várias caixas (N, 4) no formato x1, y1, x2, y2."""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+
+def average_precision(recall, precision):
+    """AP com interpolação de 101 pontos (padrão COCO)."""
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    points = np.linspace(0, 1, 101)
+    indices = np.searchsorted(recall, points, side='left')
+    return float(np.mean([precision[i] if i < len(precision) else 0.0 for i in indices]))
+
+
+def mean_average_precision(predictions, ground_truths):
+    """
+    Calcula o mAP por limiar de IoU.
+
+    Args:
+        predictions: {imagem: (caixas (K, 4), confianças (K,), classes (K,))}
+        ground_truths: {imagem: (caixas (M, 4), classes (M,))}
+
+    Returns:
+        np.ndarray: mAP para cada limiar em IOU_THRESHOLDS
+    """
+    classes = set()
+    for _, gt_classes in ground_truths.values():
+        classes.update(gt_classes.astype(int).tolist())
+
+    ap_per_class = []
+    for class_id in sorted(classes):
+        gt = {img: boxes[labels == class_id] for img, (boxes, labels) in ground_truths.items()}
+        total_gt = sum(len(b) for b in gt.values())
+
+        candidates = []
+        for img, (boxes, confidences, labels) in predictions.items():
+            mask = labels == class_id
+            candidates.extend((conf, img, box) for box, conf in zip(boxes[mask], confidences[mask]))
+        candidates.sort(key=lambda c: -c[0])
+
+        aps = []
+        for threshold in IOU_THRESHOLDS:
+            matched = {img: np.zeros(len(b), dtype=bool) for img, b in gt.items()}
+            true_positives = np.zeros(len(candidates))
+            for i, (_, img, box) in enumerate(candidates):
+                gt_boxes = gt.get(img)
+                if gt_boxes is None or len(gt_boxes) == 0:
+                    continue
+                ious = box_iou(box, gt_boxes)
+                ious[matched[img]] = 0
+                best = int(np.argmax(ious))
+                if ious[best] >= threshold:
+                    matched[img][best] = True
+                    true_positives[i] = 1
+
+            if not candidates:
+                aps.append(0.0)
+                continue
+            tp_cumulative = np.cumsum(true_positives)
+            recall = tp_cumulative / max(total_gt, 1)
+            precision = tp_cumulative / np.arange(1, len(candidates) + 1)
+            aps.append(average_precision(recall, precision))
+        ap_per_class.append(aps)
+
+    if not ap_per_class:
+        return np.zeros(len(IOU_THRESHOLDS))
+    return np.mean(ap_per_class, axis=0)
+
+
+def current_rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def evaluate_variant(model_path, input_size, dataset, backend, conf_threshold, warmup):
+    """Executado em um processo filho: carrega a variante e mede precisão, latência e memória."""
+    from src.object_detector import ObjectDetector
+
+    rss_before = current_rss_mb()
+    detector = ObjectDetector(model_path=model_path, backend=backend, input_size=input_size)
+
+    images = []
+    for path, _ in dataset:
+        with open(path, 'rb') as f:
+            images.append(ObjectDetector.decode_image(f.read()))
+
+    for image in images[:warmup]:
+        detector.predict(image, conf_threshold)
+
+    predictions, latencies = {}, []
+    for (path, _), image in zip(dataset, images):
+        start = time.perf_counter()
+        predictions[path] = detector.predict(image, conf_threshold)
+        latencies.append(time.perf_counter() - start)
+
+    ground_truths = {}
+    for (path, labels), image in zip(dataset, images):
+        height, width = image.shape[:2]
+        cx, cy, w, h = labels[:, 1] * width, labels[:, 2] * height, labels[:, 3] * width, labels[:, 4] * height
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        ground_truths[path] = (boxes, labels[:, 0])
+
+    maps = mean_average_precision(predictions, ground_truths)
+    latencies = np.array(latencies) * 1000
+    return {
+        'variant': f'{os.path.basename(model_path)}@{input_size}',
+        'backend': detector.backend.name,
+        'map50': float(maps[0]),
+        'map50_95': float(maps.mean()),
+        'latency_mean_ms': float(latencies.mean()),
+        'latency_p95_ms': float(np.percentile(latencies, 95)),
+        'model_rss_mb': current_rss_mb() - rss_before,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def parse_variant(spec):
+    model_path, _, size = spec.rpartition(':')
+    if not model_path:
+        return spec, 640
+    return model_path, int(size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Avaliação de precisão, latência e memória das variantes do modelo')
+    parser.add_argument('dataset', help='Pasta com images/ e labels/ no formato YOLO')
+    parser.add_argument('variants', nargs='+', help='Variantes no formato modelo.onnx:tamanho_de_entrada')
+    parser.add_argument('--backend', default='auto')
+    parser.add_argument('--conf', type=float, default=0.001, help='Limiar de confiança usado no cálculo do mAP')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--warmup', type=int, default=3)
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.dataset, args.limit)
+    if not dataset:
+        raise SystemExit('Conjunto de avaliação vazio')
+
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for spec in args.variants:
+        model_path, input_size = parse_variant(spec)
+        with context.Pool(1) as pool:
+            rows.append(pool.apply(
+                evaluate_variant,
+                (model_path, input_size, dataset, args.backend, args.conf, args.warmup)
+            ))
+
+    print(f'{len(dataset)} imagens avaliadas\n')
+    print(f'{"variante":28s} {"backend":12s} {"mAP50":>7s} {"mAP50-95":>9s} {"lat. média":>11s} '
+          f'{"lat. p95":>9s} {"RSS modelo":>11s} {"RSS pico":>9s}')
+    for row in rows:
+        print(f'{row["variant"]:28s} {row["backend"]:12s} {row["map50"]:7.3f} {row["map50_95"]:9.3f} '
+              f'{row["latency_mean_ms"]:8.1f} ms {row["latency_p95_ms"]:6.1f} ms '
+              f'{row["model_rss_mb"]:8.1f} MB {row["peak_rss_mb"]:6.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
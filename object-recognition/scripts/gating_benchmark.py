@@ -0,0 +1,88 @@
+"""
+Compara a detecção quadro a quadro com a detecção filtrada por mudança de cena
+em um vídeo gravado.
+
+Uso:
+    python scripts/gating_benchmark.py video.mp4 --model yolov8n.onnx --motion-threshold 3.0
+
+Relata frames inferidos e reaproveitados, tempo total de cada modo e a
+concordância entre os resultados (mesmas classes detectadas no frame).
+"""
+
+import argparse
+import functools
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.object_detector import ObjectDetector
+from src.scene_gate import SceneChangeGate
+
+
+def read_frames(path, max_frames=None):
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise SystemExit(f'Não foi possível abrir o vídeo: {path}')
+
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    capture.release()
+    return frames
+
+
+def class_set(result):
+    return sorted(d['class_name'] for d in result['detections'])
+
+
+def run(args):
+    detector = ObjectDetector(model_path=args.model)
+    frames = read_frames(args.video, args.max_frames)
+    if not frames:
+        raise SystemExit('Vídeo sem frames')
+
+    infer = functools.partial(detector.detect_objects, conf_threshold=args.threshold)
+
+    # Aquecimento para não contar a inicialização do modelo
+    infer(frames[0])
+
+    start = time.perf_counter()
+    baseline = [infer(frame) for frame in frames]
+    baseline_time = time.perf_counter() - start
+
+    gate = SceneChangeGate(threshold=args.motion_threshold, max_age=args.max_age)
+    start = time.perf_counter()
+    gated = [gate.process(frame, infer)[0] for frame in frames]
+    gated_time = time.perf_counter() - start
+
+    matches = sum(class_set(a) == class_set(b) for a, b in zip(baseline, gated))
+    stats = gate.stats()
+
+    print(f'Frames:                 {len(frames)}')
+    print(f'Todos os frames:        {baseline_time:.2f} s ({len(frames) / baseline_time:.1f} FPS)')
+    print(f'Com filtro de cena:     {gated_time:.2f} s ({len(frames) / gated_time:.1f} FPS)')
+    print(f'Inferidos/reaproveitados: {stats["inferred_frames"]}/{stats["skipped_frames"]} '
+          f'({stats["skip_rate"] * 100:.1f}% reaproveitados)')
+    print(f'Concordância de classes: {matches}/{len(frames)} ({matches / len(frames) * 100:.1f}%)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do filtro de mudança de cena')
+    parser.add_argument('video', help='Vídeo gravado da bancada')
+    parser.add_argument('--model', default='yolov8n.onnx')
+    parser.add_argument('--threshold', type=float, default=0.3, help='Limiar de confiança')
+    parser.add_argument('--motion-threshold', type=float, default=3.0)
+    parser.add_argument('--max-age', type=float, default=5.0)
+    parser.add_argument('--max-frames', type=int, default=None)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Agrega as amostras de cProfile gravadas com PROFILE_SAMPLE_RATE e mostra as
+funções com maior tempo acumulado.
+
+Uso:
+    python scripts/profile_report.py profiles/ --top 30 --sort cumulative
+"""
+
+import argparse
+import glob
+import os
+import pstats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Relatório das amostras de cProfile da detecção')
+    parser.add_argument('directory', nargs='?', default='profiles', help='Pasta PROFILE_DIR com os arquivos .prof')
+    parser.add_argument('--top', type=int, default=30, help='Número de funções exibidas')
+    parser.add_argument('--sort', default='cumulative', help='Critério de ordenação (cumulative, tottime, calls)')
+    parser.add_argument('--output', default=None, help='Grava as estatísticas agregadas em um .prof (ex.: para snakeviz)')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.directory, '*.prof')))
+    if not paths:
+        raise SystemExit(f'Nenhuma amostra encontrada em {args.directory}')
+
+    stats = pstats.Stats(paths[0])
+    for path in paths[1:]:
+        stats.add(path)
+
+    print(f'{len(paths)} amostras agregadas\n')
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+    if args.output:
+        stats.dump_stats(args.output)
+        print(f'Estatísticas agregadas salvas em {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Gera uma versão INT8 quantizada do modelo ONNX usando imagens locais de calibração.
+
+Uso:
+    python scripts/quantize_model.py yolov8n.onnx calibracao/ --output yolov8n-int8.onnx --input-size 640
+
+Requer onnxruntime. O modelo gerado pode ser usado com MODEL_PATH=yolov8n-int8.onnx;
+o pré-processamento das imagens de calibração é o mesmo de ObjectDetector.preprocess.
+"""
+
+import argparse
+import os
+import sys
+
+import cv2
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    CalibrationMethod,
+    QuantFormat,
+    QuantType,
+    quantize_static,
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.object_detector import ObjectDetector
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+CALIBRATION_METHODS = {
+    'minmax': CalibrationMethod.MinMax,
+    'entropy': CalibrationMethod.Entropy,
+    'percentile': CalibrationMethod.Percentile,
+}
+
+
+class ImageFolderReader(CalibrationDataReader):
+    """Fornece as imagens de calibração uma a uma, já no formato de entrada da rede."""
+
+    def __init__(self, folder, input_name, input_size, limit=None):
+        self.input_name = input_name
+        self.input_size = input_size
+        self.paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )[:limit]
+        if not self.paths:
+            raise SystemExit(f'Nenhuma imagem de calibração encontrada em {folder}')
+        self._iterator = iter(self.paths)
+
+    def get_next(self):
+        path = next(self._iterator, None)
+        if path is None:
+            return None
+
+        with open(path, 'rb') as f:
+            image = ObjectDetector.decode_image(f.read())
+        # Mesmo pré-processamento de ObjectDetector.preprocess
+        blob = cv2.dnn.blobFromImage(
+            image, 1/255.0, (self.input_size, self.input_size), swapRB=True, crop=False
+        )
+        return {self.input_name: blob}
+
+    def rewind(self):
+        self._iterator = iter(self.paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantização estática INT8 do modelo YOLO ONNX')
+    parser.add_argument('model', help='Modelo ONNX FP32')
+    parser.add_argument('calibration', help='Pasta com imagens representativas da oficina')
+    parser.add_argument('--output', default=None, help='Arquivo de saída (padrão: <modelo>-int8.onnx)')
+    parser.add_argument('--input-size', type=int, default=640)
+    parser.add_argument('--limit', type=int, default=200, help='Número máximo de imagens de calibração')
+    parser.add_argument('--method', choices=sorted(CALIBRATION_METHODS), default='minmax')
+    parser.add_argument('--per-channel', action='store_true', help='Quantização de pesos por canal')
+    parser.add_argument('--exclude-nodes', nargs='*', default=[],
+                        help='Nós mantidos em FP32 (ex.: nós da cabeça de detecção)')
+    args = parser.parse_args()
+
+    output = args.output or f'{os.path.splitext(args.model)[0]}-int8.onnx'
+    preprocessed = f'{os.path.splitext(output)[0]}-pre.onnx'
+
+    # Inferência de formatos e otimizações recomendadas antes da quantização
+    quant_pre_process(args.model, preprocessed, skip_symbolic_shape=True)
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(preprocessed, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    reader = ImageFolderReader(args.calibration, input_name, args.input_size, args.limit)
+
+    quantize_static(
+        preprocessed,
+        output,
+        reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=args.per_channel,
+        calibrate_method=CALIBRATION_METHODS[args.method],
+        nodes_to_exclude=args.exclude_nodes,
+    )
+    os.remove(preprocessed)
+
+    original_size = os.path.getsize(args.model) / 1e6
+    quantized_size = os.path.getsize(output) / 1e6
+    print(f'Modelo quantizado salvo em {output} ({original_size:.1f} MB -> {quantized_size:.1f} MB, '
+          f'{len(reader.paths)} imagens de calibração)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Reproduz um arquivo de vídeo no canal WebSocket /api/detect-stream e mede o
+desempenho da detecção em tempo real.
+
+Uso:
+    python scripts/stream_benchmark.py video.mp4 --url ws://localhost:5001/api/detect-stream
+
+Relata FPS enviados e processados, frames descartados pelo servidor e a
+latência ponta a ponta (envio do frame -> recebimento do resultado).
+"""
+
+import argparse
+import json
+import threading
+import time
+
+import cv2
+import numpy as np
+from simple_websocket import Client, ConnectionClosed
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run(args):
+    capture = cv2.VideoCapture(args.video)
+    if not capture.isOpened():
+        raise SystemExit(f'Não foi possível abrir o vídeo: {args.video}')
+
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    fps = args.fps or source_fps
+    interval = 1.0 / fps
+
+    ws = Client.connect(args.url)
+    ws.send(json.dumps({'threshold': args.threshold}))
+
+    send_times = {}
+    latencies = []
+    results = []
+    done = threading.Event()
+
+    def receive_results():
+        try:
+            while not done.is_set() or len(results) < len(send_times):
+                message = ws.receive(timeout=args.drain_timeout if done.is_set() else None)
+                if message is None:
+                    break
+                result = json.loads(message)
+                received_at = time.perf_counter()
+                sent_at = send_times.get(result['frame_id'])
+                if sent_at is not None:
+                    latencies.append(received_at - sent_at)
+                results.append(result)
+                if done.is_set() and result['frame_id'] == len(send_times):
+                    break
+        except ConnectionClosed:
+            pass
+
+    receiver = threading.Thread(target=receive_results, daemon=True)
+    receiver.start()
+
+    frame_id = 0
+    start = time.perf_counter()
+    next_frame_at = start
+    while args.max_frames is None or frame_id < args.max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, args.quality])
+        if not ok:
+            continue
+
+        # Respeitar a taxa de captura simulada
+        now = time.perf_counter()
+        if next_frame_at > now:
+            time.sleep(next_frame_at - now)
+        next_frame_at += interval
+
+        frame_id += 1
+        send_times[frame_id] = time.perf_counter()
+        ws.send(encoded.tobytes())
+
+    send_elapsed = time.perf_counter() - start
+    done.set()
+    receiver.join(timeout=args.drain_timeout)
+    total_elapsed = time.perf_counter() - start
+    ws.close()
+    capture.release()
+
+    processing_times = [r['processing_time'] for r in results]
+    dropped = results[-1]['dropped_frames'] if results else 0
+
+    print(f'Frames enviados:       {frame_id} ({frame_id / send_elapsed:.1f} FPS alvo {fps:.1f})')
+    print(f'Resultados recebidos:  {len(results)} ({len(results) / total_elapsed:.1f} FPS)')
+    print(f'Frames descartados:    {dropped}')
+    print(f'Latência ponta a ponta: média {np.mean(latencies) * 1000 if latencies else 0:.1f} ms, '
+          f'p50 {percentile(latencies, 50) * 1000:.1f} ms, p95 {percentile(latencies, 95) * 1000:.1f} ms')
+    print(f'Tempo de inferência:   média {np.mean(processing_times) * 1000 if processing_times else 0:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do canal de detecção em streaming')
+    parser.add_argument('video', help='Arquivo de vídeo a ser reproduzido')
+    parser.add_argument('--url', default='ws://localhost:5001/api/detect-stream')
+    parser.add_argument('--fps', type=float, default=None, help='Taxa de envio (padrão: FPS do vídeo)')
+    parser.add_argument('--threshold', type=float, default=0.3)
+    parser.add_argument('--quality', type=int, default=70, help='Qualidade JPEG dos frames enviados')
+    parser.add_argument('--max-frames', type=int, default=None)
+    parser.add_argument('--drain-timeout', type=float, default=5.0,
+                        help='Tempo máximo aguardando resultados após o último envio')
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+Captura contínua de uma fonte de vídeo (câmera, RTSP ou arquivo) no servidor,
+com inferência em taxa alvo e publicação do resultado mais recente.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+
+import cv2
+
+from src import metrics
+
+
+class CameraWorker:
+    def __init__(self, detector, source, target_fps=5.0, threshold=None, loop=True,
+                 results_path=None, lock_path=None, gate=None, tracker=None,
+                 events=None, camera_id=None):
+        """
+        Inicializa o worker de captura.
+
+        Args:
+            detector: Instância de ObjectDetector usada na inferência
+            source: Fonte de vídeo: índice de dispositivo ("0"), caminho de
+                dispositivo ("/dev/video0"), URL RTSP/HTTP ou arquivo de vídeo
+            target_fps: Número máximo de inferências por segundo
+            threshold: Limiar de confiança (padrão do detector se None)
+            loop: Reiniciar arquivos de vídeo ao chegar ao fim
+            results_path: Arquivo JSON onde o último resultado é publicado para
+                os demais processos do servidor
+            lock_path: Arquivo de trava que garante um único worker de captura
+                entre os processos do gunicorn
+            gate: SceneChangeGate opcional que reaproveita o último resultado
+                enquanto a cena não muda
+            tracker: FrameTracker opcional que atribui identificadores persistentes
+                e executa o detector apenas a cada k frames
+            events: DetectionEventPublisher opcional que agrega as detecções e
+                as envia em lote ao backend
+            camera_id: Identificador da câmera (baia) nos eventos (padrão: source)
+        """
+        self.detector = detector
+        self.source = source
+        self.target_fps = target_fps
+        self.threshold = threshold
+        self.loop = loop
+        self.results_path = results_path
+        self.lock_path = lock_path
+        self.gate = gate
+        self.tracker = tracker
+        self.events = events
+        self.camera_id = camera_id or source
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock_file = None
+        self._result_lock = threading.Lock()
+        self._latest = None
+        self._last_inference_at = None
+
+        self.frames_read = 0
+        self.frames_skipped = 0
+        self.frames_inferred = 0
+        self.frames_reused = 0
+        self.frames_tracked = 0
+        self.fps = 0.0
+        self.connected = False
+        self.last_error = None
+
+    @property
+    def is_file(self):
+        return os.path.isfile(self.source)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Inicia a captura em segundo plano.
+
+        Returns:
+            bool: False se outro processo já é o responsável pela captura
+        """
+        if self.running:
+            return True
+
+        if self.lock_path:
+            lock_file = open(self.lock_path, 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='camera-worker', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=5.0):
+        """Interrompe a captura e libera a trava entre processos."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def latest(self):
+        """Retorna o resultado de detecção mais recente (ou None)."""
+        with self._result_lock:
+            return self._latest
+
+    def status(self):
+        """Retorna contadores e estado da captura."""
+        return {
+            'source': self.source,
+            'running': self.running,
+            'connected': self.connected,
+            'target_fps': self.target_fps,
+            'fps': self.fps,
+            'frames_read': self.frames_read,
+            'frames_skipped': self.frames_skipped,
+            'frames_inferred': self.frames_inferred,
+            'frames_reused': self.frames_reused,
+            'frames_tracked': self.frames_tracked,
+            'motion_gate': self.gate.stats() if self.gate else None,
+            'tracker': self.tracker.stats() if self.tracker else None,
+            'detection_events': self.events.stats() if self.events else None,
+            'last_error': self.last_error
+        }
+
+    def _open_capture(self):
+        source = self.source
+        if source.isdigit():
+            source = int(source)
+
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            capture.release()
+            return None
+
+        if not self.is_file:
+            # Manter apenas o frame mais recente no buffer do driver
+            capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            capture = self._open_capture()
+            if capture is None:
+                self.connected = False
+                self.last_error = f'Não foi possível abrir a fonte de vídeo: {self.source}'
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+
+            self.connected = True
+            self.last_error = None
+            backoff = 1.0
+            try:
+                self._capture_loop(capture)
+            except Exception as e:
+                self.last_error = str(e)
+                self._stop.wait(backoff)
+            finally:
+                capture.release()
+                self.connected = False
+
+            if self.is_file and not self.loop:
+                break
+
+    def _capture_loop(self, capture):
+        interval = 1.0 / self.target_fps
+        is_file = self.is_file
+
+        # Em arquivos, pular frames para reproduzir o vídeo na taxa alvo
+        file_skip = 1
+        if is_file:
+            source_fps = capture.get(cv2.CAP_PROP_FPS) or self.target_fps
+            file_skip = max(1, int(round(source_fps / self.target_fps)))
+
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            if is_file:
+                for _ in range(file_skip - 1):
+                    if not capture.grab():
+                        break
+                    self.frames_read += 1
+                    self.frames_skipped += 1
+
+                ok, frame = capture.read()
+                if not ok:
+                    if not self.loop:
+                        return
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                self.frames_read += 1
+
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+            else:
+                # grab() não decodifica: frames fora da janela são descartados a custo baixo
+                if not capture.grab():
+                    return
+                self.frames_read += 1
+                if time.monotonic() < next_tick:
+                    self.frames_skipped += 1
+                    continue
+
+                ok, frame = capture.retrieve()
+                if not ok:
+                    return
+
+            now = time.monotonic()
+            next_tick = max(next_tick + interval, now)
+            self._process(frame)
+
+    def _infer(self, rgb_frame):
+        results = self.detector.detect_objects(rgb_frame, conf_threshold=self.threshold)
+
+        if results['success']:
+            for detection in results['detections']:
+                tool_info = self.detector.classify_tool_type(
+                    detection['class_name'],
+                    detection['confidence']
+                )
+                detection.update(tool_info)
+        return results
+
+    def _detect(self, rgb_frame):
+        if self.gate is None:
+            return self._infer(rgb_frame)
+        results, reused = self.gate.process(rgb_frame, self._infer)
+        return dict(results, reused=reused)
+
+    def _process(self, frame):
+        start_time = time.time()
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        detected = True
+        if self.tracker is not None:
+            results, detected = self.tracker.process(rgb_frame, self._detect)
+        else:
+            results = self._detect(rgb_frame)
+        results = dict(results)
+        reused = detected and results.get('reused', False)
+
+        processing_time = time.time() - start_time
+        metrics.observe_request('camera', processing_time, error=not results['success'])
+        if not detected:
+            self.frames_tracked += 1
+            metrics.TRACKED_FRAMES.inc()
+        elif reused:
+            self.frames_reused += 1
+            metrics.GATED_FRAMES.inc()
+        else:
+            self.frames_inferred += 1
+
+        # Média móvel exponencial da taxa de inferência efetiva
+        now = time.monotonic()
+        if self._last_inference_at is not None and now > self._last_inference_at:
+            instant_fps = 1.0 / (now - self._last_inference_at)
+            self.fps = 0.8 * self.fps + 0.2 * instant_fps if self.fps else instant_fps
+        self._last_inference_at = now
+
+        results['frame_id'] = self.frames_inferred + self.frames_reused + self.frames_tracked
+        results['reused'] = reused
+        results['detected'] = detected
+        results['timestamp'] = start_time
+        results['processing_time'] = processing_time
+        results['frame_width'] = frame.shape[1]
+        results['frame_height'] = frame.shape[0]
+        results['source'] = self.source
+
+        if self.events is not None and results['success']:
+            self.events.observe(self.camera_id, results['detections'], start_time)
+
+        with self._result_lock:
+            self._latest = results
+
+        if self.results_path:
+            self._publish(results)
+
+    def _publish(self, results):
+        """Grava o resultado de forma atômica para leitura pelos outros processos."""
+        tmp_path = f'{self.results_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'result': results, 'status': self.status()}, f)
+        os.replace(tmp_path, self.results_path)
+
+
+def read_published(results_path):
+    """
+    Lê o último resultado publicado por um CameraWorker de outro processo.
+
+    Returns:
+        dict: {'result': ..., 'status': ...} ou None se ainda não há publicação
+    """
+    try:
+        with open(results_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
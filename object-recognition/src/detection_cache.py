@@ -0,0 +1,98 @@
+"""
+Cache LRU com expiração (TTL) para resultados de detecção, indexado pelo hash do conteúdo da imagem.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class DetectionCache:
+    def __init__(self, max_size=64, ttl=2.0):
+        """
+        Inicializa o cache.
+
+        Args:
+            max_size: Número máximo de entradas mantidas em memória
+            ttl: Tempo de vida de cada entrada, em segundos
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image_data, threshold):
+        """
+        Gera a chave do cache a partir do conteúdo completo da imagem.
+
+        O hash cobre todos os bytes do frame (e não apenas o cabeçalho JPEG),
+        de modo que frames diferentes nunca compartilham a mesma entrada.
+
+        Args:
+            image_data: Dados da imagem em formato base64 (com ou sem prefixo data URL) ou bytes
+            threshold: Limiar de confiança usado na detecção
+
+        Returns:
+            tuple: (hash do conteúdo, limiar)
+        """
+        if isinstance(image_data, str):
+            if image_data.startswith('data:image'):
+                image_data = image_data.split(',', 1)[1]
+            # utf-8: uma string inválida ainda gera chave; a decodificação a rejeita depois
+            image_data = image_data.encode('utf-8')
+
+        digest = hashlib.blake2b(image_data, digest_size=16).hexdigest()
+        return digest, round(float(threshold), 4)
+
+    def get(self, key):
+        """Retorna o resultado em cache ou None se ausente/expirado."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at = entry
+            if now - stored_at >= self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            # Marcar como usada mais recentemente
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Armazena um resultado, descartando a entrada menos usada se necessário (O(1))."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove todas as entradas do cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Retorna estatísticas de uso do cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
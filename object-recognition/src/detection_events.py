@@ -0,0 +1,252 @@
+"""
+Eventos de detecção agregados por câmera e janela de tempo, enviados em lote ao
+backend da oficina (inventário de ferramentas por ordem de serviço).
+
+Em vez de uma escrita por frame, cada câmera acumula as contagens por classe
+durante EVENTS_WINDOW segundos; ao fim da janela, as classes presentes em uma
+fração mínima dos frames geram um único evento. Os eventos entram em uma fila
+limitada e uma thread os envia em lotes para POST /api/ferramentas/eventos.
+"""
+
+import atexit
+import collections
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+class DetectionEventAggregator:
+    def __init__(self, window=10.0, min_presence=0.5):
+        """
+        Inicializa o agregador.
+
+        Args:
+            window: Duração, em segundos, de cada janela de agregação
+            min_presence: Fração mínima dos frames da janela em que a classe
+                precisa aparecer para gerar evento (filtra detecções esporádicas)
+        """
+        self.window = window
+        self.min_presence = min_presence
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    def observe(self, camera, detections, timestamp=None):
+        """
+        Registra as detecções de um frame.
+
+        Args:
+            camera: Identificador da câmera (baia)
+            detections: Lista de detecções no formato de detect_objects
+            timestamp: Instante do frame (padrão: agora)
+
+        Returns:
+            list: Eventos das janelas encerradas por este frame
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        events = []
+        with self._lock:
+            current = self._windows.get(camera)
+            if current is not None and timestamp - current['start'] >= self.window:
+                events = self._close(camera, current)
+                current = None
+            if current is None:
+                current = {'start': timestamp, 'end': timestamp, 'frames': 0,
+                           'counts': collections.defaultdict(list), 'info': {}}
+                self._windows[camera] = current
+
+            current['frames'] += 1
+            current['end'] = timestamp
+            frame_counts = collections.Counter()
+            for detection in detections:
+                frame_counts[detection['class_name']] += 1
+                current['info'].setdefault(detection['class_name'], {
+                    'display_name': detection.get('display_name'),
+                    'category': detection.get('category')
+                })
+            for class_name, count in frame_counts.items():
+                current['counts'][class_name].append(count)
+        return events
+
+    def close_expired(self, now=None):
+        """Encerra as janelas de câmeras que pararam de enviar frames."""
+        now = time.time() if now is None else now
+        events = []
+        with self._lock:
+            for camera, current in list(self._windows.items()):
+                if now - current['start'] >= self.window:
+                    events.extend(self._close(camera, current))
+        return events
+
+    def _close(self, camera, current):
+        del self._windows[camera]
+        events = []
+        for class_name, counts in current['counts'].items():
+            presence = len(counts) / current['frames']
+            if presence < self.min_presence:
+                continue
+            events.append(dict(
+                current['info'][class_name],
+                camera=camera,
+                class_name=class_name,
+                # Mediana das contagens nos frames em que a classe apareceu
+                count=int(sorted(counts)[len(counts) // 2]),
+                presence=presence,
+                frames=current['frames'],
+                window_start=current['start'],
+                window_end=current['end']
+            ))
+        return events
+
+
+class DetectionEventPublisher:
+    def __init__(self, url, aggregator, batch_size=50, flush_interval=5.0, max_queue=10000,
+                 timeout=5.0):
+        """
+        Inicializa o envio em lote dos eventos.
+
+        Args:
+            url: Endpoint POST /api/ferramentas/eventos do backend
+            aggregator: DetectionEventAggregator que produz os eventos
+            batch_size: Número máximo de eventos por requisição
+            flush_interval: Intervalo, em segundos, entre envios
+            max_queue: Eventos mantidos na fila; os mais antigos são descartados
+                se o backend ficar indisponível por muito tempo
+            timeout: Timeout de cada requisição ao backend
+        """
+        self.url = url
+        self.aggregator = aggregator
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+
+        self._queue = collections.deque(maxlen=max_queue)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+        self.sent = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_error = None
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5.0):
+        """Encerra a thread após um último envio (eventos pendentes e janelas abertas)."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+
+    def observe(self, camera, detections, timestamp=None):
+        """Agrega as detecções de um frame; não faz nenhuma chamada de rede."""
+        self._enqueue(self.aggregator.observe(camera, detections, timestamp))
+
+    def _enqueue(self, events):
+        with self._lock:
+            for event in events:
+                if len(self._queue) == self._queue.maxlen:
+                    self.dropped += 1
+                self._queue.append(event)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._enqueue(self.aggregator.close_expired())
+            self.flush()
+        self._enqueue(self.aggregator.close_expired(now=float('inf')))
+        self.flush()
+
+    def flush(self):
+        """Envia os eventos pendentes em lotes de até batch_size."""
+        while True:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not batch:
+                return
+            try:
+                self._post(batch)
+            except urllib.error.HTTPError as e:
+                if 400 <= e.code < 500:
+                    # Recusa permanente (ex.: 400 de validação): reenviar o mesmo
+                    # lote não muda a resposta e bloquearia os eventos seguintes
+                    with self._lock:
+                        self.rejected += len(batch)
+                        self.last_error = f'HTTP {e.code}: {e.reason}'
+                    continue
+                self._requeue(batch, f'HTTP {e.code}: {e.reason}')
+                return
+            except Exception as e:
+                # Rede ou timeout: devolver o lote à fila e tentar no próximo ciclo.
+                # O backend ignora janelas que já registrou, então reenviar um lote
+                # gravado antes do timeout não as conta duas vezes.
+                self._requeue(batch, str(e))
+                return
+            with self._lock:
+                self.sent += len(batch)
+                self.batches += 1
+
+    def _requeue(self, batch, error):
+        """Devolve o lote ao início da fila, descartando os eventos mais antigos que não couberem."""
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            space = self._queue.maxlen - len(self._queue)
+            kept = batch[len(batch) - space:] if space < len(batch) else batch
+            self.dropped += len(batch) - len(kept)
+            self._queue.extendleft(reversed(kept))
+
+    def _post(self, batch):
+        body = json.dumps({'events': batch}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def stats(self):
+        """Retorna os contadores de eventos enviados, pendentes e descartados."""
+        with self._lock:
+            return {
+                'url': self.url,
+                'pending': len(self._queue),
+                'sent': self.sent,
+                'batches': self.batches,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+                'failures': self.failures,
+                'last_error': self.last_error
+            }
+
+
+_publisher_lock = threading.Lock()
+_publisher = None
+
+
+def get_event_publisher():
+    """
+    Retorna o publicador de eventos do processo, ou None se BACKEND_URL não
+    estiver configurada.
+    """
+    global _publisher
+    backend_url = os.environ.get('BACKEND_URL')
+    if not backend_url:
+        return None
+
+    with _publisher_lock:
+        if _publisher is None:
+            aggregator = DetectionEventAggregator(
+                window=float(os.environ.get('EVENTS_WINDOW', 10.0)),
+                min_presence=float(os.environ.get('EVENTS_MIN_PRESENCE', 0.5))
+            )
+            _publisher = DetectionEventPublisher(
+                f"{backend_url.rstrip('/')}/api/ferramentas/eventos",
+                aggregator,
+                batch_size=int(os.environ.get('EVENTS_BATCH_SIZE', 50)),
+                flush_interval=float(os.environ.get('EVENTS_FLUSH_INTERVAL', 5.0))
+            )
+            _publisher.start()
+        return _publisher
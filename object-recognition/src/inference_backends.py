@@ -0,0 +1,232 @@
+"""
+Backends de inferência para o modelo YOLO em formato ONNX.
+
+Todos os backends recebem o blob NCHW gerado por cv2.dnn.blobFromImage e
+devolvem a primeira saída do modelo como array NumPy (N, 84, 8400). OpenCV DNN
+está sempre disponível; ONNX Runtime e OpenVINO são usados apenas se instalados.
+"""
+
+import importlib.util
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class OpenCVDNNBackend:
+    name = 'opencv'
+
+    def __init__(self, model_path, num_threads=None):
+        if num_threads:
+            # Configuração global do OpenCV para o processo
+            cv2.setNumThreads(num_threads)
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.output_names = self.net.getUnconnectedOutLayersNames()
+
+    @staticmethod
+    def is_available():
+        return True
+
+    def forward(self, blob):
+        self.net.setInput(blob)
+        return self.net.forward(self.output_names)[0]
+
+
+class ONNXRuntimeBackend:
+    name = 'onnxruntime'
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[0].name
+
+    @staticmethod
+    def is_available():
+        return importlib.util.find_spec('onnxruntime') is not None
+
+    def forward(self, blob):
+        return self.session.run([self.output_name], {self.input_name: blob})[0]
+
+
+class OpenVINOBackend:
+    name = 'openvino'
+
+    def __init__(self, model_path, num_threads=None):
+        import openvino as ov
+
+        core = ov.Core()
+        config = {'PERFORMANCE_HINT': 'LATENCY'}
+        if num_threads:
+            config['INFERENCE_NUM_THREADS'] = num_threads
+        self.compiled_model = core.compile_model(core.read_model(model_path), 'CPU', config)
+        self.request = self.compiled_model.create_infer_request()
+        self.output = self.compiled_model.output(0)
+
+    @staticmethod
+    def is_available():
+        return importlib.util.find_spec('openvino') is not None
+
+    def forward(self, blob):
+        return self.request.infer({0: blob})[self.output]
+
+
+class BackendPool:
+    """
+    Conjunto limitado de instâncias de um backend compartilhado entre threads.
+
+    Cada chamada a forward() empresta uma instância exclusiva; se todas estiverem
+    em uso, a thread aguarda. Assim o número de inferências simultâneas nunca
+    passa do tamanho do pool, evitando disputa de CPU entre as threads do Flask
+    e o uso concorrente de objetos que não são thread-safe (ex.: cv2.dnn.Net).
+    """
+
+    def __init__(self, backends):
+        self.name = backends[0].name
+        self.size = len(backends)
+        self._available = queue.Queue()
+        for backend in backends:
+            self._available.put(backend)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waits = 0
+
+    def forward(self, blob):
+        try:
+            backend = self._available.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self.waits += 1
+            backend = self._available.get()
+
+        with self._lock:
+            self.in_use += 1
+        try:
+            return backend.forward(blob)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._available.put(backend)
+
+    def warmup(self, input_shape, runs=3):
+        """
+        Executa forward em um tensor fictício em todas as instâncias do pool.
+
+        A primeira execução de cada instância paga a inicialização do grafo e a
+        alocação de memória; as seguintes medem a latência já aquecida.
+
+        Returns:
+            tuple: (latências frias (uma por instância), latências quentes), em segundos
+        """
+        blob = np.zeros(input_shape, dtype=np.float32)
+        backends = [self._available.get() for _ in range(self.size)]
+        cold, warm = [], []
+        try:
+            for backend in backends:
+                start = time.perf_counter()
+                backend.forward(blob)
+                cold.append(time.perf_counter() - start)
+                for _ in range(runs - 1):
+                    start = time.perf_counter()
+                    backend.forward(blob)
+                    warm.append(time.perf_counter() - start)
+        finally:
+            for backend in backends:
+                self._available.put(backend)
+        return cold, warm
+
+    def stats(self):
+        """Retorna o tamanho do pool, instâncias ocupadas e esperas acumuladas."""
+        with self._lock:
+            return {'size': self.size, 'in_use': self.in_use, 'waits': self.waits}
+
+
+BACKENDS = {
+    OpenCVDNNBackend.name: OpenCVDNNBackend,
+    ONNXRuntimeBackend.name: ONNXRuntimeBackend,
+    OpenVINOBackend.name: OpenVINOBackend,
+}
+
+
+def available_backends():
+    """Retorna os nomes dos backends cujas bibliotecas estão instaladas."""
+    return [name for name, backend in BACKENDS.items() if backend.is_available()]
+
+
+def create_backend(name, model_path, num_threads=None):
+    """
+    Cria o backend pelo nome.
+
+    Raises:
+        ValueError: se o backend não existe ou não está instalado
+    """
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f'Backend de inferência desconhecido: {name}. Opções: {", ".join(BACKENDS)}')
+    if not backend.is_available():
+        raise ValueError(f'Backend de inferência não instalado: {name}')
+    return backend(model_path, num_threads=num_threads)
+
+
+def measure_latency(backend, input_shape, runs=5):
+    """
+    Mede a latência média de forward em um tensor de entrada fictício.
+
+    A primeira execução (inicialização do grafo) é descartada.
+    """
+    blob = np.zeros(input_shape, dtype=np.float32)
+    backend.forward(blob)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        backend.forward(blob)
+    return (time.perf_counter() - start) / runs
+
+
+def select_backend(model_path, input_shape, candidates=None, num_threads=None, runs=5):
+    """
+    Escolhe o backend mais rápido entre os instalados com um micro-benchmark.
+
+    Args:
+        model_path: Caminho do modelo ONNX
+        input_shape: Formato do tensor de entrada (N, C, H, W)
+        candidates: Nomes dos backends a testar (padrão: todos os instalados)
+        num_threads: Número de threads de inferência
+        runs: Execuções cronometradas por backend
+
+    Returns:
+        tuple: (backend escolhido, {nome: latência média em segundos})
+    """
+    names = [name for name in (candidates or BACKENDS) if name in available_backends()]
+    if len(names) == 1:
+        return create_backend(names[0], model_path, num_threads), {}
+
+    best, timings = None, {}
+    for name in names:
+        try:
+            backend = create_backend(name, model_path, num_threads)
+            timings[name] = measure_latency(backend, input_shape, runs)
+        except Exception:
+            # Backend instalado mas incapaz de carregar o modelo
+            continue
+        if best is None or timings[name] < timings[best.name]:
+            best = backend
+
+    if best is None:
+        raise RuntimeError(f'Nenhum backend de inferência conseguiu carregar o modelo: {model_path}')
+    return best, timings
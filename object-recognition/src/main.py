@@ -8,6 +8,9 @@ from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.object_detection import object_detection_bp
+from src.routes.realtime_detection import realtime_detection_bp
+from src.routes.camera import camera_bp, start_camera_worker
+from src.model_registry import start_warmup
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 CORS(app, resources={r"/api/*": {"origins": "*"}})  # Habilita CORS para as rotas da API
@@ -15,6 +18,8 @@ app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(object_detection_bp, url_prefix='/api')
+app.register_blueprint(realtime_detection_bp, url_prefix='/api')
+app.register_blueprint(camera_bp, url_prefix='/api')
 
 # uncomment if you need to use database
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
@@ -23,6 +28,12 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
+# Captura de câmera no servidor (ativada por CAMERA_SOURCE)
+start_camera_worker()
+
+# Aquecimento do modelo deste worker; /api/ready responde 200 ao terminar
+start_warmup()
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
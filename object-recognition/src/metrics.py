@@ -0,0 +1,113 @@
+"""
+Métricas Prometheus da detecção e perfilamento amostrado com cProfile.
+
+As métricas ficam em um registro por processo; com a variável
+PROMETHEUS_MULTIPROC_DIR (definida por gunicorn.conf.py), os workers do gunicorn
+e os processos de inferência gravam em arquivos compartilhados e /api/metrics
+agrega todos eles.
+"""
+
+import contextlib
+import cProfile
+import os
+import random
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Etapas de ObjectDetector: decode, preprocess, forward, postprocess (NMS),
+# tile_selection e serialize (montagem das detecções); encode é a serialização
+# JSON da resposta nas rotas
+STAGE_SECONDS = Histogram(
+    'detection_stage_seconds',
+    'Duração de cada etapa da detecção',
+    ['stage'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+REQUEST_SECONDS = Histogram(
+    'detection_request_seconds',
+    'Tempo total de processamento por requisição ou frame',
+    ['endpoint'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+REQUESTS = Counter('detection_requests_total', 'Requisições ou frames de detecção recebidos', ['endpoint'])
+ERRORS = Counter('detection_errors_total', 'Requisições ou frames com erro', ['endpoint'])
+DETECTIONS = Counter('detection_objects_total', 'Objetos detectados por classe', ['class_name'])
+CACHE_LOOKUPS = Counter('detection_cache_lookups_total', 'Consultas ao cache de detecção', ['result'])
+GATED_FRAMES = Counter('detection_gated_frames_total', 'Frames com resultado reaproveitado pelo filtro de cena')
+TRACKED_FRAMES = Counter('detection_tracked_frames_total', 'Frames atendidos apenas pelo rastreador')
+
+# Perfilamento amostrado: fração das detecções executadas sob cProfile
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Mede a duração de uma etapa no histograma detection_stage_seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+
+def observe_request(endpoint, processing_time, error=False):
+    """Registra uma requisição (ou frame) atendida por um endpoint."""
+    REQUESTS.labels(endpoint).inc()
+    REQUEST_SECONDS.labels(endpoint).observe(processing_time)
+    if error:
+        ERRORS.labels(endpoint).inc()
+
+
+def count_detections(detections):
+    """Incrementa o contador por classe com as detecções de um resultado."""
+    count_classes(detection['class_name'] for detection in detections)
+
+
+def count_classes(class_names):
+    """Como count_detections, a partir apenas dos nomes de classe (formato compacto)."""
+    for class_name in class_names:
+        DETECTIONS.labels(class_name).inc()
+
+
+@contextlib.contextmanager
+def maybe_profile(label='detect'):
+    """
+    Executa o bloco sob cProfile com probabilidade PROFILE_SAMPLE_RATE.
+
+    Cada amostra é gravada em PROFILE_DIR/<label>-<pid>-<timestamp>.prof; use
+    scripts/profile_report.py para agregar as amostras.
+    """
+    if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(
+            PROFILE_DIR, f'{label}-{os.getpid()}-{time.time_ns()}.prof'
+        ))
+
+
+def render():
+    """Retorna (corpo, content-type) no formato de exposição do Prometheus."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
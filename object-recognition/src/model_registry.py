@@ -0,0 +1,73 @@
+"""
+Registro de modelos compartilhado pelo processo.
+
+Todas as rotas e workers obtêm o detector por get_detector(), de modo que cada
+processo do servidor carrega o modelo uma única vez. Com INFERENCE_MODE=process,
+o detector compartilhado delega a inferência a processos worker (ver
+src/process_pool.py).
+"""
+
+import os
+import threading
+
+from src.object_detector import ObjectDetector
+
+_lock = threading.Lock()
+_detectors = {}
+
+
+def get_detector(**kwargs):
+    """
+    Retorna a instância compartilhada de ObjectDetector para a configuração dada.
+
+    Sem argumentos, usa a configuração padrão (variáveis de ambiente). Chamadas
+    com os mesmos argumentos retornam sempre o mesmo objeto. O modo de inferência
+    ('thread' ou 'process') vem da variável INFERENCE_MODE (padrão 'thread').
+    """
+    key = tuple(sorted(kwargs.items()))
+    with _lock:
+        detector = _detectors.get(key)
+        if detector is None:
+            if os.environ.get('INFERENCE_MODE', 'thread') == 'process':
+                from src.process_pool import ProcessPoolDetector
+                detector = ProcessPoolDetector(**kwargs)
+            else:
+                detector = ObjectDetector(**kwargs)
+            _detectors[key] = detector
+        return detector
+
+
+def loaded_detectors():
+    """Retorna os detectores já carregados neste processo."""
+    with _lock:
+        return list(_detectors.values())
+
+
+def warm_up_detectors(runs=None):
+    """
+    Aquece todos os detectores carregados neste processo.
+
+    Args:
+        runs: Execuções por instância (padrão: variável WARMUP_RUNS ou 3;
+            0 marca os detectores como prontos sem aquecê-los)
+    """
+    if runs is None:
+        runs = int(os.environ.get('WARMUP_RUNS', 3))
+    for detector in loaded_detectors():
+        if runs > 0:
+            detector.warmup(runs)
+        else:
+            detector.ready = True
+
+
+def start_warmup():
+    """Inicia o aquecimento em segundo plano para o worker subir sem esperar."""
+    thread = threading.Thread(target=warm_up_detectors, daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready():
+    """Indica se todos os detectores deste processo já foram aquecidos."""
+    detectors = loaded_detectors()
+    return bool(detectors) and all(detector.ready for detector in detectors)
@@ -6,7 +6,11 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
+import os
 import base64
+import time
+from src import metrics, result_encoding
+from src.inference_backends import BackendPool, create_backend, select_backend
 
 # Lista de classes do COCO (80 classes) para mapear a saída do modelo YOLOv8 ONNX
 COCO_CLASSES = [
@@ -22,15 +26,71 @@ COCO_CLASSES = [
 ]
 
 class ObjectDetector:
-    def __init__(self, model_path='yolov8n.onnx', conf_threshold=0.4, nms_threshold=0.45):
-        """Inicializa o detector de objetos com modelo YOLO ONNX."""
+    def __init__(self, model_path=None, conf_threshold=0.4, nms_threshold=0.45,
+                 backend=None, num_threads=None, input_size=None, pool_size=None,
+                 tiling=None):
+        """
+        Inicializa o detector de objetos com modelo YOLO ONNX.
         
-        # Carregar o modelo ONNX usando OpenCV DNN
-        self.net = cv2.dnn.readNetFromONNX(model_path)
-        self.input_width = 640
-        self.input_height = 640
+        Args:
+            model_path: Caminho do modelo ONNX, FP32 ou quantizado INT8 (padrão:
+                variável MODEL_PATH ou 'yolov8n.onnx')
+            conf_threshold: Limiar de confiança padrão
+            nms_threshold: Limiar de IoU do Non-Maximum Suppression
+            backend: Backend de inferência ('opencv', 'onnxruntime', 'openvino' ou
+                'auto' para escolher o mais rápido instalado). Padrão: variável
+                INFERENCE_BACKEND ou 'auto'
+            num_threads: Threads de inferência por instância (padrão: variável
+                INFERENCE_THREADS ou os núcleos da CPU divididos pelo pool)
+            input_size: Resolução quadrada de entrada da rede, ex.: 320, 416, 480
+                ou 640 (padrão: variável INPUT_SIZE ou 640). Tamanhos diferentes
+                do exportado exigem um modelo exportado com eixos dinâmicos
+            pool_size: Número de instâncias do modelo, isto é, de inferências
+                simultâneas permitidas (padrão: variável INFERENCE_WORKERS ou 1)
+            tiling: Modo de inferência em tiles para imagens grandes: 'on', 'off'
+                ou 'auto', que usa tiles a partir de TILING_MIN_PIXELS pixels
+                (padrão: variável TILING_MODE ou 'auto')
+        """
+        if model_path is None:
+            model_path = os.environ.get('MODEL_PATH', 'yolov8n.onnx')
+        if input_size is None:
+            input_size = int(os.environ.get('INPUT_SIZE', 640))
+        self.model_path = model_path
+        self.input_width = input_size
+        self.input_height = input_size
+
+        if backend is None:
+            backend = os.environ.get('INFERENCE_BACKEND', 'auto')
+        if pool_size is None:
+            pool_size = int(os.environ.get('INFERENCE_WORKERS', 1))
+        if num_threads is None:
+            if os.environ.get('INFERENCE_THREADS'):
+                num_threads = int(os.environ['INFERENCE_THREADS'])
+            else:
+                # Dividir os núcleos entre as instâncias para não sobrecarregar a CPU
+                num_threads = max(1, (os.cpu_count() or 1) // pool_size)
+        self.num_threads = num_threads
+        self.pool_size = pool_size
+        self.backend_name = backend
         self.conf_threshold = conf_threshold
         self.nms_threshold = nms_threshold
+
+        # Inferência em tiles (fotos de alta resolução com ferramentas pequenas)
+        self.tiling = tiling or os.environ.get('TILING_MODE', 'auto')
+        self.tiling_min_pixels = int(os.environ.get('TILING_MIN_PIXELS', 4_000_000))
+        self.tile_overlap = float(os.environ.get('TILE_OVERLAP', 0.2))
+        self.tile_batch_size = int(os.environ.get('TILE_BATCH_SIZE', 8))
+        self.roi_threshold = float(os.environ.get('TILING_ROI_THRESHOLD', 0.1))
+        self.roi_min_edge_density = float(os.environ.get('TILING_MIN_EDGE_DENSITY', 0.04))
+        self._batch_supported = True
+
+        # Aquecimento (ver warmup): o detector só fica pronto depois dele
+        self.ready = False
+        self.warmup_stats = None
+        self.first_inference_time = None
+
+        self._load_model()
+
         self.classes = COCO_CLASSES
         
         # Classes do COCO que podem ser análogas a ferramentas para demonstração
@@ -60,114 +120,458 @@ class ObjectDetector:
             'remote': 'Controle Remoto',
             'cell phone': 'Celular'
         }
-        
-    def detect_objects(self, image_data):
+
+        # Tabelas pré-calculadas por classe, consultadas a cada detecção
+        self.target_class_set = frozenset(self.target_classes)
+        self.class_ids = {class_name: class_id for class_id, class_name in enumerate(self.classes)}
+        self.target_class_mask = np.zeros(len(self.classes), dtype=bool)
+        self.target_class_mask[[self.class_ids[class_name] for class_name in self.target_classes]] = True
+        self.tool_info = {}
+        for class_name in self.classes:
+            category = next(
+                (category for category, tools in self.tool_categories.items() if class_name in tools),
+                'unknown'
+            )
+            self.tool_info[class_name] = {
+                'category': category,
+                'tool_type': class_name,
+                'description': (self._get_tool_description(class_name) if category != 'unknown'
+                                else f'Objeto detectado: {class_name}')
+            }
+
+    def _load_model(self):
+        """Carrega o modelo ONNX no backend configurado (ou no mais rápido disponível)."""
+        if self.backend_name == 'auto':
+            first_backend, self.backend_timings = select_backend(
+                self.model_path,
+                (1, 3, self.input_height, self.input_width),
+                num_threads=self.num_threads
+            )
+        else:
+            first_backend = create_backend(self.backend_name, self.model_path, self.num_threads)
+            self.backend_timings = {}
+
+        # Pool limitado de instâncias compartilhado pelas threads do servidor
+        backends = [first_backend] + [
+            create_backend(first_backend.name, self.model_path, self.num_threads)
+            for _ in range(self.pool_size - 1)
+        ]
+        self.backend = BackendPool(backends)
+
+    def warmup(self, runs=3):
         """
-        Detecta objetos em uma imagem usando o modelo ONNX.
+        Aquece todas as instâncias do modelo com tensores fictícios.
+        
+        Inclui o tamanho de entrada configurado e, com tiles habilitados, o
+        lote de tiles, para que nenhuma requisição pague a inicialização.
         
         Args:
-            image_data: Dados da imagem em formato base64 ou bytes
+            runs: Execuções por instância e formato de entrada
             
         Returns:
-            dict: Resultados da detecção com objetos encontrados
+            dict: Latências fria (primeira execução) e quente, em segundos
         """
-        try:
-            # 1. Pré-processamento da imagem
-            if isinstance(image_data, str):
-                if image_data.startswith('data:image'):
-                    image_data = image_data.split(',')[1]
-                image_bytes = base64.b64decode(image_data)
-            else:
-                image_bytes = image_data
-                
-            image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-            original_image = np.array(image)
-            
-            # Criar o blob de entrada para a rede neural
-            blob = cv2.dnn.blobFromImage(
-                original_image, 
-                1/255.0, 
-                (self.input_width, self.input_height), 
-                swapRB=True, 
-                crop=False
-            )
-            
-            # 2. Executar a inferência
-            self.net.setInput(blob)
-            outputs = self.net.forward(self.net.getUnconnectedOutLayersNames())
+        start = time.perf_counter()
+        shapes = [(1, 3, self.input_height, self.input_width)]
+        cold, warm = self.backend.warmup(shapes[0], runs)
+
+        if self.tiling != 'off' and self.tile_batch_size > 1:
+            batch_shape = (self.tile_batch_size, 3, self.input_height, self.input_width)
+            try:
+                self.backend.warmup(batch_shape, runs)
+                shapes.append(batch_shape)
+            except Exception:
+                # Modelo exportado com lote fixo em 1
+                self._batch_supported = False
+
+        self.warmup_stats = {
+            'runs': runs,
+            'input_shapes': shapes,
+            'cold_latency': max(cold),
+            'warm_latency': sum(warm) / len(warm) if warm else None,
+            'duration': time.perf_counter() - start
+        }
+        self.ready = True
+        return self.warmup_stats
+
+    @staticmethod
+    def decode_image(image_data):
+        """
+        Decodifica a imagem recebida em um array NumPy RGB.
+        
+        Args:
+            image_data: Dados da imagem em formato base64, bytes ou array NumPy RGB
             
-            # O YOLOv8 ONNX tem uma saída de formato (1, 84, 8400)
-            # Transpor para (8400, 84)
-            predictions = np.squeeze(outputs[0]).T
+        Returns:
+            np.ndarray: Imagem RGB no formato H x W x 3
+        """
+        if isinstance(image_data, np.ndarray):
+            # Frame já decodificado (RGB, formato H x W x 3)
+            return image_data
+
+        if isinstance(image_data, str):
+            if image_data.startswith('data:image'):
+                image_data = image_data.split(',')[1]
+            image_bytes = base64.b64decode(image_data)
+        else:
+            image_bytes = image_data
             
-            # 3. Pós-processamento (NMS)
+        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        return np.array(image)
+
+    def preprocess(self, image):
+        """Cria o blob de entrada (1, 3, H, W) da rede a partir de uma imagem RGB."""
+        return cv2.dnn.blobFromImage(
+            image, 
+            1/255.0, 
+            (self.input_width, self.input_height), 
+            swapRB=True, 
+            crop=False
+        )
+
+    def postprocess(self, output, image_shape, conf_threshold):
+        """
+        Converte a saída do modelo em caixas na escala da imagem original e aplica NMS.
+        
+        Args:
+            output: Saída do modelo para uma imagem, formato (84, N) ou (1, 84, N)
+            image_shape: Formato (altura, largura, ...) da imagem original
+            conf_threshold: Limiar de confiança
             
-            # Obter as caixas delimitadoras, scores e classes
-            boxes = predictions[:, :4]
-            scores = predictions[:, 4:]
+        Returns:
+            tuple: (caixas x1, y1, x2, y2 (K, 4), confianças (K,), ids de classe (K,))
+        """
+        # O YOLOv8 ONNX tem uma saída de formato (1, 84, 8400)
+        # Transpor para (8400, 84)
+        predictions = np.squeeze(output).T
+        
+        # Obter as caixas delimitadoras, scores e classes
+        boxes = predictions[:, :4]
+        scores = predictions[:, 4:]
+        
+        # Encontrar a classe com maior score para cada detecção
+        class_ids = np.argmax(scores, axis=1)
+        confidences = np.max(scores, axis=1)
+        
+        # Filtrar por limiar de confiança
+        valid_indices = confidences > conf_threshold
+        boxes = boxes[valid_indices]
+        confidences = confidences[valid_indices]
+        class_ids = class_ids[valid_indices]
+        
+        # Escalar as caixas para o tamanho original da imagem
+        ratios = np.array([
+            image_shape[1] / self.input_width, 
+            image_shape[0] / self.input_height, 
+            image_shape[1] / self.input_width, 
+            image_shape[0] / self.input_height
+        ])
+        boxes = boxes * ratios
+        
+        # Converter de formato (center_x, center_y, width, height) para (x1, y1, x2, y2)
+        boxes_xyxy = np.copy(boxes)
+        boxes_xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2  # x1 = center_x - width/2
+        boxes_xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2  # y1 = center_y - height/2
+        boxes_xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2  # x2 = center_x + width/2
+        boxes_xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2  # y2 = center_y + height/2
+        
+        # Aplicar Non-Maximum Suppression (NMS); NMSBoxes espera (x, y, largura, altura)
+        boxes_xywh = np.copy(boxes_xyxy)
+        boxes_xywh[:, 2:] = boxes[:, 2:]
+        indices = cv2.dnn.NMSBoxes(
+            boxes_xywh.tolist(), 
+            confidences.tolist(), 
+            conf_threshold, 
+            self.nms_threshold
+        )
+        indices = np.array(indices, dtype=np.int64).flatten()
+        
+        return boxes_xyxy[indices], confidences[indices], class_ids[indices]
+
+    def predict(self, image_data, conf_threshold=None, tiling=None):
+        """
+        Executa a inferência e retorna as detecções de todas as classes como arrays.
+        
+        Args:
+            image_data: Dados da imagem em formato base64, bytes ou array NumPy RGB
+            conf_threshold: Limiar de confiança (padrão do detector se None)
+            tiling: Modo de tiles para esta chamada ('on', 'off' ou 'auto';
+                padrão do detector se None)
             
-            # Escalar as caixas para o tamanho original da imagem
-            ratios = np.array([
-                original_image.shape[1] / self.input_width, 
-                original_image.shape[0] / self.input_height, 
-                original_image.shape[1] / self.input_width, 
-                original_image.shape[0] / self.input_height
-            ])
+        Returns:
+            tuple: (caixas x1, y1, x2, y2 (K, 4), confianças (K,), ids de classe (K,))
+        """
+        boxes, confidences, class_ids, _ = self._predict(image_data, conf_threshold, tiling)
+        return boxes, confidences, class_ids
+
+    def _predict(self, image_data, conf_threshold, tiling):
+        """Como predict, mas retorna também as informações de tiles (ou None)."""
+        if conf_threshold is None:
+            conf_threshold = self.conf_threshold
+
+        if self.first_inference_time is None:
+            # Latência da primeira requisição real (fria se não houve aquecimento)
+            start = time.perf_counter()
+            result = self._predict_image(image_data, conf_threshold, tiling)
+            self.first_inference_time = time.perf_counter() - start
+            return result
+        return self._predict_image(image_data, conf_threshold, tiling)
+
+    def _predict_image(self, image_data, conf_threshold, tiling):
+        """Decodificação, inferência (inteira ou em tiles) e pós-processamento."""
+        # 1. Pré-processamento da imagem
+        with metrics.stage('decode'):
+            original_image = self.decode_image(image_data)
+        if self.use_tiling(original_image.shape, tiling):
+            return self.predict_tiled(original_image, conf_threshold)
+
+        with metrics.stage('preprocess'):
+            blob = self.preprocess(original_image)
+        
+        # 2. Executar a inferência
+        with metrics.stage('forward'):
+            output = self.backend.forward(blob)
+        
+        # 3. Pós-processamento (NMS)
+        with metrics.stage('postprocess'):
+            return self.postprocess(output, original_image.shape, conf_threshold) + (None,)
+
+    def use_tiling(self, image_shape, tiling=None):
+        """Indica se a imagem deve ser processada em tiles."""
+        mode = tiling or self.tiling
+        if mode == 'on':
+            return True
+        if mode == 'auto':
+            return image_shape[0] * image_shape[1] >= self.tiling_min_pixels
+        return False
+
+    def tile_grid(self, height, width):
+        """
+        Divide a imagem em janelas sobrepostas do tamanho da entrada da rede.
+        
+        Returns:
+            list: Janelas (x1, y1, x2, y2) em pixels da imagem original
+        """
+        size = self.input_width
+        stride = max(1, int(size * (1 - self.tile_overlap)))
+
+        def starts(length):
+            if length <= size:
+                return [0]
+            positions = list(range(0, length - size, stride))
+            positions.append(length - size)
+            return positions
+
+        return [
+            (x, y, min(x + size, width), min(y + size, height))
+            for y in starts(height) for x in starts(width)
+        ]
+
+    def select_tiles(self, image, tiles, candidates):
+        """
+        Escolhe os tiles que merecem inferência em resolução total.
+        
+        Um tile é processado se contém algum candidato da primeira passada em
+        baixa resolução (qualquer classe, limiar baixo) ou se tem densidade de
+        bordas suficiente para conter objetos pequenos que sumiram na redução.
+        
+        Args:
+            image: Imagem RGB original
+            tiles: Janelas (x1, y1, x2, y2) de tile_grid
+            candidates: Caixas (K, 4) detectadas na primeira passada
             
-            # Converter de formato (center_x, center_y, width, height) para (x1, y1, x2, y2)
-            boxes = boxes * ratios
-            boxes_xyxy = np.copy(boxes)
-            boxes_xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2  # x1 = center_x - width/2
-            boxes_xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2  # y1 = center_y - height/2
-            boxes_xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2  # x2 = center_x + width/2
-            boxes_xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2  # y2 = center_y + height/2
+        Returns:
+            list: Índices dos tiles selecionados
+        """
+        height, width = image.shape[:2]
+        scale = self.input_width / max(height, width)
+        small = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        edges = cv2.Canny(cv2.cvtColor(small, cv2.COLOR_RGB2GRAY), 100, 200)
+
+        selected = []
+        for index, (x1, y1, x2, y2) in enumerate(tiles):
+            if len(candidates) and np.any(
+                (candidates[:, 0] < x2) & (candidates[:, 2] > x1) &
+                (candidates[:, 1] < y2) & (candidates[:, 3] > y1)
+            ):
+                selected.append(index)
+                continue
+
+            region = edges[int(y1 * scale):max(int(y2 * scale), int(y1 * scale) + 1),
+                           int(x1 * scale):max(int(x2 * scale), int(x1 * scale) + 1)]
+            if region.size and np.count_nonzero(region) / region.size >= self.roi_min_edge_density:
+                selected.append(index)
+        return selected
+
+    def forward_batch(self, crops, batch_size=None):
+        """
+        Executa a inferência de vários recortes, em lotes quando o modelo permite.
+        
+        Args:
+            crops: Lista de imagens (ou recortes) RGB
+            batch_size: Tamanho máximo de cada lote (padrão: TILE_BATCH_SIZE)
             
-            # Encontrar a classe com maior score para cada detecção
-            class_ids = np.argmax(scores, axis=1)
-            confidences = np.max(scores, axis=1)
+        Returns:
+            list: Saída do modelo para cada recorte
+        """
+        batch_size = batch_size or self.tile_batch_size
+        outputs = []
+        for start in range(0, len(crops), batch_size):
+            batch = crops[start:start + batch_size]
+            blob = cv2.dnn.blobFromImages(
+                batch, 1/255.0, (self.input_width, self.input_height), swapRB=True, crop=False
+            )
+            if self._batch_supported and len(batch) > 1:
+                try:
+                    outputs.extend(self.backend.forward(blob))
+                    continue
+                except Exception:
+                    # Modelo exportado com lote fixo em 1: seguir tile a tile
+                    self._batch_supported = False
+            outputs.extend(self.backend.forward(blob[i:i + 1]) for i in range(len(batch)))
+        return outputs
+
+    def predict_batch(self, images, conf_threshold=None, batch_size=None):
+        """
+        Detecção em várias imagens com passes de inferência em lote.
+        
+        Args:
+            images: Lista de imagens RGB (arrays NumPy H x W x 3)
+            conf_threshold: Limiar de confiança (padrão do detector se None)
+            batch_size: Imagens por passe de inferência (padrão: TILE_BATCH_SIZE)
             
-            # Filtrar por limiar de confiança
-            valid_indices = confidences > self.conf_threshold
-            boxes_xyxy = boxes_xyxy[valid_indices]
-            confidences = confidences[valid_indices]
-            class_ids = class_ids[valid_indices]
+        Returns:
+            list: (caixas (K, 4), confianças (K,), ids de classe (K,)) por imagem
+        """
+        if conf_threshold is None:
+            conf_threshold = self.conf_threshold
+
+        with metrics.stage('forward'):
+            outputs = self.forward_batch(images, batch_size)
+        with metrics.stage('postprocess'):
+            return [
+                self.postprocess(output, image.shape, conf_threshold)
+                for output, image in zip(outputs, images)
+            ]
+
+    def predict_tiled(self, image, conf_threshold):
+        """
+        Detecção em tiles sobrepostos na resolução original da imagem.
+        
+        Uma primeira passada na imagem inteira reduzida encontra os objetos
+        grandes e indica as regiões de interesse; apenas os tiles selecionados
+        são processados, em lote, e as detecções são unidas com NMS entre tiles.
+        
+        Args:
+            image: Imagem RGB original
+            conf_threshold: Limiar de confiança
             
-            # Aplicar Non-Maximum Suppression (NMS)
+        Returns:
+            tuple: (caixas (K, 4), confianças (K,), ids de classe (K,),
+                {'total': tiles da grade, 'processed': tiles processados})
+        """
+        height, width = image.shape[:2]
+
+        # Primeira passada em baixa resolução (imagem inteira)
+        with metrics.stage('preprocess'):
+            blob = self.preprocess(image)
+        with metrics.stage('forward'):
+            output = self.backend.forward(blob)
+        with metrics.stage('postprocess'):
+            boxes, confidences, class_ids = self.postprocess(
+                output, image.shape, min(self.roi_threshold, conf_threshold)
+            )
+
+        with metrics.stage('tile_selection'):
+            tiles = self.tile_grid(height, width)
+            selected = self.select_tiles(image, tiles, boxes)
+
+        keep = confidences > conf_threshold
+        all_boxes, all_confidences, all_class_ids = [boxes[keep]], [confidences[keep]], [class_ids[keep]]
+
+        crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in (tiles[i] for i in selected)]
+        with metrics.stage('forward'):
+            outputs = self.forward_batch(crops)
+
+        with metrics.stage('postprocess'):
+            for index, output in zip(selected, outputs):
+                x1, y1, x2, y2 = tiles[index]
+                tile_boxes, tile_confidences, tile_class_ids = self.postprocess(
+                    output, (y2 - y1, x2 - x1), conf_threshold
+                )
+                all_boxes.append(tile_boxes + np.array([x1, y1, x1, y1]))
+                all_confidences.append(tile_confidences)
+                all_class_ids.append(tile_class_ids)
+
+            boxes = np.concatenate(all_boxes).reshape(-1, 4)
+            confidences = np.concatenate(all_confidences)
+            class_ids = np.concatenate(all_class_ids)
+
+            # NMS entre tiles, por classe: deslocar cada classe para uma região própria
+            offsets = class_ids[:, None] * (max(height, width) + 1)
+            shifted = boxes + offsets
+            boxes_xywh = np.copy(shifted)
+            boxes_xywh[:, 2:] = shifted[:, 2:] - shifted[:, :2]
             indices = cv2.dnn.NMSBoxes(
-                boxes_xyxy.tolist(), 
-                confidences.tolist(), 
-                self.conf_threshold, 
+                boxes_xywh.tolist(),
+                confidences.tolist(),
+                conf_threshold,
                 self.nms_threshold
             )
+            indices = np.array(indices, dtype=np.int64).flatten()
+
+        tile_info = {'total': len(tiles), 'processed': len(selected)}
+        return boxes[indices], confidences[indices], class_ids[indices], tile_info
+
+    def detect_objects(self, image_data, conf_threshold=None, tiling=None):
+        """
+        Detecta objetos em uma imagem usando o modelo ONNX.
+        
+        Args:
+            image_data: Dados da imagem em formato base64, bytes ou array NumPy RGB
+            conf_threshold: Limiar de confiança para esta chamada (opcional,
+                padrão é o limiar configurado no detector)
+            tiling: Modo de tiles para esta chamada ('on', 'off' ou 'auto';
+                padrão do detector se None)
             
-            detections = []
-            if len(indices) > 0:
-                for i in indices.flatten():
-                    class_id = class_ids[i]
-                    class_name = self.classes[class_id]
-                    confidence = confidences[i]
-                    x1, y1, x2, y2 = boxes_xyxy[i]
-                    
-                    # Filtrar apenas as classes alvo
-                    if class_name in self.target_classes:
-                        detection = {
-                            'class_name': class_name,
-                            'display_name': self.translation_map.get(class_name, class_name),
-                            'confidence': float(confidence),
-                            'bbox': {
-                                'x1': float(x1),
-                                'y1': float(y1),
-                                'x2': float(x2),
-                                'y2': float(y2)
+        Returns:
+            dict: Resultados da detecção com objetos encontrados
+        """
+        try:
+            # Amostragem opcional com cProfile (PROFILE_SAMPLE_RATE)
+            with metrics.maybe_profile():
+                boxes, confidences, class_ids, tile_info = self._predict(image_data, conf_threshold, tiling)
+                
+                with metrics.stage('serialize'):
+                    detections = []
+                    for (x1, y1, x2, y2), confidence, class_id in zip(boxes, confidences, class_ids):
+                        class_name = self.classes[class_id]
+                
+                        # Filtrar apenas as classes alvo
+                        if class_name in self.target_class_set:
+                            detection = {
+                                'class_name': class_name,
+                                'display_name': self.translation_map.get(class_name, class_name),
+                                'confidence': float(confidence),
+                                'bbox': {
+                                    'x1': float(x1),
+                                    'y1': float(y1),
+                                    'x2': float(x2),
+                                    'y2': float(y2)
+                                }
                             }
-                        }
-                        detections.append(detection)
+                            detections.append(detection)
+            metrics.count_detections(detections)
             
-            return {
+            results = {
                 'success': True,
                 'detections': detections,
                 'total_objects': len(detections)
             }
+            if tile_info is not None:
+                results['tiles'] = tile_info
+            return results
             
         except Exception as e:
             return {
@@ -177,6 +581,44 @@ class ObjectDetector:
                 'total_objects': 0
             }
     
+    def detect_compact(self, image_data, conf_threshold=None, tiling=None):
+        """
+        Como detect_objects, mas já no formato compacto (src/result_encoding.py).
+
+        As detecções das classes alvo vão dos arrays de predict para os arrays
+        da resposta, sem montar um dict por detecção nem a classificação de
+        ferramentas, que o cliente obtém da tabela de classes.
+
+        Returns:
+            dict: success, format, class_ids, confidences, boxes e total_objects
+        """
+        try:
+            with metrics.maybe_profile():
+                boxes, confidences, class_ids, tile_info = self._predict(image_data, conf_threshold, tiling)
+
+                with metrics.stage('serialize'):
+                    keep = self.target_class_mask[class_ids]
+                    class_ids = class_ids[keep]
+                    results = {'success': True, 'format': 'compact'}
+                    results.update(result_encoding.compact_arrays(boxes[keep], confidences[keep], class_ids))
+                    results['total_objects'] = len(class_ids)
+            metrics.count_classes(self.classes[class_id] for class_id in results['class_ids'])
+
+            if tile_info is not None:
+                results['tiles'] = tile_info
+            return results
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'format': 'compact',
+                'class_ids': [],
+                'confidences': [],
+                'boxes': [],
+                'total_objects': 0
+            }
+
     def classify_tool_type(self, class_name, confidence):
         """
         Classifica o tipo de ferramenta baseado no nome da classe detectada.
@@ -188,21 +630,34 @@ class ObjectDetector:
         Returns:
             dict: Informações sobre o tipo de ferramenta
         """
-        for category, tools in self.tool_categories.items():
-            if class_name in tools:
-                return {
-                    'category': category,
-                    'tool_type': class_name,
-                    'confidence': confidence,
-                    'description': self._get_tool_description(class_name)
-                }
-        
-        return {
-            'category': 'unknown',
-            'tool_type': class_name,
-            'confidence': confidence,
-            'description': f'Objeto detectado: {class_name}'
-        }
+        info = self.tool_info.get(class_name)
+        if info is None:
+            return {
+                'category': 'unknown',
+                'tool_type': class_name,
+                'confidence': confidence,
+                'description': f'Objeto detectado: {class_name}'
+            }
+        return dict(info, confidence=confidence)
+
+    def class_table(self):
+        """
+        Tabela das classes alvo usada pelo formato compacto de resposta.
+
+        Returns:
+            list: Uma entrada por classe alvo com id (índice no modelo),
+                class_name, display_name, category e description
+        """
+        return [
+            {
+                'id': self.class_ids[class_name],
+                'class_name': class_name,
+                'display_name': self.translation_map.get(class_name, class_name),
+                'category': self.tool_info[class_name]['category'],
+                'description': self.tool_info[class_name]['description']
+            }
+            for class_name in self.target_classes
+        ]
     
     def _get_tool_description(self, class_name):
         """Retorna descrição detalhada da ferramenta."""
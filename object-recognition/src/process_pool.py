@@ -0,0 +1,402 @@
+"""
+Modo opcional de inferência em processos separados (INFERENCE_MODE=process).
+
+Cada processo worker carrega um modelo e executa toda a detecção (decodificação,
+pré-processamento, inferência e pós-processamento) fora do GIL do servidor. Os
+frames são copiados para um buffer multiprocessing.shared_memory exclusivo de
+cada worker, sem serialização com pickle; apenas o comando e o resultado (pequenos)
+trafegam pela conexão.
+"""
+
+import atexit
+import base64
+import json
+import os
+import queue
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Connection, answer_challenge, deliver_challenge, wait
+
+import numpy as np
+
+from src.object_detector import ObjectDetector
+
+# Diretório que contém o pacote src (necessário para "python -m src.process_pool")
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prazo para um worker conectar e carregar o modelo
+START_TIMEOUT = float(os.environ.get('INFERENCE_WORKER_START_TIMEOUT', 120))
+
+
+class _Worker:
+    """Processo worker com sua conexão e seu buffer de memória compartilhada."""
+
+    def __init__(self, pool, index):
+        self.index = index
+        self.conn = None
+        self.process = None
+        self.shm = shared_memory.SharedMemory(create=True, size=pool.max_frame_bytes)
+        try:
+            self._start(pool)
+        except BaseException:
+            self._discard()
+            raise
+
+    def _start(self, pool):
+        config = dict(pool.detector_config, shm_name=self.shm.name, address=pool.address)
+        env = dict(os.environ, INFERENCE_WORKER_AUTHKEY=pool.authkey.hex())
+        deadline = time.monotonic() + START_TIMEOUT
+        # Todos os workers conectam no mesmo socket: um processo iniciado
+        # por vez, para que a conexão aceita seja a deste processo
+        with pool.spawn_lock:
+            self.process = subprocess.Popen(
+                [sys.executable, '-m', 'src.process_pool', json.dumps(config)],
+                cwd=PACKAGE_ROOT,
+                env=env
+            )
+            self._wait_for(pool.listener, deadline, 'conectar')
+            # Há uma conexão pendente: accept() não bloqueia
+            client, _ = pool.listener.accept()
+            self.conn = Connection(client.detach())
+            # Mesma autenticação de multiprocessing.connection.Listener.accept
+            deliver_challenge(self.conn, pool.authkey)
+            answer_challenge(self.conn, pool.authkey)
+        self._wait_for(self.conn, deadline, 'carregar o modelo')
+        status, shm_name, self.backend_name, self.backend_timings = self.conn.recv()
+        if status != 'ready':
+            raise RuntimeError(f'Falha ao iniciar o worker de inferência: {self.backend_name}')
+        if shm_name != self.shm.name:
+            raise RuntimeError(f'Worker de inferência conectou com o buffer {shm_name}, esperado {self.shm.name}')
+
+    def _wait_for(self, source, deadline, step):
+        """Aguarda a conexão (ou mensagem) do processo, que pode terminar antes."""
+        while not wait([source], timeout=0.5):
+            code = self.process.poll()
+            if code is not None:
+                raise RuntimeError(f'Worker de inferência encerrou (código {code}) antes de {step}')
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'Worker de inferência não conseguiu {step} em {START_TIMEOUT:.0f}s')
+
+    def _discard(self):
+        """Libera processo, conexão e buffer de um worker que não iniciou."""
+        if self.conn is not None:
+            self.conn.close()
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+        self.shm.close()
+        self.shm.unlink()
+
+    def run(self, op, image_data, conf_threshold, tiling):
+        payload, shape = None, None
+        if isinstance(image_data, np.ndarray):
+            frame = np.ascontiguousarray(image_data, dtype=np.uint8)
+            kind, shape, data = 'array', frame.shape, frame.reshape(-1)
+        else:
+            if isinstance(image_data, str):
+                if image_data.startswith('data:image'):
+                    image_data = image_data.split(',', 1)[1]
+                image_data = base64.b64decode(image_data)
+            kind, data = 'encoded', np.frombuffer(image_data, dtype=np.uint8)
+
+        nbytes = data.nbytes
+        if nbytes <= self.shm.size:
+            # Cópia direta para o buffer compartilhado (sem pickle do frame)
+            np.ndarray((nbytes,), dtype=np.uint8, buffer=self.shm.buf)[:] = data
+        else:
+            # Frame maior que o buffer: envio pela conexão
+            payload = data.tobytes()
+
+        self.conn.send((op, kind, nbytes, shape, conf_threshold, tiling, payload))
+        return self._receive()
+
+    def warmup(self, runs):
+        self.conn.send(('warmup', runs))
+        return self._receive()
+
+    def _receive(self):
+        status, result = self.conn.recv()
+        if status != 'ok':
+            raise RuntimeError(result)
+        return result
+
+    def close(self):
+        try:
+            self.conn.send(None)
+            self.conn.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ProcessInferencePool:
+    """
+    Pool de processos de inferência com interface compatível com BackendPool
+    (name e stats()), usado por ProcessPoolDetector.
+    """
+
+    def __init__(self, size, detector_config, max_frame_bytes=None):
+        self.size = size
+        self.detector_config = detector_config
+        self.max_frame_bytes = max_frame_bytes or int(
+            os.environ.get('INFERENCE_MAX_FRAME_BYTES', 64 * 1024 * 1024)
+        )
+        self.authkey = secrets.token_bytes(16)
+        self.address = os.path.join(tempfile.mkdtemp(prefix='inference-'), 'pool.sock')
+        # Socket próprio (e não um Listener) para aguardar a conexão de cada
+        # worker com prazo, via multiprocessing.connection.wait
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.address)
+        self.listener.listen()
+
+        self._lock = threading.Lock()
+        self.spawn_lock = threading.Lock()
+        self._available = queue.Queue()
+        self.in_use = 0
+        self.waits = 0
+        self.restarts = 0
+
+        self.workers = []
+        try:
+            for index in range(size):
+                self.workers.append(_Worker(self, index))
+        except BaseException:
+            self.close()
+            raise
+        for worker in self.workers:
+            self._available.put(worker)
+
+        self.name = f'process:{self.workers[0].backend_name}'
+        self.backend_timings = self.workers[0].backend_timings
+        atexit.register(self.close)
+
+    def run(self, op, image_data, conf_threshold=None, tiling=None):
+        try:
+            worker = self._available.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self.waits += 1
+            worker = self._available.get()
+        if worker is None:
+            # Pool sem workers: repassar o aviso aos demais que aguardam
+            self._available.put(None)
+            raise RuntimeError('Nenhum worker de inferência disponível')
+
+        with self._lock:
+            self.in_use += 1
+        try:
+            return worker.run(op, image_data, conf_threshold, tiling)
+        except (EOFError, OSError):
+            # Worker encerrado inesperadamente: substituir por um novo processo;
+            # só um worker vivo volta para a fila
+            dead, worker = worker, None
+            try:
+                worker = self._restart(dead)
+            except Exception as e:
+                self._remove(dead)
+                raise RuntimeError(f'Worker de inferência encerrado e não reiniciado: {e}')
+            raise RuntimeError('Worker de inferência reiniciado; tente novamente')
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            if worker is not None:
+                self._available.put(worker)
+
+    def warmup(self, runs=3):
+        """Aquece o modelo de todos os workers; retorna as estatísticas de cada um."""
+        workers = [self._available.get() for _ in range(self.size)]
+        try:
+            return [worker.warmup(runs) for worker in workers]
+        finally:
+            for worker in workers:
+                self._available.put(worker)
+
+    def _restart(self, worker):
+        with self._lock:
+            self.restarts += 1
+        try:
+            worker.close()
+        except Exception:
+            pass
+        replacement = _Worker(self, worker.index)
+        with self._lock:
+            self.workers[worker.index] = replacement
+        return replacement
+
+    def _remove(self, worker):
+        """Retira do pool um worker que não pôde ser reiniciado."""
+        with self._lock:
+            self.workers[worker.index] = None
+            self.size -= 1
+            empty = self.size == 0
+        if empty:
+            # Acorda quem aguarda na fila: run() responde erro em vez de bloquear
+            self._available.put(None)
+
+    def stats(self):
+        """Retorna o tamanho do pool, workers ocupados, esperas e reinícios."""
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'waits': self.waits,
+                'restarts': self.restarts,
+                'max_frame_bytes': self.max_frame_bytes
+            }
+
+    def close(self):
+        if self.listener is None:
+            return  # Já encerrado (ex.: close() explícito e depois o atexit)
+        for worker in self.workers:
+            if worker is not None:
+                worker.close()
+        self.workers = []
+        self.listener.close()
+        self.listener = None
+        os.unlink(self.address)
+        os.rmdir(os.path.dirname(self.address))
+
+
+class ProcessPoolDetector(ObjectDetector):
+    """
+    ObjectDetector cujas detecções executam em processos worker.
+
+    O processo do servidor mantém apenas os metadados (classes, categorias);
+    cada um dos pool_size workers carrega uma cópia do modelo.
+    """
+
+    def _load_model(self):
+        config = {
+            'model_path': os.path.abspath(self.model_path),
+            'conf_threshold': self.conf_threshold,
+            'nms_threshold': self.nms_threshold,
+            'backend': self.backend_name,
+            'num_threads': self.num_threads,
+            'input_size': self.input_width,
+            'tiling': self.tiling,
+        }
+        self.backend = ProcessInferencePool(self.pool_size, config)
+        self.backend_timings = self.backend.backend_timings
+
+    def warmup(self, runs=3):
+        start = time.perf_counter()
+        workers = self.backend.warmup(runs)
+        warm = [w['warm_latency'] for w in workers if w['warm_latency'] is not None]
+        self.warmup_stats = {
+            'runs': runs,
+            'input_shapes': workers[0]['input_shapes'],
+            'cold_latency': max(w['cold_latency'] for w in workers),
+            'warm_latency': sum(warm) / len(warm) if warm else None,
+            'duration': time.perf_counter() - start
+        }
+        self.ready = True
+        return self.warmup_stats
+
+    def _run(self, op, image_data, conf_threshold, tiling):
+        start = time.perf_counter()
+        result = self.backend.run(op, image_data, conf_threshold, tiling)
+        if self.first_inference_time is None:
+            self.first_inference_time = time.perf_counter() - start
+        return result
+
+    def predict(self, image_data, conf_threshold=None, tiling=None):
+        return self._run('predict', image_data, conf_threshold, tiling)
+
+    def detect_objects(self, image_data, conf_threshold=None, tiling=None):
+        try:
+            return self._run('detect', image_data, conf_threshold, tiling)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'detections': [],
+                'total_objects': 0
+            }
+
+    def detect_compact(self, image_data, conf_threshold=None, tiling=None):
+        try:
+            return self._run('compact', image_data, conf_threshold, tiling)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'format': 'compact',
+                'class_ids': [],
+                'confidences': [],
+                'boxes': [],
+                'total_objects': 0
+            }
+
+
+def _worker_main(config):
+    """Laço principal do processo worker."""
+    authkey = bytes.fromhex(os.environ.pop('INFERENCE_WORKER_AUTHKEY'))
+    conn = Client(config.pop('address'), family='AF_UNIX', authkey=authkey)
+    shm = shared_memory.SharedMemory(name=config.pop('shm_name'))
+    # O buffer pertence ao processo do servidor, que o remove no encerramento
+    resource_tracker.unregister(shm._name, 'shared_memory')
+
+    shm_name = shm.name
+    try:
+        detector = ObjectDetector(pool_size=1, **config)
+    except Exception as e:
+        conn.send(('error', shm_name, str(e), {}))
+        shm.close()
+        conn.close()
+        return
+    # O nome do buffer identifica o worker para o processo do servidor
+    conn.send(('ready', shm_name, detector.backend.name, detector.backend_timings))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        if task[0] == 'warmup':
+            try:
+                conn.send(('ok', detector.warmup(task[1])))
+            except Exception as e:
+                conn.send(('error', str(e)))
+            continue
+
+        op, kind, nbytes, shape, conf_threshold, tiling, payload = task
+        buffer = payload if payload is not None else shm.buf[:nbytes]
+        image = None
+        try:
+            if kind == 'array':
+                image = np.ndarray(shape, dtype=np.uint8, buffer=buffer)
+            else:
+                image = ObjectDetector.decode_image(bytes(buffer))
+
+            if op == 'predict':
+                result = detector.predict(image, conf_threshold, tiling)
+            elif op == 'compact':
+                result = detector.detect_compact(image, conf_threshold, tiling)
+            else:
+                result = detector.detect_objects(image, conf_threshold, tiling)
+            conn.send(('ok', result))
+        except Exception as e:
+            conn.send(('error', str(e)))
+        finally:
+            # Liberar as referências ao buffer compartilhado antes do próximo frame
+            image = buffer = None
+
+    shm.close()
+    conn.close()
+
+
+if __name__ == '__main__':
+    _worker_main(json.loads(sys.argv[1]))
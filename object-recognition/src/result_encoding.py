@@ -0,0 +1,104 @@
+"""
+Formato compacto dos resultados de detecção para clientes de alta frequência.
+
+No formato completo, cada detecção repete class_name, display_name,
+description, category, tool_type e um bbox aninhado com quatro floats. No
+formato compacto as detecções viram arrays paralelos:
+
+    {
+        "format": "compact",
+        "class_ids": [76, 43],              índices na tabela de classes
+        "confidences": [87, 52],            confiança em porcentagem inteira
+        "boxes": [x1, y1, x2, y2, ...],     pixels inteiros, 4 valores por detecção
+        "track_ids": [3, 7],                apenas se houver rastreamento
+        "predicted": [0, 1],                idem (1 = caixa interpolada)
+        "class_table_version": "..."
+    }
+
+A tabela de classes (id, nome, nome de exibição, categoria e descrição) é
+obtida uma vez em GET /api/class-table ou na primeira mensagem compacta do
+WebSocket; class_table_version permite ao cliente detectar que ela mudou.
+
+Nas rotas de requisição única os arrays saem direto das saídas de
+ObjectDetector.predict (compact_arrays via detect_compact), sem montar os
+dicts do formato completo. encode_compact converte um resultado completo e é
+usado no WebSocket, onde o rastreador e os eventos precisam das detecções.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+FORMATS = ('full', 'compact')
+
+
+def class_table_payload(detector):
+    """
+    Monta a tabela de classes do detector com sua versão.
+
+    Returns:
+        dict: {"version": hash curto do conteúdo, "classes": [...]}
+    """
+    classes = detector.class_table()
+    version = hashlib.sha1(
+        json.dumps(classes, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    ).hexdigest()[:12]
+    return {'version': version, 'classes': classes}
+
+
+def compact_arrays(boxes, confidences, class_ids):
+    """
+    Monta os arrays compactos a partir das saídas de ObjectDetector.predict.
+
+    Args:
+        boxes: Caixas x1, y1, x2, y2 (K, 4)
+        confidences: Confianças (K,)
+        class_ids: Ids de classe (K,)
+
+    Returns:
+        dict: "class_ids", "confidences" e "boxes" como listas de inteiros
+    """
+    return {
+        'class_ids': class_ids.tolist(),
+        'confidences': np.rint(confidences * 100).astype(np.int64).tolist(),
+        'boxes': np.rint(boxes).astype(np.int64).ravel().tolist()
+    }
+
+
+def encode_compact(results, class_ids, table_version=None):
+    """
+    Converte um resultado no formato completo para o formato compacto.
+
+    Args:
+        results: Resultado de detect_objects (com os campos extras das rotas)
+        class_ids: Mapeamento class_name -> id (ObjectDetector.class_ids)
+        table_version: Versão da tabela de classes incluída na resposta
+
+    Returns:
+        dict: Os mesmos campos do resultado, com "detections" substituído
+            pelos arrays compactos
+    """
+    detections = results.get('detections') or []
+    encoded = {key: value for key, value in results.items() if key != 'detections'}
+
+    boxes = []
+    for detection in detections:
+        bbox = detection['bbox']
+        boxes.extend((round(bbox['x1']), round(bbox['y1']), round(bbox['x2']), round(bbox['y2'])))
+
+    encoded['format'] = 'compact'
+    encoded['class_ids'] = [class_ids[detection['class_name']] for detection in detections]
+    encoded['confidences'] = [round(detection['confidence'] * 100) for detection in detections]
+    encoded['boxes'] = boxes
+    if detections and 'track_id' in detections[0]:
+        encoded['track_ids'] = [detection['track_id'] for detection in detections]
+        encoded['predicted'] = [int(detection.get('predicted', False)) for detection in detections]
+    if table_version is not None:
+        encoded['class_table_version'] = table_version
+    return encoded
+
+
+def dumps(payload):
+    """Serializa em JSON sem espaços (mensagens do WebSocket)."""
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
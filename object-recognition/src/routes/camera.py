@@ -0,0 +1,123 @@
+"""
+Rotas para consultar as detecções da captura de câmera feita no servidor.
+"""
+
+from flask import Blueprint, request, jsonify
+from src.camera_worker import CameraWorker, read_published
+from src.scene_gate import SceneChangeGate
+from src.model_registry import get_detector
+from src.tracker import FrameTracker
+from src.detection_events import get_event_publisher
+from src.routes.realtime_detection import MOTION_THRESHOLD, TRACK_DETECT_INTERVAL, TRACK_MAX_MISSES
+import atexit
+import os
+import tempfile
+
+# Criar blueprint para as rotas da câmera do servidor
+camera_bp = Blueprint('camera', __name__)
+
+CAMERA_SOURCE = os.environ.get('CAMERA_SOURCE')
+CAMERA_RESULTS_PATH = os.environ.get(
+    'CAMERA_RESULTS_PATH',
+    os.path.join(tempfile.gettempdir(), 'camera_detections.json')
+)
+
+# Worker de captura deste processo (somente um processo do servidor captura)
+camera_worker = None
+
+
+def start_camera_worker():
+    """
+    Inicia a captura se CAMERA_SOURCE estiver configurada.
+
+    Entre os workers do gunicorn apenas um obtém a trava e abre a fonte de
+    vídeo; os demais servem o resultado publicado em CAMERA_RESULTS_PATH.
+    """
+    global camera_worker
+    if not CAMERA_SOURCE or camera_worker is not None:
+        return camera_worker
+
+    threshold = os.environ.get('CAMERA_THRESHOLD')
+    gate = SceneChangeGate(threshold=MOTION_THRESHOLD) if MOTION_THRESHOLD > 0 else None
+    worker = CameraWorker(
+        get_detector(),
+        CAMERA_SOURCE,
+        target_fps=float(os.environ.get('CAMERA_FPS', 5)),
+        threshold=float(threshold) if threshold else None,
+        loop=os.environ.get('CAMERA_LOOP', 'true').lower() == 'true',
+        results_path=CAMERA_RESULTS_PATH,
+        lock_path=f'{CAMERA_RESULTS_PATH}.lock',
+        gate=gate,
+        tracker=FrameTracker(detect_interval=TRACK_DETECT_INTERVAL, max_misses=TRACK_MAX_MISSES),
+        events=get_event_publisher(),
+        camera_id=os.environ.get('CAMERA_ID')
+    )
+    if worker.start():
+        camera_worker = worker
+        atexit.register(worker.stop)
+    return camera_worker
+
+
+def _current_state():
+    if camera_worker is not None:
+        return {'result': camera_worker.latest(), 'status': camera_worker.status()}
+    return read_published(CAMERA_RESULTS_PATH)
+
+
+@camera_bp.route('/camera/latest', methods=['GET'])
+def get_latest_detections():
+    """
+    Retorna a detecção mais recente da câmera do servidor.
+
+    Todos os clientes compartilham o mesmo fluxo de inferência. A resposta
+    inclui um ETag com o frame_id; enviando If-None-Match o cliente recebe
+    304 enquanto não houver um frame novo.
+
+    Retorna:
+    {
+        "success": true/false,
+        "frame_id": number,
+        "timestamp": epoch seconds,
+        "detections": [...],
+        "total_objects": number,
+        ...
+    }
+    """
+    if not CAMERA_SOURCE:
+        return jsonify({
+            'success': False,
+            'error': 'Captura de câmera não configurada (CAMERA_SOURCE)',
+            'detections': [],
+            'total_objects': 0
+        }), 404
+
+    state = _current_state()
+    if not state or not state.get('result'):
+        return jsonify({
+            'success': False,
+            'error': 'Nenhum frame processado ainda',
+            'detections': [],
+            'total_objects': 0
+        }), 503
+
+    result = state['result']
+    etag = str(result['frame_id'])
+    if request.if_none_match.contains(etag):
+        return '', 304
+
+    response = jsonify(result)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@camera_bp.route('/camera/status', methods=['GET'])
+def get_camera_status():
+    """Retorna o estado e os contadores da captura no servidor."""
+    if not CAMERA_SOURCE:
+        return jsonify({'enabled': False})
+
+    state = _current_state()
+    status = state['status'] if state else {'source': CAMERA_SOURCE, 'running': False}
+    status['enabled'] = True
+    return jsonify(status)
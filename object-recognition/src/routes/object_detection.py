@@ -2,16 +2,21 @@
 Rotas da API para detecção de objetos.
 """
 
-from flask import Blueprint, request, jsonify
-from src.object_detector import ObjectDetector
+from flask import Blueprint, Response, request, jsonify
+from src.model_registry import get_detector, is_ready
+from src import metrics, result_encoding
 import base64
 import io
+import time
 
 # Criar blueprint para as rotas de detecção de objetos
 object_detection_bp = Blueprint('object_detection', __name__)
 
-# Instanciar o detector de objetos
-detector = ObjectDetector()
+# Detector compartilhado pelo processo (o modelo é carregado uma única vez)
+detector = get_detector()
+
+# Tabela de classes do formato compacto
+CLASS_TABLE = result_encoding.class_table_payload(detector)
 
 @object_detection_bp.route('/detect', methods=['POST'])
 def detect_objects():
@@ -20,7 +25,9 @@ def detect_objects():
     
     Espera um JSON com:
     {
-        "image": "data:image/jpeg;base64,..." ou dados base64 da imagem
+        "image": "data:image/jpeg;base64,..." ou dados base64 da imagem,
+        "tiling": "auto" | "on" | "off" (opcional),
+        "format": "full" | "compact" (opcional, ver src/result_encoding.py)
     }
     
     Retorna:
@@ -28,9 +35,11 @@ def detect_objects():
         "success": true/false,
         "detections": [...],
         "total_objects": number,
+        "tiles": {"total": number, "processed": number} (se processada em tiles),
         "error": "mensagem de erro se houver"
     }
     """
+    start_time = time.time()
     try:
         # Verificar se há dados na requisição
         if not request.json:
@@ -51,8 +60,33 @@ def detect_objects():
                 'total_objects': 0
             }), 400
         
+        tiling = request.json.get('tiling')
+        if tiling not in (None, 'auto', 'on', 'off'):
+            return jsonify({
+                'success': False,
+                'error': 'Campo "tiling" deve ser "auto", "on" ou "off"',
+                'detections': [],
+                'total_objects': 0
+            }), 400
+        
+        response_format = request.json.get('format', 'full')
+        if response_format not in result_encoding.FORMATS:
+            return jsonify({
+                'success': False,
+                'error': 'Campo "format" deve ser "full" ou "compact"',
+                'detections': [],
+                'total_objects': 0
+            }), 400
+        
+        # No formato compacto, os arrays saem direto da inferência
+        if response_format == 'compact':
+            results = detector.detect_compact(image_data, tiling=tiling)
+            metrics.observe_request('detect', time.time() - start_time, error=not results['success'])
+            with metrics.stage('encode'):
+                return jsonify(dict(results, class_table_version=CLASS_TABLE['version']))
+        
         # Executar detecção
-        results = detector.detect_objects(image_data)
+        results = detector.detect_objects(image_data, tiling=tiling)
         
         # Adicionar classificação de ferramentas aos resultados
         if results['success'] and results['detections']:
@@ -63,9 +97,12 @@ def detect_objects():
                 )
                 detection.update(tool_info)
         
-        return jsonify(results)
+        metrics.observe_request('detect', time.time() - start_time, error=not results['success'])
+        with metrics.stage('encode'):
+            return jsonify(results)
         
     except Exception as e:
+        metrics.observe_request('detect', time.time() - start_time, error=True)
         return jsonify({
             'success': False,
             'error': f'Erro interno do servidor: {str(e)}',
@@ -73,15 +110,34 @@ def detect_objects():
             'total_objects': 0
         }), 500
 
+@object_detection_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métricas no formato de exposição do Prometheus."""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
 @object_detection_bp.route('/health', methods=['GET'])
 def health_check():
-    """Endpoint para verificar se o serviço está funcionando."""
+    """Endpoint para verificar se o serviço está funcionando (liveness)."""
     return jsonify({
         'status': 'healthy',
         'service': 'object-detection-api',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'ready': is_ready()
     })
 
+@object_detection_bp.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Endpoint de prontidão: 200 somente depois que o modelo deste worker foi
+    aquecido, 503 enquanto o aquecimento não termina.
+    """
+    ready = is_ready()
+    return jsonify({
+        'ready': ready,
+        'warmup': detector.warmup_stats
+    }), 200 if ready else 503
+
 @object_detection_bp.route('/classes', methods=['GET'])
 def get_supported_classes():
     """Retorna as classes de objetos suportadas pelo modelo."""
@@ -90,3 +146,19 @@ def get_supported_classes():
         'target_classes': detector.target_classes, # Classes que o app considera relevantes
         'total_supported_classes': len(detector.classes)
     })
+
+@object_detection_bp.route('/class-table', methods=['GET'])
+def get_class_table():
+    """
+    Tabela de classes do formato compacto: {"version", "classes": [{"id",
+    "class_name", "display_name", "category", "description"}]}.
+
+    A versão é enviada como ETag; com If-None-Match igual a ela a resposta é
+    304 sem corpo.
+    """
+    etag = f'"{CLASS_TABLE["version"]}"'
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    response = jsonify(CLASS_TABLE)
+    response.headers['ETag'] = etag
+    return response
@@ -3,142 +3,403 @@ Rotas otimizadas para detecção de objetos em tempo real.
 """
 
 from flask import Blueprint, request, jsonify
-from src.object_detector import ObjectDetector
+from flask_sock import Sock
+from src.model_registry import get_detector
+from src.detection_cache import DetectionCache
+from src.streaming import LatestFrameSlot
+from src.scene_gate import SceneChangeGate
+from src.tracker import FrameTracker
+from src.detection_events import get_event_publisher
+from src import metrics, result_encoding
+import os
+import json
+import functools
 import time
 import threading
-import queue
 
 # Criar blueprint para as rotas de detecção em tempo real
 realtime_detection_bp = Blueprint('realtime_detection', __name__)
 
-# Instanciar o detector de objetos
-detector = ObjectDetector()
+# Extensão WebSocket (as rotas são registradas no blueprint acima)
+sock = Sock()
+
+# Detector compartilhado pelo processo (o modelo é carregado uma única vez)
+detector = get_detector()
+
+# Cache LRU com TTL indexado pelo hash do conteúdo do frame
+detection_cache = DetectionCache(
+    max_size=int(os.environ.get('REALTIME_CACHE_SIZE', 64)),
+    ttl=float(os.environ.get('REALTIME_CACHE_TTL', 2.0))
+)
+
+# Tabela de classes do formato compacto (fixa enquanto o modelo não muda)
+CLASS_TABLE = result_encoding.class_table_payload(detector)
+
+DEFAULT_THRESHOLD = 0.3
+
+# Diferença média mínima (níveis de cinza) para reprocessar um frame; 0 desativa
+MOTION_THRESHOLD = float(os.environ.get('MOTION_THRESHOLD', 3.0))
+
+# Rastreamento no stream: detector a cada k frames, caixas interpoladas nos demais
+TRACK_DETECT_INTERVAL = int(os.environ.get('TRACK_DETECT_INTERVAL', 1))
+TRACK_MAX_MISSES = int(os.environ.get('TRACK_MAX_MISSES', 2))
+
+# Estatísticas de performance acumuladas desde o início do processo
+_stats_lock = threading.Lock()
+_stats = {
+    'requests': 0,
+    'inferences': 0,
+    'gated_frames': 0,
+    'tracked_frames': 0,
+    'errors': 0,
+    'total_inference_time': 0.0,
+    'last_processing_time': 0.0
+}
+
+
+def _record_stats(processing_time, inferred=False, error=False, gated=False, tracked=False,
+                  endpoint='detect-realtime'):
+    """Atualiza as estatísticas de performance e as métricas Prometheus."""
+    metrics.observe_request(endpoint, processing_time, error)
+    if gated:
+        metrics.GATED_FRAMES.inc()
+    if tracked:
+        metrics.TRACKED_FRAMES.inc()
+
+    with _stats_lock:
+        _stats['requests'] += 1
+        _stats['last_processing_time'] = processing_time
+        if gated:
+            _stats['gated_frames'] += 1
+        if tracked:
+            _stats['tracked_frames'] += 1
+        if inferred:
+            _stats['inferences'] += 1
+            _stats['total_inference_time'] += processing_time
+        if error:
+            _stats['errors'] += 1
+
+
+def _run_detection(image_data, threshold):
+    """Executa uma única inferência e adiciona a classificação de ferramentas."""
+    results = detector.detect_objects(image_data, conf_threshold=threshold)
+
+    if results['success']:
+        for detection in results['detections']:
+            tool_info = detector.classify_tool_type(
+                detection['class_name'],
+                detection['confidence']
+            )
+            detection.update(tool_info)
+
+    return results
+
+
+def _run_compact_detection(image_data, threshold):
+    """Executa uma única inferência já no formato compacto (sem dicts por detecção)."""
+    return detector.detect_compact(image_data, conf_threshold=threshold)
+
+
+def _gated_detection(gate, infer, image):
+    """Executa a inferência pelo filtro de cena, marcando resultados reaproveitados."""
+    results, reused = gate.process(image, infer)
+    return dict(results, reused=reused)
+
+
+def _encode(results, response_format):
+    """Converte o resultado para o formato pedido pelo cliente."""
+    if response_format != 'compact':
+        return results
+    if results.get('format') == 'compact':
+        # Montado direto dos arrays de predict (detect_compact)
+        return dict(results, class_table_version=CLASS_TABLE['version'])
+    return result_encoding.encode_compact(results, detector.class_ids, CLASS_TABLE['version'])
+
+
+def _error_response(message, status_code, start_time):
+    processing_time = time.time() - start_time
+    _record_stats(processing_time, error=True)
+    return jsonify({
+        'success': False,
+        'error': message,
+        'detections': [],
+        'total_objects': 0,
+        'processing_time': processing_time,
+        'cached': False
+    }), status_code
 
-# Cache para otimizar performance
-detection_cache = {}
-cache_timeout = 2  # segundos
 
 @realtime_detection_bp.route('/detect-realtime', methods=['POST'])
 def detect_objects_realtime():
     """
     Endpoint otimizado para detecção de objetos em tempo real.
-    
+
     Espera um JSON com:
     {
         "image": "data:image/jpeg;base64,..." ou dados base64 da imagem,
-        "threshold": 0.5 (opcional, padrão 0.3)
+        "threshold": 0.5 (opcional, padrão 0.3),
+        "format": "full" | "compact" (opcional, padrão "full")
     }
-    
-    Retorna:
+
+    Retorna (no formato compacto, "detections" é substituído pelos arrays
+    descritos em src/result_encoding.py):
     {
         "success": true/false,
         "detections": [...],
         "total_objects": number,
         "processing_time": seconds,
+        "cached": true/false,
         "error": "mensagem de erro se houver"
     }
     """
     start_time = time.time()
-    
+
     try:
         # Verificar se há dados na requisição
-        if not request.json:
-            return jsonify({
-                'success': False,
-                'error': 'Nenhum dado JSON fornecido',
-                'detections': [],
-                'total_objects': 0,
-                'processing_time': 0
-            }), 400
-        
+        data = request.get_json(silent=True)
+        if not data:
+            return _error_response('Nenhum dado JSON fornecido', 400, start_time)
+
         # Extrair dados da imagem
-        image_data = request.json.get('image')
-        threshold = request.json.get('threshold', 0.3)
-        
+        image_data = data.get('image')
         if not image_data:
-            return jsonify({
-                'success': False,
-                'error': 'Campo "image" não encontrado',
-                'detections': [],
-                'total_objects': 0,
-                'processing_time': 0
-            }), 400
-        
-        # Verificar cache (opcional para otimização)
-        image_hash = hash(image_data[:100])  # Hash simples dos primeiros 100 caracteres
-        current_time = time.time()
-        
-        if image_hash in detection_cache:
-            cached_result, cached_time = detection_cache[image_hash]
-            if current_time - cached_time < cache_timeout:
-                cached_result['processing_time'] = time.time() - start_time
-                cached_result['cached'] = True
-                return jsonify(cached_result)
-        
-        # Executar detecção
-        results = detector.detect_objects(image_data)
-        results = detector.detect_objects(image_data, confidence_threshold=threshold)
-        
-        # Filtrar detecções por threshold
-        if results['success'] and results['detections']:
-            filtered_detections = []
-            for detection in results['detections']:
-                if detection['confidence'] >= threshold:
-                    # Adicionar classificação de ferramentas
-                    tool_info = detector.classify_tool_type(
-                        detection['class_name'], 
-                        detection['confidence']
-                    )
-                    detection.update(tool_info)
-                    filtered_detections.append(detection)
-            
-            results['detections'] = filtered_detections
-            results['total_objects'] = len(filtered_detections)
-        
+            return _error_response('Campo "image" não encontrado', 400, start_time)
+        if not isinstance(image_data, str) or not image_data.isascii():
+            return _error_response('Campo "image" deve ser uma string base64', 400, start_time)
+
+        try:
+            threshold = float(data.get('threshold', DEFAULT_THRESHOLD))
+        except (TypeError, ValueError):
+            return _error_response('Campo "threshold" deve ser numérico', 400, start_time)
+        if not 0.0 <= threshold <= 1.0:
+            return _error_response('Campo "threshold" deve estar entre 0 e 1', 400, start_time)
+
+        response_format = data.get('format', 'full')
+        if response_format not in result_encoding.FORMATS:
+            return _error_response('Campo "format" deve ser "full" ou "compact"', 400, start_time)
+
+        # Verificar cache pelo hash do conteúdo completo do frame (e pelo
+        # formato, já que o resultado compacto é montado na própria detecção)
+        cache_key = DetectionCache.make_key(image_data, threshold) + (response_format,)
+        cached_result = detection_cache.get(cache_key)
+        metrics.CACHE_LOOKUPS.labels('hit' if cached_result is not None else 'miss').inc()
+        if cached_result is not None:
+            processing_time = time.time() - start_time
+            _record_stats(processing_time)
+            response = dict(cached_result)
+            response['processing_time'] = processing_time
+            response['cached'] = True
+            with metrics.stage('encode'):
+                return jsonify(_encode(response, response_format))
+
+        # Executar detecção (uma única inferência com o limiar da requisição)
+        if response_format == 'compact':
+            results = _run_compact_detection(image_data, threshold)
+        else:
+            results = _run_detection(image_data, threshold)
+
+        # Somente resultados válidos são armazenados no cache
+        if results['success']:
+            detection_cache.set(cache_key, results)
+
         # Adicionar tempo de processamento
         processing_time = time.time() - start_time
-        results['processing_time'] = processing_time
-        results['cached'] = False
-        
-        # Atualizar cache
-        detection_cache[image_hash] = (results.copy(), current_time)
-        
-        # Limpar cache antigo (manter apenas últimas 10 entradas)
-        if len(detection_cache) > 10:
-            oldest_key = min(detection_cache.keys(), 
-                           key=lambda k: detection_cache[k][1])
-            del detection_cache[oldest_key]
-        
-        return jsonify(results)
-        
+        _record_stats(processing_time, inferred=True, error=not results['success'])
+
+        response = dict(results)
+        response['processing_time'] = processing_time
+        response['cached'] = False
+        with metrics.stage('encode'):
+            return jsonify(_encode(response, response_format))
+
     except Exception as e:
+        return _error_response(f'Erro interno do servidor: {str(e)}', 500, start_time)
+
+@sock.route('/detect-stream', bp=realtime_detection_bp)
+def detect_objects_stream(ws):
+    """
+    Canal WebSocket persistente para detecção em tempo real.
+
+    O cliente envia frames como mensagens binárias (bytes JPEG/PNG) ou como
+    texto JSON {"image": "data:image/jpeg;base64,..."}; uma mensagem de texto
+    {"threshold": 0.5} altera o limiar de confiança da conexão e
+    {"format": "compact"} (ou ?format=compact na URL) passa a responder no
+    formato compacto de src/result_encoding.py. A primeira mensagem compacta
+    da conexão traz também "class_table" com a tabela de classes.
+
+    O servidor mantém apenas o frame mais recente: frames que chegam enquanto
+    a inferência anterior ainda está em andamento são descartados. Para cada
+    frame processado é enviada uma mensagem JSON:
+    {
+        "success": true/false,
+        "frame_id": number,
+        "reused": true se a cena não mudou e o resultado anterior foi reaproveitado,
+        "detected": false se o detector não rodou e as caixas foram interpoladas
+            pelo rastreador,
+        "detections": [...] (cada uma com "track_id" persistente),
+        "total_objects": number,
+        "processing_time": seconds,
+        "queue_time": seconds,
+        "received_frames": number,
+        "dropped_frames": number
+    }
+
+    O frame_id corresponde à posição do frame na ordem de envio (começando em 1).
+
+    Com o parâmetro de consulta ?camera=<baia> e BACKEND_URL configurada, as
+    detecções da conexão são agregadas e enviadas ao backend como eventos do
+    inventário de ferramentas daquela baia.
+    """
+    slot = LatestFrameSlot()
+    config = {'threshold': DEFAULT_THRESHOLD, 'format': request.args.get('format', 'full')}
+    if config['format'] not in result_encoding.FORMATS:
+        config['format'] = 'full'
+    class_table_sent = False
+    gate = SceneChangeGate(threshold=MOTION_THRESHOLD) if MOTION_THRESHOLD > 0 else None
+    tracker = FrameTracker(detect_interval=TRACK_DETECT_INTERVAL, max_misses=TRACK_MAX_MISSES)
+    camera_id = request.args.get('camera')
+    events = get_event_publisher() if camera_id else None
+
+    def receive_frames():
+        try:
+            while True:
+                message = ws.receive()
+                if message is None:
+                    break
+                if isinstance(message, bytes):
+                    slot.put(message)
+                    continue
+
+                try:
+                    payload = json.loads(message)
+                except ValueError:
+                    continue
+                if not isinstance(payload, dict):
+                    continue
+                if 'threshold' in payload:
+                    try:
+                        threshold = float(payload['threshold'])
+                    except (TypeError, ValueError):
+                        threshold = None
+                    if threshold is not None and 0.0 <= threshold <= 1.0:
+                        config['threshold'] = threshold
+                        if gate is not None:
+                            gate.reset()
+                        tracker.reset()
+                if payload.get('format') in result_encoding.FORMATS:
+                    config['format'] = payload['format']
+                if payload.get('image'):
+                    slot.put(payload['image'])
+        except Exception:
+            pass
+        finally:
+            slot.close()
+
+    receiver = threading.Thread(target=receive_frames, daemon=True)
+    receiver.start()
+
+    while True:
+        frame = slot.get(timeout=1.0)
+        if frame is None:
+            if slot.closed or not ws.connected:
+                break
+            continue
+
+        frame_id, image_data, received_at = frame
+        start_time = time.time()
+        reused = False
+        detected = True
+        try:
+            image = detector.decode_image(image_data)
+        except Exception as e:
+            results = {
+                'success': False,
+                'error': f'Frame inválido: {str(e)}',
+                'detections': [],
+                'total_objects': 0
+            }
+        else:
+            infer = functools.partial(_run_detection, threshold=config['threshold'])
+            if gate is not None:
+                infer = functools.partial(_gated_detection, gate, infer)
+            results, detected = tracker.process(image, infer)
+            reused = detected and results.get('reused', False)
+        results = dict(results)
         processing_time = time.time() - start_time
-        return jsonify({
-            'success': False,
-            'error': f'Erro interno do servidor: {str(e)}',
-            'detections': [],
-            'total_objects': 0,
-            'processing_time': processing_time,
-            'cached': False
-        }), 500
+        _record_stats(
+            processing_time,
+            inferred=detected and not reused,
+            error=not results['success'],
+            gated=reused,
+            tracked=not detected,
+            endpoint='detect-stream'
+        )
+
+        if events is not None and results['success']:
+            events.observe(camera_id, results['detections'], start_time)
+
+        results['frame_id'] = frame_id
+        results['reused'] = reused
+        results['detected'] = detected
+        results['processing_time'] = processing_time
+        results['queue_time'] = start_time - received_at
+        results['received_frames'] = slot.received
+        results['dropped_frames'] = slot.dropped
+        with metrics.stage('encode'):
+            response_format = config['format']
+            results = _encode(results, response_format)
+            if response_format == 'compact' and not class_table_sent:
+                results['class_table'] = CLASS_TABLE['classes']
+                class_table_sent = True
+            message = result_encoding.dumps(results)
+        ws.send(message)
+
+    receiver.join(timeout=1.0)
 
 @realtime_detection_bp.route('/performance', methods=['GET'])
 def get_performance_stats():
     """Retorna estatísticas de performance do sistema."""
+    with _stats_lock:
+        stats = dict(_stats)
+
+    inferences = stats.pop('inferences')
+    total_inference_time = stats.pop('total_inference_time')
+    cache_stats = detection_cache.stats()
+    events = get_event_publisher()
+
     return jsonify({
-        'cache_size': len(detection_cache),
-        'cache_timeout': cache_timeout,
-        'model_loaded': hasattr(detector, 'model') and detector.model is not None,
-        'supported_classes': len(detector.model.names) if hasattr(detector, 'model') else 0
+        'cache_size': cache_stats['size'],
+        'cache_max_size': cache_stats['max_size'],
+        'cache_timeout': cache_stats['ttl'],
+        'cache_hits': cache_stats['hits'],
+        'cache_misses': cache_stats['misses'],
+        'cache_hit_rate': cache_stats['hit_rate'],
+        'total_requests': stats['requests'],
+        'total_inferences': inferences,
+        'gated_frames': stats['gated_frames'],
+        'tracked_frames': stats['tracked_frames'],
+        'total_errors': stats['errors'],
+        'avg_inference_time': total_inference_time / inferences if inferences else 0.0,
+        'last_processing_time': stats['last_processing_time'],
+        'model_loaded': detector.backend is not None,
+        'model_ready': detector.ready,
+        'warmup': detector.warmup_stats,
+        'first_inference_time': detector.first_inference_time,
+        'inference_backend': detector.backend.name,
+        'inference_pool': detector.backend.stats(),
+        'inference_threads': detector.num_threads,
+        'model': os.path.basename(detector.model_path),
+        'input_size': detector.input_width,
+        'backend_timings': detector.backend_timings,
+        'detection_events': events.stats() if events else None,
+        'supported_classes': len(detector.classes)
     })
 
 @realtime_detection_bp.route('/clear-cache', methods=['POST'])
 def clear_cache():
     """Limpa o cache de detecções."""
-    global detection_cache
     detection_cache.clear()
     return jsonify({
         'success': True,
         'message': 'Cache limpo com sucesso'
     })
-
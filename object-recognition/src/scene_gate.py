@@ -0,0 +1,99 @@
+"""
+Detecção de mudança de cena para evitar inferências redundantes em frames estáticos.
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class SceneChangeGate:
+    def __init__(self, threshold=3.0, size=(64, 48), max_age=5.0):
+        """
+        Inicializa o filtro de mudança de cena.
+
+        Cada frame é reduzido para uma miniatura em tons de cinza e comparado
+        com a miniatura do último frame que passou pela inferência. Se a
+        diferença média absoluta (em níveis de cinza, 0-255) ficar abaixo do
+        limiar, o resultado anterior é reaproveitado.
+
+        Args:
+            threshold: Diferença média mínima para considerar que a cena mudou
+            size: Tamanho (largura, altura) da miniatura comparada
+            max_age: Idade máxima, em segundos, de um resultado reaproveitado;
+                depois disso a inferência é refeita mesmo sem mudança
+        """
+        self.threshold = threshold
+        self.size = size
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._reference = None
+        self._reference_shape = None
+        self._reference_time = 0.0
+        self._result = None
+
+        self.inferred = 0
+        self.skipped = 0
+        self.last_difference = None
+
+    def _signature(self, frame):
+        thumbnail = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_RGB2GRAY)
+        return thumbnail.astype(np.float32)
+
+    def process(self, frame, infer):
+        """
+        Executa a inferência somente se a cena mudou.
+
+        Args:
+            frame: Frame RGB (array NumPy H x W x 3)
+            infer: Função chamada com o frame quando a inferência é necessária
+
+        Returns:
+            tuple: (resultado, True se o resultado anterior foi reaproveitado)
+        """
+        signature = self._signature(frame)
+        now = time.monotonic()
+
+        with self._lock:
+            if (self._result is not None
+                    and self._reference_shape == frame.shape
+                    and now - self._reference_time < self.max_age):
+                difference = float(np.mean(np.abs(signature - self._reference)))
+                self.last_difference = difference
+                if difference < self.threshold:
+                    self.skipped += 1
+                    return self._result, True
+
+        result = infer(frame)
+
+        with self._lock:
+            self.inferred += 1
+            if result.get('success'):
+                self._reference = signature
+                self._reference_shape = frame.shape
+                self._reference_time = now
+                self._result = result
+
+        return result, False
+
+    def reset(self):
+        """Descarta a referência, forçando inferência no próximo frame."""
+        with self._lock:
+            self._reference = None
+            self._result = None
+
+    def stats(self):
+        """Retorna os contadores de frames inferidos e reaproveitados."""
+        total = self.inferred + self.skipped
+        return {
+            'threshold': self.threshold,
+            'inferred_frames': self.inferred,
+            'skipped_frames': self.skipped,
+            'skip_rate': self.skipped / total if total else 0.0,
+            'last_difference': self.last_difference
+        }
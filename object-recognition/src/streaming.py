@@ -0,0 +1,67 @@
+"""
+Estruturas auxiliares para detecção em fluxo contínuo (streaming) de frames.
+"""
+
+import threading
+import time
+
+
+class LatestFrameSlot:
+    """
+    Armazena apenas o frame mais recente de um cliente.
+
+    Quando a inferência é mais lenta que a captura, frames que chegam antes do
+    anterior ser processado substituem-no e são contabilizados como descartados,
+    evitando que a fila cresça e que o cliente receba resultados atrasados.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self._frame_id = 0
+        self._received_at = 0.0
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        """Publica um novo frame, descartando o anterior se ainda não foi consumido."""
+        with self._condition:
+            if self._frame is not None:
+                self.dropped += 1
+            self.received += 1
+            self._frame_id = self.received
+            self._frame = frame
+            self._received_at = time.time()
+            self._condition.notify()
+            return self._frame_id
+
+    def get(self, timeout=None):
+        """
+        Aguarda e consome o frame mais recente.
+
+        Args:
+            timeout: Tempo máximo de espera em segundos (None aguarda indefinidamente)
+
+        Returns:
+            tuple: (frame_id, frame, instante de recebimento) ou None se expirou/fechado
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._frame is not None or self._closed, timeout):
+                return None
+            if self._frame is None:
+                return None
+
+            frame = (self._frame_id, self._frame, self._received_at)
+            self._frame = None
+            return frame
+
+    def close(self):
+        """Libera quem estiver aguardando em get()."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
@@ -0,0 +1,261 @@
+"""
+Rastreamento de múltiplos objetos (estilo SORT: filtro de Kalman + associação por IoU)
+para manter identificadores estáveis e reaproveitar detecções entre frames.
+"""
+
+import threading
+
+import numpy as np
+
+# Modelo de velocidade constante sobre o estado [cx, cy, área, proporção, vcx, vcy, várea]
+_TRANSITION = np.eye(7)
+_TRANSITION[0, 4] = _TRANSITION[1, 5] = _TRANSITION[2, 6] = 1.0
+_OBSERVATION = np.eye(4, 7)
+_MEASUREMENT_NOISE = np.diag([1.0, 1.0, 10.0, 10.0])
+_PROCESS_NOISE = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+
+
+def _bbox_to_measurement(bbox):
+    width = bbox[2] - bbox[0]
+    height = bbox[3] - bbox[1]
+    return np.array([
+        bbox[0] + width / 2,
+        bbox[1] + height / 2,
+        width * height,
+        width / max(height, 1e-6)
+    ])
+
+
+def _state_to_bbox(state):
+    area = max(state[2], 0.0)
+    width = np.sqrt(area * max(state[3], 0.0))
+    height = area / width if width > 0 else 0.0
+    return np.array([
+        state[0] - width / 2,
+        state[1] - height / 2,
+        state[0] + width / 2,
+        state[1] + height / 2
+    ])
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU entre todas as caixas (N, 4) e (M, 4) no formato x1, y1, x2, y2."""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return intersection / np.maximum(area_a + area_b - intersection, 1e-9)
+
+
+class Track:
+    """Um objeto rastreado, com seu filtro de Kalman e a última detecção associada."""
+
+    def __init__(self, track_id, bbox, detection):
+        self.track_id = track_id
+        self.detection = detection
+        self.state = np.zeros(7)
+        self.state[:4] = _bbox_to_measurement(bbox)
+        self.covariance = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+        self.hits = 1
+        self.age = 0
+        self.time_since_update = 0
+
+    def predict(self):
+        """Avança o estado um frame e retorna a caixa prevista."""
+        if self.state[2] + self.state[6] <= 0:
+            self.state[6] = 0.0
+        self.state = _TRANSITION @ self.state
+        self.covariance = _TRANSITION @ self.covariance @ _TRANSITION.T + _PROCESS_NOISE
+        self.age += 1
+        self.time_since_update += 1
+        return self.bbox
+
+    def update(self, bbox, detection):
+        """Corrige o estado com uma nova detecção associada."""
+        innovation = _bbox_to_measurement(bbox) - _OBSERVATION @ self.state
+        innovation_covariance = _OBSERVATION @ self.covariance @ _OBSERVATION.T + _MEASUREMENT_NOISE
+        gain = self.covariance @ _OBSERVATION.T @ np.linalg.inv(innovation_covariance)
+        self.state = self.state + gain @ innovation
+        self.covariance = (np.eye(7) - gain @ _OBSERVATION) @ self.covariance
+        self.detection = detection
+        self.hits += 1
+        self.time_since_update = 0
+
+    @property
+    def bbox(self):
+        return _state_to_bbox(self.state)
+
+
+class MultiObjectTracker:
+    def __init__(self, max_age=6, min_hits=1, iou_threshold=0.3):
+        """
+        Inicializa o rastreador.
+
+        Args:
+            max_age: Frames sem detecção associada antes de descartar um objeto
+            min_hits: Detecções associadas necessárias para um objeto ser reportado
+            iou_threshold: IoU mínimo entre a caixa prevista e a detecção para
+                associá-las (apenas entre detecções da mesma classe)
+        """
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.tracks = []
+        self._next_id = 1
+
+    def predict(self):
+        """
+        Avança todos os objetos um frame sem detecção (caixas interpoladas).
+
+        Returns:
+            list: Detecções rastreadas no formato de detect_objects
+        """
+        for track in self.tracks:
+            track.predict()
+        self._prune()
+        return self._output()
+
+    def update(self, detections):
+        """
+        Avança um frame e associa as detecções do detector aos objetos rastreados.
+
+        Args:
+            detections: Lista de detecções no formato de detect_objects
+                (com 'class_name' e 'bbox' {'x1', 'y1', 'x2', 'y2'})
+
+        Returns:
+            list: Detecções rastreadas, com 'track_id' persistente
+        """
+        predicted = np.array([track.predict() for track in self.tracks]).reshape(-1, 4)
+        boxes = np.array([
+            [d['bbox']['x1'], d['bbox']['y1'], d['bbox']['x2'], d['bbox']['y2']]
+            for d in detections
+        ]).reshape(-1, 4)
+
+        ious = iou_matrix(predicted, boxes)
+        track_classes = np.array([t.detection['class_name'] for t in self.tracks], dtype=object)
+        detection_classes = np.array([d['class_name'] for d in detections], dtype=object)
+        if ious.size:
+            ious[track_classes[:, None] != detection_classes[None, :]] = 0.0
+
+        # Associação gulosa pelos maiores IoU
+        matched_tracks, matched_detections = set(), set()
+        for flat in np.argsort(-ious, axis=None):
+            track_index, detection_index = np.unravel_index(flat, ious.shape)
+            if ious[track_index, detection_index] < self.iou_threshold:
+                break
+            if track_index in matched_tracks or detection_index in matched_detections:
+                continue
+            self.tracks[track_index].update(boxes[detection_index], detections[detection_index])
+            matched_tracks.add(track_index)
+            matched_detections.add(detection_index)
+
+        for index, detection in enumerate(detections):
+            if index not in matched_detections:
+                self.tracks.append(Track(self._next_id, boxes[index], detection))
+                self._next_id += 1
+
+        self._prune()
+        return self._output()
+
+    def reset(self):
+        """Descarta todos os objetos rastreados."""
+        self.tracks = []
+
+    def _prune(self):
+        self.tracks = [t for t in self.tracks if t.time_since_update <= self.max_age]
+
+    def _output(self):
+        output = []
+        for track in self.tracks:
+            if track.hits < self.min_hits:
+                continue
+            x1, y1, x2, y2 = track.bbox
+            detection = dict(track.detection)
+            detection['track_id'] = track.track_id
+            detection['predicted'] = track.time_since_update > 0
+            detection['bbox'] = {'x1': float(x1), 'y1': float(y1), 'x2': float(x2), 'y2': float(y2)}
+            output.append(detection)
+        return output
+
+
+class FrameTracker:
+    def __init__(self, detect_interval=1, max_misses=2, min_hits=1, iou_threshold=0.3):
+        """
+        Executa o detector a cada detect_interval frames e rastreia nos demais.
+
+        Args:
+            detect_interval: Intervalo k entre frames com detecção (1 = todos)
+            max_misses: Rodadas de detecção sem associação antes de descartar
+                um objeto
+            min_hits: Detecções associadas necessárias para reportar um objeto
+            iou_threshold: IoU mínimo para associar detecção e objeto rastreado
+        """
+        self.detect_interval = max(1, detect_interval)
+        self.tracker = MultiObjectTracker(
+            max_age=max_misses * self.detect_interval,
+            min_hits=min_hits,
+            iou_threshold=iou_threshold
+        )
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._last_result = None
+
+        self.detected = 0
+        self.tracked = 0
+
+    def process(self, frame, detect):
+        """
+        Processa um frame, chamando o detector somente quando necessário.
+
+        Args:
+            frame: Frame RGB (array NumPy H x W x 3)
+            detect: Função chamada com o frame; retorna o dicionário de
+                detect_objects
+
+        Returns:
+            tuple: (resultado com detecções rastreadas, True se o detector rodou)
+        """
+        with self._lock:
+            run_detector = (self._last_result is None
+                            or self._frames % self.detect_interval == 0)
+            self._frames += 1
+
+        if run_detector:
+            result = detect(frame)
+            with self._lock:
+                if not result.get('success'):
+                    return result, True
+                self.detected += 1
+                detections = self.tracker.update(result['detections'])
+                self._last_result = result
+        else:
+            with self._lock:
+                self.tracked += 1
+                detections = self.tracker.predict()
+                result = self._last_result
+
+        result = dict(result, detections=detections, total_objects=len(detections))
+        return result, run_detector
+
+    def reset(self):
+        """Descarta os objetos rastreados, forçando detecção no próximo frame."""
+        with self._lock:
+            self.tracker.reset()
+            self._last_result = None
+            self._frames = 0
+
+    def stats(self):
+        """Retorna os contadores de frames com detecção e apenas rastreados."""
+        with self._lock:
+            return {
+                'detect_interval': self.detect_interval,
+                'detected_frames': self.detected,
+                'tracked_frames': self.tracked,
+                'active_tracks': len(self.tracker.tracks)
+            }